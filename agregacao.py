@@ -0,0 +1,63 @@
+import pandas as pd
+import numpy as np
+
+# --- Agregações vetorizadas reutilizáveis ---
+# Substituem o padrão groupby(...).apply(lambda g: weighted_average(g, ...)), que chamava
+# Python uma vez por grupo. Aqui cada agregação é uma única passada com np.bincount.
+
+
+def _group_codes(df, by):
+    """Códigos inteiros de grupo (0..n-1, -1 para chave ausente) e o índice dos grupos.
+
+    `by` aceita nome de coluna, lista de colunas ou pd.Grouper
+    (ex.: pd.Grouper(key='COMPETEN', freq='ME')).
+    """
+    if isinstance(by, str):
+        codes, uniques = pd.factorize(df[by], sort=True)
+        return codes, pd.Index(uniques, name=by)
+
+    if isinstance(by, pd.Grouper) and by.key is not None and getattr(by, 'freq', None) is not None:
+        # Agrupar por frequência exige ordenar as linhas; como há poucas datas
+        # distintas, só os valores únicos passam pelo Grouper
+        value_codes, uniques = pd.factorize(df[by.key], sort=True)
+        unique_codes, index = _group_codes(pd.DataFrame({by.key: uniques}), [by])
+        codes = np.where(value_codes >= 0, unique_codes[value_codes], -1)
+        return codes, index
+
+    # Em alguns agrupamentos (ex.: pd.Grouper) o ngroup() vem na ordem interna,
+    # então os códigos são devolvidos às posições originais pelo índice 0..n-1
+    grouped = df.reset_index(drop=True).groupby(by, sort=True, observed=True)
+    ngroup = grouped.ngroup()
+    codes = np.empty(len(df), dtype=np.int64)
+    # Linhas com chave ausente (NaN no ngroup) ficam com código -1
+    codes[ngroup.index.to_numpy()] = ngroup.fillna(-1).to_numpy(dtype=np.int64)
+    index = grouped.size().index
+    return codes, index
+
+
+def grouped_weighted_stats(df, by, value_col, weight_col):
+    """Somas e média ponderada de value_col por grupo, em uma única passada.
+
+    Segue a mesma regra da antiga weighted_average: só entram linhas com valor e
+    peso presentes e peso > 0; grupos sem nenhuma linha válida têm média NaN.
+    Retorna um DataFrame indexado pelos grupos com as colunas soma_ponderada,
+    soma_pesos e media_ponderada.
+    """
+    codes, index = _group_codes(df, by)
+    values = df[value_col].to_numpy(dtype='float64', na_value=np.nan)
+    weights = df[weight_col].to_numpy(dtype='float64', na_value=np.nan)
+    valid = (codes >= 0) & ~np.isnan(values) & ~np.isnan(weights) & (weights > 0)
+    codes_valid = codes[valid]
+    soma_pesos = np.bincount(codes_valid, weights=weights[valid], minlength=len(index))
+    soma_ponderada = np.bincount(codes_valid, weights=values[valid] * weights[valid], minlength=len(index))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media = np.where(soma_pesos > 0, soma_ponderada / soma_pesos, np.nan)
+    return pd.DataFrame(
+        {'soma_ponderada': soma_ponderada, 'soma_pesos': soma_pesos, 'media_ponderada': media},
+        index=index,
+    )
+
+
+def grouped_weighted_mean(df, by, value_col, weight_col):
+    """Média ponderada de value_col por grupo (Series indexada pelos grupos)."""
+    return grouped_weighted_stats(df, by, value_col, weight_col)['media_ponderada']
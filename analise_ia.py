@@ -0,0 +1,243 @@
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from cache_analises import cache_key
+
+# --- Prompt da análise automática (Gemini) ---
+# Compartilhado pela página de análise individual e por pregerar_analises.py,
+# para que a tabela, o prompt e a chave do cache sejam idênticos nos dois lados:
+# uma análise gerada em lote é encontrada no cache pela página.
+
+MODELO_GEMINI = 'gemini-2.5-pro-exp-03-25' # Alterado de gemini-1.5-flash
+# Incrementar ao alterar o texto do prompt abaixo, para não reaproveitar análises antigas do cache
+VERSAO_PROMPT = 1
+
+COLUNAS_ANALISE = ['COMPETEN', 'Eficiência', 'CNES_LEITOS_SUS', 'SIA_SIH_VALOR', 'HORAS_MEDICOS', 'HORAS_ENFERMAGEM']
+# Nome e formato de cada indicador nas tabelas do prompt (os mesmos da tabela mensal)
+INDICADORES = {
+    'Eficiência': ('Eficiência', '.4f'),
+    'CNES_LEITOS_SUS': ('Leitos SUS', '.0f'),
+    'SIA_SIH_VALOR': ('Produção Total', ',.2f'),
+    'HORAS_MEDICOS': ('Horas Médicos', '.0f'),
+    'HORAS_ENFERMAGEM': ('Horas Enfermagem', '.0f'),
+}
+
+# Orçamento de tokens do prompt: séries longas que não cabem nele são resumidas
+# (trimestres, anos ou só estatísticas e mudanças de nível). O mesmo valor precisa
+# valer para a página e para pregerar_analises.py, senão as chaves do cache diferem.
+ORCAMENTO_TOKENS = int(os.environ.get('ANALISE_ORCAMENTO_TOKENS', 1700))
+# Estimativa local (sem chamar a API): ~4 caracteres por token no texto do Gemini
+CARACTERES_POR_TOKEN = 4
+# Níveis de compactação, do mais ao menos detalhado
+NIVEIS = ['mensal', 'trimestral', 'anual', 'resumo']
+
+
+def chave_analise(cnes, periodo_inicio, periodo_fim, dados_mensais_md):
+    """Chave do cache (cache_analises.py) da análise com o modelo e a versão de prompt atuais."""
+    return cache_key(cnes, periodo_inicio, periodo_fim, dados_mensais_md, MODELO_GEMINI, VERSAO_PROMPT)
+
+
+def formatar_competencia(competencia):
+    """Competência (datetime) no formato MM/YYYY usado no prompt e na chave do cache."""
+    return pd.Timestamp(competencia).strftime('%m/%Y')
+
+
+def tabela_mensal_md(df_cnes):
+    """Tabela Markdown com os dados mensais de um CNES (linhas de select_cnes) para o prompt."""
+    df_analise = df_cnes[COLUNAS_ANALISE].copy()
+
+    # Formatar data para MM/YYYY
+    df_analise['COMPETEN'] = df_analise['COMPETEN'].dt.strftime('%m/%Y')
+
+    # Renomear colunas para clareza no prompt
+    df_analise.rename(columns={
+        'COMPETEN': 'Competência',
+        'CNES_LEITOS_SUS': 'Leitos SUS',
+        'SIA_SIH_VALOR': 'Produção Total',
+        'HORAS_MEDICOS': 'Horas Médicos',
+        'HORAS_ENFERMAGEM': 'Horas Enfermagem'
+    }, inplace=True)
+
+    # Usar floatfmt para formatar números (ajuste as precisões conforme necessário)
+    return df_analise.to_markdown(
+        index=False,
+        floatfmt=(".0s", ".4f", ".0f", ",.2f", ".0f", ".0f") # Formatos: Competencia, Eficiência, Leitos, Prod, HMed, HEnf
+    )
+
+
+def texto_em_partes(response):
+    """Texto de uma resposta em streaming (generate_content(..., stream=True)), parte a parte.
+
+    Partes sem texto (só com metadados ou bloqueadas) são puladas; para exibir
+    com st.write_stream.
+    """
+    for parte in response:
+        # parts/text levantam ValueError quando a parte não tem candidatos
+        if parte.candidates and parte.candidates[0].content.parts:
+            yield parte.text
+
+
+def estimar_tokens(texto):
+    """Estimativa local do número de tokens de um texto."""
+    return math.ceil(len(texto) / CARACTERES_POR_TOKEN)
+
+
+def uso_tokens(response):
+    """(tokens do prompt, tokens da resposta) informados pela API, ou None onde a resposta não traz."""
+    uso = getattr(response, 'usage_metadata', None)
+    if not uso:
+        return None, None
+    return uso.prompt_token_count or None, uso.candidates_token_count or None
+
+
+def tabela_agregada_md(df_cnes, por):
+    """Tabela Markdown com as médias mensais de cada indicador por trimestre ou por ano."""
+    competen = df_cnes['COMPETEN']
+    ano = competen.dt.year.astype(str)
+    rotulos = ('T' + competen.dt.quarter.astype(str) + '/' + ano) if por == 'trimestre' else ano
+    # df_cnes já vem ordenado por COMPETEN, então sort=False mantém a ordem cronológica
+    grupos = df_cnes[list(INDICADORES)].groupby(rotulos.to_numpy(), sort=False)
+    tabela = grupos.mean()
+    tabela.insert(0, 'Meses', grupos.size())
+    tabela = tabela.rename(columns={col: nome for col, (nome, _) in INDICADORES.items()})
+    tabela.index.name = por.capitalize()
+    return tabela.reset_index().to_markdown(
+        index=False,
+        floatfmt=(".0s", ".0f") + tuple(fmt for _, fmt in INDICADORES.values())
+    )
+
+
+def resumo_md(df_cnes):
+    """Tabela Markdown com início, fim, média, extremos e tendência anual de cada indicador."""
+    meses = df_cnes['COMPETEN'].dt.strftime('%m/%Y').to_numpy()
+    tempo = (df_cnes['COMPETEN'].dt.year * 12 + df_cnes['COMPETEN'].dt.month).to_numpy(dtype=float) / 12
+    linhas = []
+    for col, (nome, fmt) in INDICADORES.items():
+        valores = df_cnes[col].to_numpy(dtype=float)
+        validos = ~np.isnan(valores)
+        if not validos.any():
+            continue
+        v, t, m = valores[validos], tempo[validos], meses[validos]
+        variacao = f"{(v[-1] / v[0] - 1) * 100:+.1f}%" if v[0] else '-'
+        tendencia = f"{np.polyfit(t, v, 1)[0]:+{fmt}}" if len(v) > 1 and np.ptp(t) > 0 else '-'
+        linhas.append([
+            nome, f"{v[0]:{fmt}}", f"{v[-1]:{fmt}}", variacao, f"{v.mean():{fmt}}",
+            f"{v.min():{fmt}} ({m[v.argmin()]})", f"{v.max():{fmt}} ({m[v.argmax()]})", tendencia,
+        ])
+    return pd.DataFrame(linhas, columns=[
+        'Indicador', 'Início', 'Fim', 'Variação', 'Média', 'Mínimo (mês)', 'Máximo (mês)', 'Tendência por ano'
+    ]).to_markdown(index=False, disable_numparse=True)
+
+
+def pontos_de_mudanca(valores, max_pontos=2, tamanho_minimo=3):
+    """Índices em que a média da série muda de nível (segmentação binária por mínimos quadrados).
+
+    Cada divisão precisa reduzir a soma dos quadrados em mais que 2·σ²·ln(n)
+    (penalidade do BIC), com σ estimado pelas diferenças entre meses
+    consecutivos, o que ignora oscilações comuns e a própria tendência suave.
+    """
+    y = np.asarray(valores, dtype=float)
+    n = len(y)
+    if n < 2 * tamanho_minimo:
+        return []
+    sigma = np.median(np.abs(np.diff(y))) / (0.6745 * np.sqrt(2))
+    soma = np.concatenate([[0.0], np.cumsum(y)])
+    soma2 = np.concatenate([[0.0], np.cumsum(y * y)])
+    # A parcela relativa ao total evita aceitar ganhos de arredondamento em séries constantes
+    penalidade = 2 * sigma ** 2 * np.log(n) + 1e-9 * soma2[-1]
+
+    def sse(a, b):
+        return soma2[b] - soma2[a] - (soma[b] - soma[a]) ** 2 / (b - a)
+
+    segmentos, pontos = [(0, n)], []
+    while len(pontos) < max_pontos:
+        melhor = None
+        for a, b in segmentos:
+            for k in range(a + tamanho_minimo, b - tamanho_minimo + 1):
+                ganho = sse(a, b) - sse(a, k) - sse(k, b)
+                if melhor is None or ganho > melhor[0]:
+                    melhor = (ganho, a, k, b)
+        if melhor is None or melhor[0] <= penalidade:
+            break
+        _, a, k, b = melhor
+        segmentos.remove((a, b))
+        segmentos += [(a, k), (k, b)]
+        pontos.append(k)
+    return sorted(pontos)
+
+
+def mudancas_md(df_cnes):
+    """Lista Markdown das mudanças de nível de cada indicador (mês e médias antes e depois)."""
+    meses = df_cnes['COMPETEN'].dt.strftime('%m/%Y').to_numpy()
+    linhas = []
+    for col, (nome, fmt) in INDICADORES.items():
+        valores = df_cnes[col].to_numpy(dtype=float)
+        validos = np.flatnonzero(~np.isnan(valores))
+        v = valores[validos]
+        cortes = [0] + pontos_de_mudanca(v) + [len(v)]
+        for i in range(1, len(cortes) - 1):
+            antes, depois = v[cortes[i - 1]:cortes[i]].mean(), v[cortes[i]:cortes[i + 1]].mean()
+            linhas.append(f"- {nome}: mudança de nível em {meses[validos[cortes[i]]]} (média {antes:{fmt}} -> {depois:{fmt}})")
+    return '\n'.join(linhas) if linhas else "- Nenhuma mudança de nível relevante."
+
+
+def dados_compactos_md(df_cnes, nivel):
+    """Dados de um nível de compactação para o prompt (ver NIVEIS)."""
+    if nivel == 'mensal':
+        return tabela_mensal_md(df_cnes)
+    partes = []
+    if nivel in ('trimestral', 'anual'):
+        por = 'trimestre' if nivel == 'trimestral' else 'ano'
+        partes.append(f"Médias mensais por {por}:\n\n" + tabela_agregada_md(df_cnes, por))
+    partes.append("Resumo do período:\n\n" + resumo_md(df_cnes))
+    partes.append("Mudanças de nível detectadas:\n\n" + mudancas_md(df_cnes))
+    return '\n\n'.join(partes)
+
+
+def compactar_dados(df_cnes, cnes, periodo_inicio, periodo_fim, orcamento=ORCAMENTO_TOKENS, contar_tokens=estimar_tokens):
+    """(dados, nível, tokens) do nível mais detalhado cujo prompt cabe no orçamento de tokens.
+
+    contar_tokens recebe o prompt e devolve o número de tokens (a estimativa
+    local por padrão; pode ser lambda p: model.count_tokens(p).total_tokens).
+    Se nem o resumo couber, é usado assim mesmo; orcamento=None mantém a tabela mensal.
+    """
+    for nivel in NIVEIS:
+        dados = dados_compactos_md(df_cnes, nivel)
+        tokens = contar_tokens(montar_prompt(cnes, periodo_inicio, periodo_fim, dados, nivel))
+        if orcamento is None or tokens <= orcamento:
+            break
+    return dados, nivel, tokens
+
+
+def montar_prompt(cnes, periodo_inicio, periodo_fim, dados_mensais_md, nivel='mensal'):
+    """Prompt detalhado com contexto DEA e os dados do nível de compactação dado."""
+    if nivel == 'mensal':
+        titulo_dados = "Dados Mensais para Análise (Formato Markdown)"
+    else:
+        titulo_dados = "Dados para Análise (série resumida para caber no limite de tokens; Formato Markdown)"
+    return f"""
+        **Tarefa:** Analisar a evolução da eficiência do hospital com CNES {cnes} durante o período de {periodo_inicio} a {periodo_fim}.
+
+        **Contexto da Análise:**
+        - **Métrica Principal:** Eficiência, calculada via Análise Envoltória de Dados (DEA), com score variando de 0 (menos eficiente) a 1 (mais eficiente).
+        - **Fatores Considerados (Inputs DEA):** CNES_SALAS (Número de Salas), CNES_LEITOS_SUS (Número de Leitos SUS), HORAS_MEDICOS (Total de Horas Médicas), HORAS_ENFERMAGEM (Total de Horas de Enfermagem).
+        - **Resultado Medido (Output DEA):** SIA_SIH_VALOR (Valor da Produção Ambulatorial e Hospitalar).
+        - **Interpretação da Eficiência DEA:** A eficiência indica a capacidade do hospital em gerar produção (output) a partir dos recursos utilizados (inputs).
+            - Aumento de inputs sem aumento proporcional de output -> tende a *diminuir* a eficiência.
+            - Redução de inputs mantendo/aumentando output -> tende a *aumentar* a eficiência.
+            - Aumento de output sem aumento proporcional de inputs -> tende a *aumentar* a eficiência.
+
+        **{titulo_dados}:**
+        {dados_mensais_md}
+
+        **Instruções para a Resposta:**
+        1.  **Formato:** Gere uma análise textual concisa (aproximadamente 3 a 5 frases) em português brasileiro.
+        2.  **Foco Exclusivo:** Baseie sua análise *estritamente* nos dados fornecidos na tabela (Eficiência, Leitos, Salas, Produção, Horas Médicos, Horas Enfermagem) e no período especificado.
+        3.  **Conteúdo da Análise:** Descreva as principais tendências da *Eficiência* durante o período. **Verifique e comente explicitamente na análise se as variações na eficiência (aumentos, diminuições, estabilidade) são coerentes com as mudanças observadas nos inputs (Leitos, Salas, Horas) e no output (Produção), aplicando a lógica de interpretação DEA fornecida.**
+        4.  **Restrição Crucial:** *Não* faça suposições sobre causas externas, não ofereça recomendações, sugestões de melhoria ou qualquer análise que extrapole a observação direta dos dados e suas correlações internas conforme a lógica DEA explicada.
+              *Não citar lógica DEA expressamente no texto final*, use a lógica apenas para seu raciocínio.
+
+        """
@@ -0,0 +1,92 @@
+import pandas as pd
+import numpy as np
+import os
+
+# --- Leitura do armazenamento Parquet, sem Streamlit ---
+# Usada pelas páginas (via dados_eficiencia.py, que acrescenta o cache do Streamlit)
+# e por scripts de linha de comando, como pregerar_analises.py.
+
+# Armazenamento Parquet particionado por ano (gerado por concat_csv_to_xlsx.py)
+PARQUET_DIRNAME = 'resultado_eficiencia_parquet'
+parquet_dir_path = os.path.join(os.getcwd(), PARQUET_DIRNAME)
+
+NUMERIC_COLS = ['CNES_SALAS', 'CNES_LEITOS_SUS', 'HORAS_MEDICOS', 'HORAS_ENFERMAGEM', 'SIA_SIH_VALOR', 'Eficiência']
+# Valores em reais ficam em float64, para não mudar os centavos exibidos
+MONETARY_COLS = ['SIA_SIH_VALOR']
+COLUMNS = ['CNES'] + NUMERIC_COLS + ['COMPETEN']
+
+
+def competen_to_datetime(competen):
+    """Converte COMPETEN inteiro (YYYYMM) em datetime64 no primeiro dia do mês."""
+    competen = competen.astype('int32')
+    return pd.to_datetime(
+        {'year': competen // 100, 'month': competen % 100, 'day': 1}
+    ).astype('datetime64[s]')
+
+
+def read_compact(file_path=parquet_dir_path):
+    """Lê o armazenamento e devolve um DataFrame compacto, sem colunas object.
+
+    - CNES: category (códigos de 7 dígitos)
+    - COMPETEN: datetime64 no primeiro dia do mês (o armazenamento guarda YYYYMM inteiro)
+    - medidas: float32, exceto os valores em reais (MONETARY_COLS), em float64
+      (valores não numéricos viram NaN)
+
+    As linhas são ordenadas uma única vez por (CNES, COMPETEN) (ver sort_by_cnes).
+    """
+    df = pd.read_parquet(file_path, columns=COLUMNS)
+    df['COMPETEN'] = competen_to_datetime(df['COMPETEN'])
+    for col in NUMERIC_COLS:
+        df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64' if col in MONETARY_COLS else 'float32')
+    return sort_by_cnes(df)
+
+
+def sort_by_cnes(df):
+    """Ordena as linhas por (CNES, COMPETEN), com as categorias de CNES em ordem crescente.
+
+    É a ordem que o índice de build_cnes_index pressupõe; usada por read_compact
+    e pelas tabelas por CNES e competência dos scripts DEA.
+    """
+    cnes = df['CNES'].astype('category')
+    df['CNES'] = cnes.cat.set_categories(sorted(cnes.cat.remove_unused_categories().cat.categories))
+    return df.sort_values(by=['CNES', 'COMPETEN'], kind='stable').reset_index(drop=True)
+
+
+def build_cnes_index(df):
+    """Índice CNES -> faixa de linhas, para um DataFrame ordenado por sort_by_cnes (ex.: read_compact).
+
+    Retorna (cnes, offsets): cnes é o array ordenado de códigos e as linhas do
+    i-ésimo CNES são df.iloc[offsets[i]:offsets[i + 1]], já ordenadas por COMPETEN.
+    """
+    cnes = np.asarray(df['CNES'].cat.categories, dtype=object)
+    codes = df['CNES'].cat.codes.to_numpy()
+    offsets = np.searchsorted(codes, np.arange(len(cnes) + 1), side='left')
+    return cnes, offsets
+
+
+def select_cnes(df, cnes_index, cnes, inicio=None, fim=None):
+    """Linhas de um CNES entre as competências inicio e fim (inclusive), ordenadas por COMPETEN.
+
+    Usa buscas binárias no índice e em COMPETEN dentro da faixa do CNES, sem
+    percorrer nem reordenar o DataFrame inteiro.
+    """
+    codes, offsets = cnes_index
+    i = np.searchsorted(codes, cnes)
+    if i >= len(codes) or codes[i] != cnes:
+        return df.iloc[0:0]
+    start, stop = offsets[i], offsets[i + 1]
+    competen = df['COMPETEN'].to_numpy()[start:stop]
+    if inicio is not None:
+        start_offset = np.searchsorted(competen, np.datetime64(inicio, 's'), side='left')
+    else:
+        start_offset = 0
+    if fim is not None:
+        stop_offset = np.searchsorted(competen, np.datetime64(fim, 's'), side='right')
+    else:
+        stop_offset = len(competen)
+    return df.iloc[start + start_offset:start + stop_offset]
+
+
+def memory_footprint_mb(df):
+    """Memória ocupada pelo DataFrame (incluindo categorias), em MB."""
+    return df.memory_usage(deep=True).sum() / (1024 * 1024)
@@ -0,0 +1,258 @@
+"""Benchmark e teste de regressão do motor DEA (dea.py), nos CSVs anuais e em painéis sintéticos.
+
+Uso (na raiz do projeto):
+
+    python benchmarks/bench_dea.py                          # CSVs reais + sintéticos de 10k e 50k DMUs/mês
+    python benchmarks/bench_dea.py --anos 2024 --tamanhos 10000 --meses 2
+    python benchmarks/bench_dea.py --rts vrs --sem-sinteticos
+    python benchmarks/bench_dea.py --gravar-referencia       # fixa os scores atuais como referência
+
+Para cada conjunto, mede por competência o tempo, as DMUs avaliadas por segundo
+(cada DMU é um LP do modelo envoltório, ainda que resolvidos em lote ou pela
+enumeração de vértices), as chamadas ao linprog e o pico de memória residente
+do processo (ru_maxrss, que inclui a memória alocada pelo HiGHS em C++ e não é
+vista pelo tracemalloc). O pico é o máximo desde o início do processo: o valor
+de um mês só sobe quando ele passa dos anteriores, o que aponta as competências
+que pedem mais memória. Nos CSVs reais, compara os scores com a coluna Eficiência. Em
+todos os conjuntos, compara com os scores de referência gravados por uma
+execução anterior com --gravar-referencia: uma diferença acima de --tolerancia é
+uma regressão e o script termina com código 1.
+
+Os resumos de cada execução (com o commit atual) são acrescentados a
+benchmarks/resultados/bench_dea.jsonl, e a execução anterior do mesmo conjunto
+é mostrada ao lado para comparação entre commits.
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource  # Indisponível no Windows; usado só para relatar o pico de memória
+except ImportError:
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import dea  # noqa: E402
+from dea import INPUT_COLS, OUTPUT_COLS, SCORE_COL, month_arrays, score_month  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'resultados')
+HISTORY_FILENAME = 'bench_dea.jsonl'
+CSV_PATTERN = 'eficiencia_resultados_*.csv'
+DEFAULT_SIZES = [10_000, 50_000]
+DEFAULT_SYNTHETIC_MONTHS = 3
+DEFAULT_TOLERANCE = 1e-6
+SEED = 2024
+
+# Chamadas ao linprog feitas pelo dea.py, contadas durante o benchmark
+_linprog_calls = [0]
+_linprog = dea.linprog
+
+
+def _counting_linprog(*args, **kwargs):
+    _linprog_calls[0] += 1
+    return _linprog(*args, **kwargs)
+
+
+dea.linprog = _counting_linprog
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss é em KB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def read_real(anos=None):
+    """Linhas dos CSVs anuais (CNES, insumos, produto, Eficiência, COMPETEN)."""
+    frames = []
+    for path in sorted(glob.glob(os.path.join(ROOT, CSV_PATTERN))):
+        ano = int(os.path.basename(path).rsplit('_', 1)[1].split('.')[0])
+        if anos and ano not in anos:
+            continue
+        frames.append(pd.read_csv(
+            path, usecols=['CNES'] + INPUT_COLS + OUTPUT_COLS + [SCORE_COL, 'COMPETEN'], dtype={'CNES': str}
+        ))
+    return pd.concat(frames, ignore_index=True)
+
+
+def synthetic(real, n, months, seed=SEED):
+    """Painel sintético de `months` competências com n DMUs cada.
+
+    Cada DMU é uma linha real (avaliável) da última competência, sorteada com
+    reposição e com insumos e produto multiplicados por ruído lognormal, então as
+    n DMUs são distintas e mantêm as proporções dos hospitais reais.
+    """
+    rng = np.random.default_rng([seed, n, months])
+    base = real[real['COMPETEN'] == real['COMPETEN'].max()]
+    X, Y, valid = month_arrays(base)
+    X, Y = X[valid], Y[valid]
+    frames = []
+    for k in range(months):
+        rows = rng.integers(0, len(X), size=n)
+        frame = pd.DataFrame(X[rows] * rng.lognormal(0, 0.25, size=(n, X.shape[1])), columns=INPUT_COLS)
+        frame[OUTPUT_COLS] = Y[rows] * rng.lognormal(0, 0.25, size=(n, Y.shape[1]))
+        frame['CNES'] = [f'S{i:07d}' for i in range(n)]
+        frame['COMPETEN'] = 209001 + k
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def run(nome, df, rts):
+    """Avalia cada competência de df; retorna (linhas por mês, scores alinhados a df)."""
+    df = df.sort_values(['COMPETEN', 'CNES'], kind='stable').reset_index(drop=True)
+    scores = np.full(len(df), np.nan)
+    meses = []
+    print(f"\n=== {nome}: {len(df):,} DMUs, {df['COMPETEN'].nunique()} competências ({rts}) ===")
+    print(f"{'competência':<12} {'DMUs':>8} {'tempo (s)':>10} {'DMUs/s':>10} {'linprog':>8} {'pico RSS (MB)':>14} {'fronteira':>10}")
+    for competen, rows in df.groupby('COMPETEN', sort=True).indices.items():
+        X, Y, _ = month_arrays(df.iloc[rows])
+        _linprog_calls[0] = 0
+        start = time.perf_counter()
+        month_scores, frontier = score_month(X, Y, rts)
+        elapsed = time.perf_counter() - start
+        peak = peak_rss_mb()
+        scores[rows] = month_scores
+        mes = {
+            'competen': int(competen), 'dmus': len(rows), 'tempo_s': elapsed, 'dmus_por_s': len(rows) / elapsed,
+            'linprog': _linprog_calls[0], 'pico_rss_mb': peak, 'fronteira': len(frontier),
+        }
+        meses.append(mes)
+        print(
+            f"{competen:<12} {mes['dmus']:>8,} {elapsed:>10.3f} {mes['dmus_por_s']:>10,.0f} "
+            f"{mes['linprog']:>8,} {mes['pico_rss_mb'] or float('nan'):>14.1f} {mes['fronteira']:>10,}"
+        )
+    return df, meses, scores
+
+
+def reference_path(nome, rts):
+    return os.path.join(RESULTS_DIR, f"referencia_{nome}_{rts}.parquet")
+
+
+def compare_reference(nome, rts, df, scores):
+    """Diferença máxima contra os scores de referência do conjunto, ou None se não há referência."""
+    path = reference_path(nome, rts)
+    if not os.path.exists(path):
+        return None
+    reference = pd.read_parquet(path)
+    current = pd.DataFrame({'CNES': df['CNES'], 'COMPETEN': df['COMPETEN'], 'score': scores})
+    merged = reference.merge(current, on=['CNES', 'COMPETEN'], how='outer', suffixes=('_ref', ''))
+    both_nan = merged['score'].isna() & merged['score_ref'].isna()
+    diff = (merged['score'] - merged['score_ref']).abs().where(~both_nan, 0.0)
+    # Linhas que só existem de um lado, ou com NaN só de um lado, contam como diferença infinita
+    return float(diff.fillna(np.inf).max())
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def previous_run(nome, rts):
+    """Último resumo gravado do mesmo conjunto e rts, ou None."""
+    path = os.path.join(RESULTS_DIR, HISTORY_FILENAME)
+    if not os.path.exists(path):
+        return None
+    previous = None
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            entry = json.loads(line)
+            if entry['conjunto'] == nome and entry['rts'] == rts:
+                previous = entry
+    return previous
+
+
+def summarize(nome, rts, df, meses, scores, tolerance, save_reference):
+    total = sum(mes['tempo_s'] for mes in meses)
+    summary = {
+        'conjunto': nome, 'rts': rts, 'commit': git_commit(), 'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(), 'maquina': platform.machine(), 'cpus': os.cpu_count(),
+        'dmus': len(df), 'competencias': len(meses), 'tempo_total_s': total,
+        'dmus_por_s': len(df) / total if total else None,
+        'linprog': sum(mes['linprog'] for mes in meses),
+        'pico_rss_mb': peak_rss_mb(),
+        'tempo_max_mes_s': max(mes['tempo_s'] for mes in meses),
+        'meses': meses,
+    }
+    if SCORE_COL in df.columns:
+        stats = dea.compare_scores(df[SCORE_COL], scores)
+        summary['dif_max_eficiencia'] = stats['dif_max']
+        summary['dif_media_eficiencia'] = stats['dif_media']
+    summary['dif_max_referencia'] = compare_reference(nome, rts, df, scores)
+
+    previous = previous_run(nome, rts)
+    print(f"Total: {total:.2f}s, {summary['dmus_por_s']:,.0f} DMUs/s, {summary['linprog']:,} chamadas ao linprog, pico RSS {summary['pico_rss_mb'] or float('nan'):.1f} MB")
+    if previous is not None:
+        print(
+            f"Execução anterior ({previous['commit'] or '?'}, {previous['data']}): {previous['tempo_total_s']:.2f}s, "
+            f"{previous['dmus_por_s']:,.0f} DMUs/s -> {previous['tempo_total_s'] / total:.2f}x"
+        )
+    if 'dif_max_eficiencia' in summary:
+        print(f"Dif. máx. contra a Eficiência dos CSVs: {summary['dif_max_eficiencia']:.4g} (média {summary['dif_media_eficiencia']:.4g})")
+    regression = False
+    if summary['dif_max_referencia'] is None:
+        print("Sem scores de referência para este conjunto (use --gravar-referencia).")
+    else:
+        regression = summary['dif_max_referencia'] > tolerance
+        status = "REGRESSÃO" if regression else "ok"
+        print(f"Dif. máx. contra a referência: {summary['dif_max_referencia']:.3g} ({status}, tolerância {tolerance:g})")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(os.path.join(RESULTS_DIR, HISTORY_FILENAME), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(summary, ensure_ascii=False) + '\n')
+    if save_reference:
+        pd.DataFrame({'CNES': df['CNES'], 'COMPETEN': df['COMPETEN'], 'score': scores}).to_parquet(
+            reference_path(nome, rts), index=False
+        )
+        print(f"Referência gravada em {os.path.relpath(reference_path(nome, rts), ROOT)}")
+    return regression
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--anos', type=int, nargs='*', help="Anos dos CSVs reais (padrão: todos).")
+    parser.add_argument('--rts', choices=['crs', 'vrs'], default='crs', help="Retornos de escala (padrão: crs).")
+    parser.add_argument('--tamanhos', type=int, nargs='*', default=DEFAULT_SIZES, help="DMUs por competência dos painéis sintéticos (padrão: 10000 50000).")
+    parser.add_argument('--meses', type=int, default=DEFAULT_SYNTHETIC_MONTHS, help=f"Competências de cada painel sintético (padrão: {DEFAULT_SYNTHETIC_MONTHS}).")
+    parser.add_argument('--sem-reais', action='store_true', help="Não avalia os CSVs reais.")
+    parser.add_argument('--sem-sinteticos', action='store_true', help="Não avalia os painéis sintéticos.")
+    parser.add_argument('--tolerancia', type=float, default=DEFAULT_TOLERANCE, help=f"Diferença máxima aceita contra a referência (padrão: {DEFAULT_TOLERANCE:g}).")
+    parser.add_argument('--gravar-referencia', action='store_true', help="Grava os scores desta execução como referência de cada conjunto.")
+    args = parser.parse_args()
+
+    real = read_real(args.anos)
+    conjuntos = []
+    if not args.sem_reais:
+        nome = 'reais' if not args.anos else 'reais_' + '_'.join(map(str, sorted(args.anos)))
+        conjuntos.append((nome, real))
+    if not args.sem_sinteticos:
+        for n in args.tamanhos:
+            conjuntos.append((f'sintetico_{n}x{args.meses}', synthetic(real, n, args.meses)))
+
+    regressions = []
+    for nome, df in conjuntos:
+        df, meses, scores = run(nome, df, args.rts)
+        if summarize(nome, args.rts, df, meses, scores, args.tolerancia, args.gravar_referencia):
+            regressions.append(nome)
+    if regressions:
+        print(f"\nRegressão nos scores: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Benchmark: média ponderada por grupo, groupby.apply(weighted_average) x agregacao.grouped_weighted_mean.
+
+Uso (na raiz do projeto, após gerar o armazenamento com concat_csv_to_xlsx.py):
+
+    python benchmarks/bench_media_ponderada.py            # dados reais e sintético 100x
+    python benchmarks/bench_media_ponderada.py --fator 10 # sintético menor
+    python benchmarks/bench_media_ponderada.py --sem-apply-cnes
+
+O conjunto sintético repete os dados reais `fator` vezes com CNES distintos, ou
+seja, `fator` vezes mais hospitais por competência.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agregacao import grouped_weighted_mean  # noqa: E402
+from armazenamento import read_compact  # noqa: E402
+
+
+# Implementação anterior da página de resultados consolidados, mantida aqui como referência
+def weighted_average(group, data_col, weight_col):
+    d = group[data_col]
+    w = group[weight_col]
+    # Filtrar NaNs e pesos <= 0
+    valid_indices = d.notna() & w.notna() & (w > 0)
+    d = d[valid_indices]
+    w = w[valid_indices]
+    if w.sum() == 0:
+        return np.nan
+    return np.average(d, weights=w)
+
+
+def legacy(df, by):
+    return df.groupby(by, observed=True).apply(
+        lambda g: weighted_average(g, 'Eficiência', 'SIA_SIH_VALOR'), include_groups=False
+    )
+
+
+def vectorized(df, by):
+    return grouped_weighted_mean(df, by, 'Eficiência', 'SIA_SIH_VALOR')
+
+
+def synthetic(df, fator):
+    """Repete df `fator` vezes, cada cópia com um novo conjunto de CNES."""
+    categories = df['CNES'].cat.categories
+    codes = df['CNES'].cat.codes.to_numpy().astype(np.int64)
+    n_cat = len(categories)
+    big = pd.DataFrame({
+        col: np.tile(df[col].to_numpy(), fator) for col in df.columns if col != 'CNES'
+    })
+    big_codes = np.concatenate([codes + k * n_cat for k in range(fator)])
+    big_categories = [f'{k:03d}{c}' for k in range(fator) for c in categories]
+    big['CNES'] = pd.Categorical.from_codes(big_codes, categories=big_categories)
+    return big
+
+
+def timed(func, *args, repeat=3):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run(nome, df, chaves, skip_apply):
+    print(f"\n=== {nome}: {len(df):,} linhas, {df['CNES'].nunique():,} CNES ===")
+    print(f"{'chave':<10} {'grupos':>8} {'apply (s)':>10} {'vetorizado (s)':>15} {'ganho':>8} {'dif. máx':>10}")
+    for chave_nome, by in chaves:
+        t_new, new = timed(vectorized, df, by)
+        if chave_nome in skip_apply:
+            print(f"{chave_nome:<10} {len(new):>8,} {'-':>10} {t_new:>15.4f} {'-':>8} {'-':>10}")
+            continue
+        t_old, old = timed(legacy, df, by, repeat=1)
+        diff = np.nanmax(np.abs(old.to_numpy(dtype='float64') - new.reindex(old.index).to_numpy()))
+        print(f"{chave_nome:<10} {len(new):>8,} {t_old:>10.4f} {t_new:>15.4f} {t_old / t_new:>7.0f}x {diff:>10.2e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fator', type=int, default=100, help="Multiplicador do conjunto sintético (padrão: 100).")
+    parser.add_argument('--sem-apply-cnes', action='store_true', help="Não executa o apply por CNES no conjunto sintético (lento).")
+    args = parser.parse_args()
+
+    df = read_compact()
+    df['ANO'] = df['COMPETEN'].dt.year
+    chaves = [
+        ('mês', pd.Grouper(key='COMPETEN', freq='ME')),
+        ('ano', 'ANO'),
+        ('CNES', 'CNES'),
+        ('CNES+ano', ['CNES', 'ANO']),
+    ]
+    run("Dados reais", df, chaves, skip_apply=set())
+
+    big = synthetic(df, args.fator)
+    skip = {'CNES', 'CNES+ano'} if args.sem_apply_cnes else set()
+    run(f"Sintético {args.fator}x", big, chaves, skip_apply=skip)
+
+
+if __name__ == '__main__':
+    main()
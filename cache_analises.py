@@ -0,0 +1,170 @@
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+# --- Cache persistente das análises geradas pelo Gemini ---
+# Um arquivo SQLite compartilhado entre reinícios, deploys e réplicas que usam o
+# mesmo disco. A chave é o hash de tudo o que determina a resposta (CNES,
+# período, tabela de dados, modelo e versão do prompt), então qualquer mudança
+# nos dados gera outra chave e a entrada antiga simplesmente deixa de ser lida,
+# até sair pela validade ou pelo limite de tamanho.
+
+CACHE_PATH = os.environ.get('ANALISES_CACHE_PATH', os.path.join(os.getcwd(), '.cache', 'analises_gemini.sqlite'))
+# Validade das entradas e limites do arquivo (as menos acessadas saem primeiro)
+CACHE_TTL_SECONDS = 30 * 24 * 3600
+CACHE_MAX_ENTRIES = 10_000
+CACHE_MAX_BYTES = 50 * 1024 * 1024
+
+
+def cache_key(cnes, periodo_inicio, periodo_fim, dados_mensais_md, modelo, versao_prompt):
+    """Hash SHA-256 (hex) dos parâmetros que determinam a análise."""
+    payload = json.dumps(
+        [str(cnes), periodo_inicio, periodo_fim, dados_mensais_md, modelo, versao_prompt], ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+@contextlib.contextmanager
+def _connect(path):
+    """Conexão com o cache (criado na primeira vez), confirmada e fechada ao sair."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS analises ('
+        'chave TEXT PRIMARY KEY, texto TEXT NOT NULL, modelo TEXT, criado REAL NOT NULL, '
+        'acessado REAL NOT NULL, tamanho INTEGER NOT NULL)'
+    )
+    conn.execute('CREATE INDEX IF NOT EXISTS analises_acessado ON analises (acessado)')
+    conn.execute('CREATE TABLE IF NOT EXISTS contadores (nome TEXT PRIMARY KEY, valor INTEGER NOT NULL)')
+    # Registro das chamadas ao modelo: tokens enviados e recebidos por análise gerada
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS chamadas ('
+        'quando REAL NOT NULL, chave TEXT, modelo TEXT, nivel TEXT, tokens_estimados INTEGER, '
+        'tokens_prompt INTEGER, tokens_resposta INTEGER, segundos REAL)'
+    )
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _count(conn, nome, n=1):
+    conn.execute(
+        'INSERT INTO contadores (nome, valor) VALUES (?, ?) '
+        'ON CONFLICT(nome) DO UPDATE SET valor = valor + excluded.valor',
+        (nome, n),
+    )
+
+
+def cache_get(chave, path=CACHE_PATH, ttl=CACHE_TTL_SECONDS, contar=True):
+    """Texto guardado para a chave, ou None (ausente ou vencido).
+
+    Atualiza os contadores de acertos e falhas, exceto com contar=False (nova
+    verificação de uma chave já consultada, que não é outra busca do usuário).
+    """
+    agora = time.time()
+    with _connect(path) as conn:
+        row = conn.execute('SELECT texto, criado FROM analises WHERE chave = ?', (chave,)).fetchone()
+        if row is not None and agora - row[1] > ttl:
+            conn.execute('DELETE FROM analises WHERE chave = ?', (chave,))
+            _count(conn, 'expiradas')
+            row = None
+        if row is None:
+            if contar:
+                _count(conn, 'falhas')
+            return None
+        conn.execute('UPDATE analises SET acessado = ? WHERE chave = ?', (agora, chave))
+        if contar:
+            _count(conn, 'acertos')
+        return row[0]
+
+
+def cache_existing(chaves, path=CACHE_PATH, ttl=CACHE_TTL_SECONDS):
+    """Subconjunto das chaves com análise válida no cache, sem mexer nos contadores nem nos acessos."""
+    limite = time.time() - ttl
+    existentes = set()
+    chaves = list(chaves)
+    with _connect(path) as conn:
+        # Consultas em lotes, abaixo do limite de parâmetros do SQLite
+        for inicio in range(0, len(chaves), 500):
+            lote = chaves[inicio:inicio + 500]
+            existentes.update(chave for (chave,) in conn.execute(
+                f'SELECT chave FROM analises WHERE criado >= ? AND chave IN ({",".join("?" * len(lote))})',
+                (limite, *lote),
+            ))
+    return existentes
+
+
+def cache_put(chave, texto, modelo=None, path=CACHE_PATH, ttl=CACHE_TTL_SECONDS,
+              max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+    """Guarda o texto da chave e aplica a validade e os limites de entradas e bytes."""
+    agora = time.time()
+    tamanho = len(texto.encode('utf-8'))
+    with _connect(path) as conn:
+        conn.execute(
+            'INSERT OR REPLACE INTO analises (chave, texto, modelo, criado, acessado, tamanho) VALUES (?, ?, ?, ?, ?, ?)',
+            (chave, texto, modelo, agora, agora, tamanho),
+        )
+        expiradas = conn.execute('DELETE FROM analises WHERE criado < ?', (agora - ttl,)).rowcount
+        # Remove as entradas acessadas há mais tempo até caber nos dois limites
+        n, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM analises').fetchone()
+        removidas = 0
+        if n > max_entries or total > max_bytes:
+            excesso_bytes = total - max_bytes
+            for chave_antiga, tamanho_antigo in conn.execute(
+                'SELECT chave, tamanho FROM analises WHERE chave != ? ORDER BY acessado', (chave,)
+            ).fetchall():
+                if n - removidas <= max_entries and excesso_bytes <= 0:
+                    break
+                conn.execute('DELETE FROM analises WHERE chave = ?', (chave_antiga,))
+                removidas += 1
+                excesso_bytes -= tamanho_antigo
+        _count(conn, 'gravadas')
+        if expiradas:
+            _count(conn, 'expiradas', expiradas)
+        if removidas:
+            _count(conn, 'removidas', removidas)
+
+
+def cache_stats(path=CACHE_PATH):
+    """Contadores (acertos, falhas, gravadas, expiradas, removidas), entradas e bytes do cache."""
+    with _connect(path) as conn:
+        stats = {nome: 0 for nome in ('acertos', 'falhas', 'gravadas', 'expiradas', 'removidas')}
+        stats.update(dict(conn.execute('SELECT nome, valor FROM contadores').fetchall()))
+        stats['entradas'], stats['bytes'] = conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM analises'
+        ).fetchone()
+    return stats
+
+
+def registrar_chamada(chave, modelo, nivel, tokens_estimados, tokens_prompt, tokens_resposta, segundos,
+                      path=CACHE_PATH, ttl=CACHE_TTL_SECONDS):
+    """Registra os tokens (estimados e informados pela API) e a duração de uma chamada ao modelo.
+
+    Registros mais antigos que a validade do cache são descartados.
+    """
+    agora = time.time()
+    with _connect(path) as conn:
+        conn.execute(
+            'INSERT INTO chamadas VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (agora, chave, modelo, nivel, tokens_estimados, tokens_prompt, tokens_resposta, segundos),
+        )
+        conn.execute('DELETE FROM chamadas WHERE quando < ?', (agora - ttl,))
+
+
+def chamadas_stats(path=CACHE_PATH):
+    """Por nível de compactação: chamadas e médias de tokens enviados, tokens recebidos e segundos."""
+    with _connect(path) as conn:
+        rows = conn.execute(
+            'SELECT nivel, COUNT(*), AVG(COALESCE(tokens_prompt, tokens_estimados)), AVG(tokens_resposta), AVG(segundos) '
+            'FROM chamadas GROUP BY nivel'
+        ).fetchall()
+    return {
+        nivel: {'chamadas': n, 'tokens_prompt': prompt, 'tokens_resposta': resposta, 'segundos': segundos}
+        for nivel, n, prompt, resposta, segundos in rows
+    }
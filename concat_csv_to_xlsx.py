@@ -1,65 +1,576 @@
 import pandas as pd
+import numpy as np
+import openpyxl
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import argparse
 import glob
+import hashlib
+import json
 import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-# Get the current directory
-current_directory = os.getcwd()
+from agregacao import grouped_weighted_stats
 
-# Find all CSV files in the current directory
-csv_files = glob.glob(os.path.join(current_directory, '*.csv'))
+try:
+    import resource  # Indisponível no Windows; usado só para relatar o pico de memória
+except ImportError:
+    resource = None
 
-# Exclude the script itself if it happens to be a CSV (unlikely but safe)
-script_name = os.path.basename(__file__)
-if script_name in csv_files:
-    csv_files.remove(script_name)
+# Diretório do armazenamento colunar (um subdiretório ANO=<yyyy> por ano de COMPETEN)
+PARQUET_DIRNAME = 'resultado_eficiencia_parquet'
+# Exportação opcional para Excel
+XLSX_FILENAME = 'resultado_eficiencia.xlsx'
+# Limite de linhas por planilha do Excel (inclui o cabeçalho)
+EXCEL_MAX_ROWS = 1_048_576
+# Arquivos de origem e manifesto da ingestão incremental (gravado dentro do armazenamento)
+CSV_PATTERN = 'eficiencia_resultados_*.csv'
+MANIFEST_FILENAME = '_manifest.json'
+# Agregados mensais materializados na ingestão (lidos pela página de resultados consolidados)
+MONTHLY_AGGREGATES_FILENAME = '_agregados_mensais.parquet'
+# Amostra limitada de outliers do box plot mensal (os mais extremos de cada competência)
+MONTHLY_OUTLIERS_FILENAME = '_outliers_mensais.parquet'
+MAX_OUTLIERS_PER_MONTH = 100
+# Incrementar quando o esquema/normalização mudar, para forçar uma reconstrução completa
+MANIFEST_VERSION = 4
 
-if not csv_files:
-    print("No CSV files found in the current directory.")
-else:
-    print(f"Found {len(csv_files)} CSV files to process:")
-    for f in csv_files:
-        print(f"- {os.path.basename(f)}")
+NUMERIC_COLS = ['CNES_SALAS', 'CNES_LEITOS_SUS', 'HORAS_MEDICOS', 'HORAS_ENFERMAGEM', 'SIA_SIH_VALOR', 'Eficiência']
+# Valores em reais ficam em float64: em float32 os centavos mudam (ex.: 76576.61 -> 76576.609375).
+# As contagens e razões (salas, leitos, horas, Eficiência) são gravadas em float32.
+MONETARY_COLS = ['SIA_SIH_VALOR']
+NUMERIC_TYPES = {col: pa.float64() if col in MONETARY_COLS else pa.float32() for col in NUMERIC_COLS}
 
-    # List to hold DataFrames
-    all_dataframes = []
+# Esquema explícito da leitura dos CSVs. 'Erro' não está aqui e é descartado já na leitura;
+# uma coluna ausente (ex.: Eficiência nos CSVs de insumos_dea.py) é lida como nula.
+CSV_COLUMN_TYPES = dict(
+    [('CNES', pa.string())]
+    + list(NUMERIC_TYPES.items())
+    + [('COMPETEN', pa.int32())]
+)
 
-    # Read each CSV file
+# Esquema tipado do armazenamento: CNES categórico (dicionário de códigos de 7 dígitos),
+# COMPETEN inteiro (YYYYMM) e medidas em NUMERIC_TYPES
+PARQUET_SCHEMA = pa.schema(
+    [('CNES', pa.dictionary(pa.int32(), pa.string()))]
+    + list(NUMERIC_TYPES.items())
+    + [('COMPETEN', pa.int32())]
+)
+
+
+def normalize_table(table):
+    """Pad CNES to 7 digits and cast the parsed table to the store schema.
+
+    Works on Arrow data, so it runs in the same pass as the typed CSV parse
+    instead of a second pandas pass over the combined frame.
+    """
+    cnes = pc.utf8_lpad(table['CNES'], width=7, padding='0')
+    table = table.set_column(table.schema.get_field_index('CNES'), 'CNES', cnes)
+    table = table.sort_by([('CNES', 'ascending'), ('COMPETEN', 'ascending')])
+    table = table.set_column(0, 'CNES', pc.dictionary_encode(table['CNES']))
+    return table.select(PARQUET_SCHEMA.names).cast(PARQUET_SCHEMA)
+
+
+def read_csv_typed(path):
+    """Parse one efficiency CSV with the explicit schema, dropping 'Erro' at read time."""
+    convert_options = pacsv.ConvertOptions(
+        column_types=CSV_COLUMN_TYPES,
+        include_columns=list(CSV_COLUMN_TYPES),
+        include_missing_columns=True,
+    )
+    return normalize_table(pacsv.read_csv(path, convert_options=convert_options))
+
+
+def iter_csv_chunks(path, chunksize):
+    """Yield normalized tables of at most chunksize rows each.
+
+    Only one chunk is held in memory at a time, so memory use depends on the
+    chunk size and not on the size of the file. pandas' chunked reader is used
+    here because the Arrow streaming reader parses ahead of the consumer.
+    """
+    dtype = {'CNES': str, 'COMPETEN': 'int32'}
+    dtype.update({col: NUMERIC_TYPES[col].to_pandas_dtype() for col in NUMERIC_COLS})
+    reader = pd.read_csv(path, delimiter=',', decimal='.', dtype=dtype, usecols=lambda col: col in CSV_COLUMN_TYPES, chunksize=chunksize)
+    with reader:
+        for chunk in reader:
+            chunk = chunk.reindex(columns=list(CSV_COLUMN_TYPES)).astype(dtype)
+            yield normalize_table(pa.Table.from_pandas(chunk, preserve_index=False))
+
+
+def file_signature(path):
+    """Size, mtime and SHA-256 of a source file, as recorded in the manifest."""
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha256.update(block)
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime, 'sha256': sha256.hexdigest()}
+
+
+def load_manifest(output_dir):
+    """Return the manifest of the store, or an empty one if missing/outdated."""
+    manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {'version': MANIFEST_VERSION, 'files': {}}
+    if manifest.get('version') != MANIFEST_VERSION:
+        print("Manifest version changed. Rebuilding the whole store.")
+        return {'version': MANIFEST_VERSION, 'files': {}}
+    return manifest
+
+
+def save_manifest(output_dir, manifest):
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, manifest_path)
+
+
+def plan_changes(csv_files, manifest):
+    """Split the source files into (changed, unchanged, removed) using the manifest.
+
+    Size and mtime are checked first; the content hash is only computed when
+    they differ, so untouched files are not read at all.
+    """
+    known = manifest['files']
+    changed, unchanged = {}, {}
     for file in csv_files:
-        try:
-            # Read CNES as string to preserve leading zeros and allow padding
-            df = pd.read_csv(file, delimiter=',', decimal='.', dtype={'CNES': str})
-            all_dataframes.append(df)
-            print(f"Successfully read {os.path.basename(file)}")
-        except Exception as e:
-            print(f"Error reading {os.path.basename(file)}: {e}")
-
-    # Concatenate all DataFrames if any were successfully read
-    if all_dataframes:
-        combined_df = pd.concat(all_dataframes, ignore_index=True)
-
-        # Pad CNES with leading zeros to 7 digits
-        if 'CNES' in combined_df.columns:
-            combined_df['CNES'] = combined_df['CNES'].astype(str).str.zfill(7)
+        name = os.path.basename(file)
+        entry = known.get(name)
+        stat = os.stat(file)
+        if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+            unchanged[name] = entry
+            continue
+        signature = file_signature(file)
+        if entry and entry['sha256'] == signature['sha256']:
+            # Só o mtime mudou (ex.: arquivo copiado de novo); conteúdo idêntico
+            unchanged[name] = dict(entry, mtime=signature['mtime'])
         else:
-            print("Warning: 'CNES' column not found. Skipping padding.")
+            changed[name] = signature
+    current = {os.path.basename(f) for f in csv_files}
+    removed = sorted(name for name in known if name not in current)
+    return changed, unchanged, removed
 
-        # Drop the 'Erro' column if it exists
-        if 'Erro' in combined_df.columns:
-            combined_df = combined_df.drop(columns=['Erro'])
-            print("Dropped 'Erro' column.")
-        else:
-            print("Warning: 'Erro' column not found. Skipping drop.")
-
-        # Define the output Excel file name
-        output_filename = 'resultado_eficiencia.xlsx'
-        output_path = os.path.join(current_directory, output_filename)
-
-        # Save the combined DataFrame to an Excel file
-        try:
-            # index=False prevents writing the DataFrame index as a column
-            combined_df.to_excel(output_path, index=False, engine='openpyxl')
-            print(f"\nSuccessfully combined CSV files into {output_filename}")
-        except Exception as e:
-            print(f"\nError writing to Excel file {output_filename}: {e}")
+
+def remove_partitions(output_dir, entry):
+    """Delete the partition files written for one source file."""
+    for rel_path in entry.get('partitions', []):
+        path = os.path.join(output_dir, rel_path)
+        if os.path.exists(path):
+            os.remove(path)
+        partition_dir = os.path.dirname(path)
+        if os.path.isdir(partition_dir) and not os.listdir(partition_dir):
+            os.rmdir(partition_dir)
+
+
+def clear_store(output_dir):
+    """Delete the ANO=<yyyy> partitions and the manifest, for a full rebuild.
+
+    Everything else in the store is kept: the monthly tables are rewritten by
+    the rebuild, and the tables of the DEA scripts (_eficiencia_dea,
+    _bootstrap_dea, ...) detect stale years themselves.
+    """
+    for partition_dir in glob.glob(os.path.join(output_dir, 'ANO=*')):
+        shutil.rmtree(partition_dir)
+    manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+
+def partition_paths(output_dir, ano, part_name):
+    """Final path of a part file and the hidden temporary path it is written to.
+
+    Files starting with '.' are ignored by Parquet dataset readers, so a
+    partially written part is never visible to the pages.
+    """
+    partition_dir = os.path.join(output_dir, f'ANO={ano}')
+    os.makedirs(partition_dir, exist_ok=True)
+    final_path = os.path.join(partition_dir, part_name)
+    return final_path, os.path.join(partition_dir, f'.{part_name}.tmp')
+
+
+def write_parquet_partitions(table, output_dir, source_name):
+    """Write the rows of one source file under output_dir/ANO=<yyyy>/<source>.parquet.
+
+    Each source file owns its own part file inside every year partition it
+    touches, so replacing one source never rewrites the data of another.
+    Returns the list of written paths, relative to output_dir.
+    """
+    written = []
+    part_name = os.path.splitext(source_name)[0] + '.parquet'
+    anos = pc.divide(table['COMPETEN'], 100)
+    for ano in sorted(pc.unique(anos).to_pylist()):
+        final_path, tmp_path = partition_paths(output_dir, ano, part_name)
+        pq.write_table(table.filter(pc.equal(anos, ano)), tmp_path)
+        os.replace(tmp_path, final_path)
+        written.append(f'ANO={ano}/{part_name}')
+    return written
+
+
+def stream_parquet_partitions(path, output_dir, chunksize):
+    """Streaming variant of read_csv_typed + write_parquet_partitions.
+
+    Chunks are appended as row groups to one open ParquetWriter per year, so
+    no more than one chunk of the source is ever materialized.
+    Returns (rows, written partitions).
+    """
+    part_name = os.path.splitext(os.path.basename(path))[0] + '.parquet'
+    writers = {}
+    rows = 0
+    try:
+        for table in iter_csv_chunks(path, chunksize):
+            rows += table.num_rows
+            anos = pc.divide(table['COMPETEN'], 100)
+            for ano in pc.unique(anos).to_pylist():
+                if ano not in writers:
+                    final_path, tmp_path = partition_paths(output_dir, ano, part_name)
+                    writers[ano] = (pq.ParquetWriter(tmp_path, PARQUET_SCHEMA), tmp_path, final_path)
+                writers[ano][0].write_table(table.filter(pc.equal(anos, ano)))
+    except Exception:
+        for writer, tmp_path, _ in writers.values():
+            writer.close()
+            os.remove(tmp_path)
+        raise
+    written = []
+    for ano in sorted(writers):
+        writer, tmp_path, final_path = writers[ano]
+        writer.close()
+        os.replace(tmp_path, final_path)
+        written.append(f'ANO={ano}/{part_name}')
+    return rows, written
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss é em KB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def ingest_file(path, output_dir, chunksize=None):
+    """Parse, normalize and write the partitions of one CSV (runs in a worker process).
+
+    With chunksize the file is streamed in chunks of that many rows;
+    otherwise it is parsed at once. Returns a dict with the written
+    partitions, the per-file throughput and the peak RSS of the process.
+    """
+    start = time.perf_counter()
+    if chunksize:
+        rows, partitions = stream_parquet_partitions(path, output_dir, chunksize)
     else:
-        print("\nNo dataframes were created. Cannot generate Excel file.") 
\ No newline at end of file
+        table = read_csv_typed(path)
+        rows = table.num_rows
+        partitions = write_parquet_partitions(table, output_dir, os.path.basename(path))
+    elapsed = time.perf_counter() - start
+    return {
+        'rows': rows,
+        'partitions': partitions,
+        'seconds': elapsed,
+        'size': os.path.getsize(path),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def report_throughput(name, result):
+    seconds = max(result['seconds'], 1e-9)
+    rss = f", peak RSS {result['peak_rss_mb']:.0f} MB" if result.get('peak_rss_mb') else ""
+    print(
+        f"- {name}: {result['rows']} rows in {seconds:.2f}s "
+        f"({result['rows'] / seconds:,.0f} rows/s, {result['size'] / seconds / 1e6:.1f} MB/s{rss}) "
+        f"-> {', '.join(result['partitions'])}"
+    )
+
+
+def ingest_files(paths, output_dir, jobs, chunksize=None):
+    """Ingest the given CSV files, concurrently on `jobs` processes when jobs > 1.
+
+    Yields (name, result) pairs; result is None when the file could not be read.
+    """
+    if jobs <= 1 or len(paths) <= 1:
+        for path in paths:
+            name = os.path.basename(path)
+            try:
+                yield name, ingest_file(path, output_dir, chunksize)
+            except Exception as e:
+                print(f"Error reading {name}: {e}")
+                yield name, None
+        return
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(paths))) as executor:
+        futures = {executor.submit(ingest_file, path, output_dir, chunksize): os.path.basename(path) for path in paths}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                yield name, future.result()
+            except Exception as e:
+                print(f"Error reading {name}: {e}")
+                yield name, None
+
+
+def monthly_aggregates(df):
+    """Per-COMPETEN aggregates of Eficiência used by the consolidated page.
+
+    The weighted sums come from grouped_weighted_stats (rows with a missing
+    value or SIA_SIH_VALOR <= 0 are left out), so summing them over any set of
+    months and dividing reproduces the weighted mean of those months exactly.
+    Also holds the box plot statistics: quartiles and the whisker ends
+    (Tukey, last values within 1.5 IQR of the quartiles).
+    """
+    eficiencia = df['Eficiência'].astype('float64')
+    groups = eficiencia.groupby(df['COMPETEN'], sort=True)
+    ponderada = grouped_weighted_stats(df, 'COMPETEN', 'Eficiência', 'SIA_SIH_VALOR')
+    aggregates = pd.DataFrame({
+        'n_eficiencia': groups.count().astype('int32'),
+        'soma_eficiencia': groups.sum(),
+        'soma_eficiencia_ponderada': ponderada['soma_ponderada'],
+        'soma_pesos': ponderada['soma_pesos'],
+        'eficiencia_min': groups.min(),
+        'eficiencia_q1': groups.quantile(0.25),
+        'eficiencia_mediana': groups.median(),
+        'eficiencia_q3': groups.quantile(0.75),
+        'eficiencia_max': groups.max(),
+    })
+    low_fence, high_fence = tukey_fences(df, aggregates)
+    inside = eficiencia.between(low_fence, high_fence)
+    aggregates['bigode_inferior'] = eficiencia.where(inside).groupby(df['COMPETEN'], sort=True).min()
+    aggregates['bigode_superior'] = eficiencia.where(inside).groupby(df['COMPETEN'], sort=True).max()
+    return aggregates.reset_index()
+
+
+def tukey_fences(df, aggregates):
+    """Row-aligned lower/upper outlier fences (q1 - 1.5 IQR, q3 + 1.5 IQR) of each row's month."""
+    q1 = df['COMPETEN'].map(aggregates['eficiencia_q1'])
+    q3 = df['COMPETEN'].map(aggregates['eficiencia_q3'])
+    iqr = q3 - q1
+    return q1 - 1.5 * iqr, q3 + 1.5 * iqr
+
+
+def monthly_outliers(df, aggregates, max_per_month=MAX_OUTLIERS_PER_MONTH):
+    """Box plot outliers of each COMPETEN, capped at the max_per_month most extreme ones."""
+    eficiencia = df['Eficiência'].astype('float64')
+    low_fence, high_fence = tukey_fences(df, aggregates.set_index('COMPETEN'))
+    distance = np.maximum(low_fence - eficiencia, eficiencia - high_fence)
+    outliers = df.loc[distance > 0, ['COMPETEN', 'CNES', 'Eficiência']].assign(distancia=distance[distance > 0])
+    outliers = outliers.sort_values(['COMPETEN', 'distancia'], ascending=[True, False])
+    outliers = outliers.groupby('COMPETEN', sort=False).head(max_per_month)
+    outliers['CNES'] = outliers['CNES'].astype(str)
+    return outliers.drop(columns='distancia').reset_index(drop=True)
+
+
+def monthly_tables(df):
+    """Tables materialized per month at ingest time, keyed by file name."""
+    aggregates = monthly_aggregates(df)
+    return {
+        MONTHLY_AGGREGATES_FILENAME: aggregates,
+        MONTHLY_OUTLIERS_FILENAME: monthly_outliers(df, aggregates),
+    }
+
+
+def store_years(output_dir):
+    return sorted(int(os.path.basename(p).split('=', 1)[1]) for p in glob.glob(os.path.join(output_dir, 'ANO=*')))
+
+
+def iter_year_months(output_dir, ano, columns, batch_size=65_536):
+    """Yield the rows of each COMPETEN of one year partition, one month at a time.
+
+    The months are listed from the COMPETEN column in batches, and each month
+    is read with a filter, so only one month (plus one record batch) is held
+    in memory, not the whole year.
+    """
+    dataset = ds.dataset(os.path.join(output_dir, f'ANO={ano}'), format='parquet')
+    competens = set()
+    for batch in dataset.to_batches(columns=['COMPETEN'], batch_size=batch_size):
+        competens.update(pc.unique(batch.column(0)).to_pylist())
+    for competen in sorted(competens):
+        yield dataset.to_table(columns=columns, filter=ds.field('COMPETEN') == competen, batch_size=batch_size).to_pandas()
+
+
+def update_monthly_aggregates(output_dir, anos=None):
+    """Recompute the monthly tables (aggregates, outliers) of the given years (all years if None).
+
+    Months never span partitions, so each year is computed from its own
+    partition only and the other years are kept from the previous tables.
+    Every table is per month, so each month is read and computed on its own
+    (iter_year_months): peak memory is bounded by the largest month.
+    """
+    paths = {name: os.path.join(output_dir, name) for name in (MONTHLY_AGGREGATES_FILENAME, MONTHLY_OUTLIERS_FILENAME)}
+    present = store_years(output_dir)
+    frames = {name: [] for name in paths}
+    if anos is None or not all(os.path.exists(path) for path in paths.values()):
+        recompute = present
+    else:
+        recompute = [ano for ano in present if ano in anos]
+        for name, path in paths.items():
+            existing = pd.read_parquet(path)
+            keep = (existing['COMPETEN'] // 100).isin([ano for ano in present if ano not in anos])
+            frames[name].append(existing[keep])
+    for ano in recompute:
+        for df_mes in iter_year_months(output_dir, ano, ['CNES', 'COMPETEN', 'Eficiência', 'SIA_SIH_VALOR']):
+            for name, table in monthly_tables(df_mes).items():
+                frames[name].append(table)
+    for name, path in paths.items():
+        if not frames[name]:
+            continue
+        table = pd.concat(frames[name], ignore_index=True).sort_values('COMPETEN', kind='stable')
+        tmp_path = os.path.join(output_dir, f'.{name}.tmp')
+        table.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    print(f"Updated monthly aggregates and outliers (recomputed years: {', '.join(map(str, recompute)) or '-'})")
+
+
+def partition_years(partitions):
+    return {int(p.split('/', 1)[0].split('=', 1)[1]) for p in partitions}
+
+
+def iter_store_batches(output_dir, batch_size=65_536):
+    """Yield (ano, record batch) for every part file of the store, in year order."""
+    for partition in sorted(glob.glob(os.path.join(output_dir, 'ANO=*'))):
+        ano = int(os.path.basename(partition).split('=', 1)[1])
+        for part in sorted(glob.glob(os.path.join(partition, '*.parquet'))):
+            for batch in pq.ParquetFile(part).iter_batches(batch_size=batch_size, columns=PARQUET_SCHEMA.names):
+                yield ano, batch
+
+
+def excel_values(column):
+    """Python values of one store column for the workbook.
+
+    float32 measures are written as the shortest decimal that round-trips in
+    float32 (20.333334, not the 20.33333396911621 of a plain widening), so the
+    export shows the precision actually stored; float64 columns are unchanged.
+    """
+    if column.type == pa.float32():
+        column = pc.cast(pc.cast(column, pa.string()), pa.float64())
+    return column.to_pylist()
+
+
+def write_xlsx(output_dir, output_path, sheet_per_year=False, max_rows=EXCEL_MAX_ROWS):
+    """Optional export of the store to Excel, streaming rows in write-only mode.
+
+    Rows go straight from the Parquet batches to the workbook, so memory stays
+    flat regardless of the number of rows. A new sheet is started whenever the
+    current one reaches Excel's row limit, or for every year with sheet_per_year.
+    """
+    header = PARQUET_SCHEMA.names
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet, sheet_rows, sheet_ano, sheet_index = None, 0, None, 0
+    total_rows = 0
+
+    def new_sheet(title):
+        worksheet = workbook.create_sheet(title=title)
+        worksheet.append(header)
+        return worksheet
+
+    try:
+        for ano, batch in iter_store_batches(output_dir):
+            if sheet_per_year and ano != sheet_ano:
+                sheet, sheet_ano, sheet_index = None, ano, 0
+            columns = [excel_values(batch.column(name)) for name in header]
+            for row in zip(*columns):
+                if sheet is None or sheet_rows >= max_rows - 1:
+                    sheet_index += 1
+                    if sheet_per_year:
+                        title = str(ano) if sheet_index == 1 else f"{ano}_{sheet_index}"
+                    else:
+                        title = f"Dados_{sheet_index}"
+                    sheet, sheet_rows = new_sheet(title), 0
+                sheet.append(row)
+                sheet_rows += 1
+            total_rows += batch.num_rows
+        if sheet is None:
+            new_sheet('Dados_1')
+        workbook.save(output_path)
+        print(f"\nSuccessfully exported {total_rows} rows to {os.path.basename(output_path)} ({len(workbook.worksheets)} sheet(s))")
+    except Exception as e:
+        print(f"\nError writing to Excel file {os.path.basename(output_path)}: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Combina os CSVs de eficiência em um armazenamento Parquet particionado por ano.")
+    parser.add_argument('--xlsx', action='store_true', help=f"Também exporta o resultado combinado para {XLSX_FILENAME}.")
+    parser.add_argument('--xlsx-sheet-per-year', action='store_true', help="Na exportação Excel, grava uma planilha por ano de COMPETEN.")
+    parser.add_argument('--full', action='store_true', help="Ignora o manifesto e reconstrói todo o armazenamento.")
+    parser.add_argument('--chunksize', type=int, default=None, help="Modo streaming: lê cada CSV em blocos de N linhas e grava direto no armazenamento (memória limitada pelo bloco; os agregados mensais são calculados uma competência por vez, então o pico também depende do maior mês).")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help="Número de processos para ler os CSVs em paralelo (padrão: todos os núcleos; 1 = sequencial).")
+    parser.add_argument('--dea', action='store_true', help="Também atualiza a eficiência recalculada por dea.py, reavaliando só as competências com linhas novas, alteradas ou removidas.")
+    args = parser.parse_args()
+
+    # Get the current directory
+    current_directory = os.getcwd()
+    output_dir = os.path.join(current_directory, PARQUET_DIRNAME)
+
+    # Find the yearly efficiency CSV files in the current directory
+    csv_files = sorted(glob.glob(os.path.join(current_directory, CSV_PATTERN)))
+
+    if not csv_files:
+        print(f"No CSV files matching '{CSV_PATTERN}' found in the current directory.")
+        return
+
+    if args.full:
+        clear_store(output_dir)
+    manifest = load_manifest(output_dir)
+    if not manifest['files']:
+        # Armazenamento sem manifesto válido: partições antigas não são rastreáveis
+        clear_store(output_dir)
+
+    changed, unchanged, removed = plan_changes(csv_files, manifest)
+    print(f"Found {len(csv_files)} CSV files: {len(changed)} new/changed, {len(unchanged)} unchanged, {len(removed)} removed.")
+
+    # Anos cujas partições mudaram (para atualizar os agregados mensais)
+    anos_afetados = set()
+    for name in removed:
+        entry = manifest['files'].pop(name)
+        anos_afetados |= partition_years(entry.get('partitions', []))
+        remove_partitions(output_dir, entry)
+        print(f"- Removed partitions of {name}")
+
+    files = dict(unchanged)
+    changed_paths = [file for file in csv_files if os.path.basename(file) in changed]
+    total_start = time.perf_counter()
+    for name, result in ingest_files(changed_paths, output_dir, args.jobs, args.chunksize):
+        previous = manifest['files'].get(name)
+        if result is None:
+            # Mantém as partições anteriores (se houver) quando a leitura falha
+            if previous:
+                files[name] = previous
+            continue
+        if previous:
+            # Remove partições de anos que a nova versão da fonte não contém mais
+            stale = [p for p in previous.get('partitions', []) if p not in result['partitions']]
+            remove_partitions(output_dir, {'partitions': stale})
+        report_throughput(name, result)
+        anos_afetados |= partition_years(result['partitions'])
+        if previous:
+            anos_afetados |= partition_years(previous.get('partitions', []))
+        files[name] = dict(changed[name], rows=result['rows'], partitions=result['partitions'])
+    if changed_paths:
+        print(f"Ingested {len(changed_paths)} files in {time.perf_counter() - total_start:.2f}s using {min(args.jobs, len(changed_paths))} process(es).")
+
+    manifest['files'] = files
+    save_manifest(output_dir, manifest)
+    monthly_paths = [os.path.join(output_dir, name) for name in (MONTHLY_AGGREGATES_FILENAME, MONTHLY_OUTLIERS_FILENAME)]
+    if anos_afetados or not all(os.path.exists(path) for path in monthly_paths):
+        update_monthly_aggregates(output_dir, anos_afetados)
+    if args.dea:
+        # Importado só aqui: o motor DEA traz o scipy, desnecessário na ingestão
+        from dea import update_dea_scores
+
+        update_dea_scores(output_dir, anos_afetados, jobs=args.jobs)
+    if changed or removed:
+        print(f"\nSuccessfully updated {PARQUET_DIRNAME}/")
+    else:
+        print(f"\n{PARQUET_DIRNAME}/ is up to date.")
+
+    if args.xlsx:
+        write_xlsx(output_dir, os.path.join(current_directory, XLSX_FILENAME), sheet_per_year=args.xlsx_sheet_per_year)
+
+
+if __name__ == '__main__':
+    main()
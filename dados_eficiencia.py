@@ -0,0 +1,172 @@
+import streamlit as st
+import pandas as pd
+import os
+
+# Leitura e índice por CNES do armazenamento (sem Streamlit), reexportados para as páginas
+from armazenamento import (
+    parquet_dir_path, build_cnes_index, competen_to_datetime, memory_footprint_mb, read_compact, select_cnes, sort_by_cnes,
+)
+
+# --- Carregamento compartilhado dos dados de eficiência ---
+# Usado por todas as páginas, para que os dados sejam carregados (e tipados) da mesma forma.
+
+# Agregados mensais materializados na ingestão (arquivo '_' é ignorado na leitura do armazenamento)
+MONTHLY_AGGREGATES_FILENAME = '_agregados_mensais.parquet'
+MONTHLY_OUTLIERS_FILENAME = '_outliers_mensais.parquet'
+# Intervalos de confiança bootstrap da eficiência DEA (gerados por dea_bootstrap.py)
+BOOTSTRAP_DIRNAME = '_bootstrap_dea'
+BOOTSTRAP_COLUMNS = ['CNES', 'COMPETEN', 'Eficiência_DEA', 'eficiencia_corrigida', 'ic_inferior', 'ic_superior']
+# Índice de Malmquist entre competências consecutivas (gerado por dea_malmquist.py)
+MALMQUIST_DIRNAME = '_malmquist'
+MALMQUIST_COLUMNS = ['CNES', 'COMPETEN', 'malmquist', 'variacao_eficiencia', 'variacao_tecnologica']
+# Análise de janela DEA (gerada por dea_janela.py): scores por hospital-mês e médias mensais
+WINDOW_DIRNAME = '_janela_dea'
+WINDOW_COLUMNS = ['CNES', 'COMPETEN', 'Eficiência_janela']
+WINDOW_AGGREGATES_FILENAME = '_agregados_janela.parquet'
+
+
+@st.cache_data
+def load_data(file_path=parquet_dir_path):
+    try:
+        return read_compact(file_path)
+    except FileNotFoundError:
+        st.error(f"Erro: Diretório de dados '{os.path.basename(file_path)}' não encontrado.")
+        st.info("Certifique-se de que você executou o script `concat_csv_to_xlsx.py` primeiro.")
+        return None
+    except Exception as e:
+        st.error(f"Erro ao carregar '{os.path.basename(file_path)}': {e}")
+        return None
+
+
+@st.cache_data
+def load_cnes_index(file_path=parquet_dir_path):
+    """Índice por CNES (ver build_cnes_index) dos dados de load_data, calculado uma vez."""
+    df = load_data(file_path)
+    if df is None:
+        return None
+    return build_cnes_index(df)
+
+
+@st.cache_data
+def load_monthly_aggregates(file_path=parquet_dir_path):
+    """Agregados mensais de Eficiência gravados por concat_csv_to_xlsx.py.
+
+    Além das colunas gravadas, inclui media_simples e media_ponderada (por
+    SIA_SIH_VALOR), NaN nos meses sem valores válidos. COMPETEN vem como
+    datetime64 no primeiro dia do mês, como em load_data.
+    """
+    try:
+        aggregates = pd.read_parquet(os.path.join(file_path, MONTHLY_AGGREGATES_FILENAME))
+    except FileNotFoundError:
+        st.error("Erro: Agregados mensais não encontrados. Execute o script `concat_csv_to_xlsx.py` novamente.")
+        return None
+    aggregates['COMPETEN'] = competen_to_datetime(aggregates['COMPETEN'])
+    n = aggregates['n_eficiencia'].where(aggregates['n_eficiencia'] > 0)
+    aggregates['media_simples'] = aggregates['soma_eficiencia'] / n
+    pesos = aggregates['soma_pesos'].where(aggregates['soma_pesos'] > 0)
+    aggregates['media_ponderada'] = aggregates['soma_eficiencia_ponderada'] / pesos
+    return aggregates
+
+
+@st.cache_data
+def load_monthly_outliers(file_path=parquet_dir_path):
+    """Outliers do box plot mensal (limitados por competência) gravados na ingestão."""
+    try:
+        outliers = pd.read_parquet(os.path.join(file_path, MONTHLY_OUTLIERS_FILENAME))
+    except FileNotFoundError:
+        st.error("Erro: Outliers mensais não encontrados. Execute o script `concat_csv_to_xlsx.py` novamente.")
+        return None
+    outliers['COMPETEN'] = competen_to_datetime(outliers['COMPETEN'])
+    return outliers
+
+
+@st.cache_data
+def load_bootstrap_intervals(file_path=parquet_dir_path):
+    """Intervalos bootstrap da eficiência DEA por CNES e competência e o índice por CNES, ou None.
+
+    Retorna (intervals, cnes_index), para consulta com select_cnes. São
+    opcionais (python dea_bootstrap.py), então a ausência não é tratada como erro.
+    """
+    path = os.path.join(file_path, BOOTSTRAP_DIRNAME)
+    if not os.path.isdir(path):
+        return None
+    intervals = pd.read_parquet(path, columns=BOOTSTRAP_COLUMNS)
+    intervals['COMPETEN'] = competen_to_datetime(intervals['COMPETEN'])
+    intervals = sort_by_cnes(intervals)
+    return intervals, build_cnes_index(intervals)
+
+
+@st.cache_data
+def load_malmquist(file_path=parquet_dir_path):
+    """Índice de Malmquist por CNES e competência (mês final do par) e o índice por CNES, ou None.
+
+    Retorna (malmquist, cnes_index), para consulta com select_cnes; None se não
+    foi calculado (python dea_malmquist.py).
+    """
+    path = os.path.join(file_path, MALMQUIST_DIRNAME)
+    if not os.path.isdir(path):
+        return None
+    malmquist = pd.read_parquet(path, columns=MALMQUIST_COLUMNS)
+    malmquist['COMPETEN'] = competen_to_datetime(malmquist['COMPETEN'])
+    malmquist = sort_by_cnes(malmquist)
+    return malmquist, build_cnes_index(malmquist)
+
+
+@st.cache_data
+def load_window_scores(file_path=parquet_dir_path):
+    """Scores da análise de janela DEA por CNES e competência e o índice por CNES, ou None.
+
+    Retorna (window, cnes_index), para consulta com select_cnes; None se não
+    foram calculados (python dea_janela.py).
+    """
+    path = os.path.join(file_path, WINDOW_DIRNAME)
+    if not os.path.isdir(path):
+        return None
+    window = pd.read_parquet(path, columns=WINDOW_COLUMNS)
+    window['COMPETEN'] = competen_to_datetime(window['COMPETEN'])
+    window['Eficiência_janela'] = window['Eficiência_janela'].astype('float32')
+    window = sort_by_cnes(window)
+    return window, build_cnes_index(window)
+
+
+@st.cache_data
+def load_window_aggregates(file_path=parquet_dir_path):
+    """Médias mensais (simples e ponderada) dos scores de janela, ou None se não foram calculadas."""
+    path = os.path.join(file_path, WINDOW_DIRNAME, WINDOW_AGGREGATES_FILENAME)
+    if not os.path.exists(path):
+        return None
+    aggregates = pd.read_parquet(path)
+    aggregates['COMPETEN'] = competen_to_datetime(aggregates['COMPETEN'])
+    return aggregates
+
+
+@st.cache_data
+def load_frontier(competen, rts='crs', file_path=parquet_dir_path):
+    """Fronteira eficiente de uma competência (YYYYMM inteiro): (cnes, X, Y).
+
+    Fica em cache por competência, para que o simulador da página individual só
+    resolva o LP de um hospital contra as poucas unidades da fronteira.
+    """
+    # Importado aqui: o motor DEA traz o scipy, que só o simulador usa
+    from dea import load_month_frontier
+
+    return load_month_frontier(file_path, competen, rts)
+
+
+@st.cache_data
+def load_peers(file_path=parquet_dir_path):
+    """Pares DEA gravados por dea_pares.py e o índice de consulta (ver peer_lookup), ou None.
+
+    São opcionais (python dea_pares.py), então a ausência não é tratada como erro.
+    """
+    from dea_pares import build_peer_index, read_peers
+
+    peers = read_peers(file_path)
+    if peers is None:
+        return None
+    return peers, build_peer_index(peers[0])
+
+
+def show_memory_footprint(df):
+    """Exibe na barra lateral o tamanho do conjunto de dados em memória."""
+    st.sidebar.caption(f"Dados em memória: {len(df):,} linhas · {memory_footprint_mb(df):.1f} MB".replace(',', '.'))
@@ -0,0 +1,761 @@
+"""Recalcula a Eficiência (DEA) a partir dos insumos e do produto de cada competência.
+
+Modelo: DEA envoltório orientado a insumos, com os insumos CNES_SALAS,
+CNES_LEITOS_SUS, HORAS_MEDICOS e HORAS_ENFERMAGEM e o produto SIA_SIH_VALOR.
+Cada competência (COMPETEN) é uma fronteira independente; cada hospital no mês
+é uma DMU. Com retornos constantes (crs) os scores orientados a insumo e a
+produto coincidem; vrs acrescenta a restrição de convexidade (BCC).
+
+Este modelo não reproduz a Eficiência gravada nos CSVs: em cada mês, parte dos
+hospitais com Eficiência 1 é dominada estritamente por outro hospital do mesmo
+mês, o que nenhum DEA radial sobre o mês inteiro admite, em qualquer orientação
+ou escala. O modelo original (conjunto de referência, orientação, variáveis)
+não está neste repositório. A comparação termina com código 1 enquanto a
+diferença passar de --tolerancia, e os scores daqui não substituem a Eficiência.
+
+Uso (na raiz do projeto, após gerar o armazenamento com concat_csv_to_xlsx.py):
+
+    python dea.py                  # todas as competências, compara com a Eficiência gravada
+    python dea.py --anos 2022 2023 --rts vrs
+    python dea.py --jobs 1 --lote 16
+    python dea.py --anos 2022 --sem-triagem   # sem a identificação prévia da fronteira
+    python dea.py --atualizar      # grava os scores no armazenamento, só onde os dados mudaram
+"""
+import argparse
+import glob
+import itertools
+import math
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import scipy.sparse as sp
+from scipy.optimize import linprog
+
+PARQUET_DIRNAME = 'resultado_eficiencia_parquet'
+
+INPUT_COLS = ['CNES_SALAS', 'CNES_LEITOS_SUS', 'HORAS_MEDICOS', 'HORAS_ENFERMAGEM']
+OUTPUT_COLS = ['SIA_SIH_VALOR']
+SCORE_COL = 'Eficiência'
+
+# Scores recalculados gravados dentro do armazenamento, particionados por ano
+# (diretório '_' é ignorado na leitura do armazenamento pelas páginas)
+DEA_DIRNAME = '_eficiencia_dea'
+DEA_PART_NAME = 'dea.parquet'
+DEA_SCORE_COL = 'Eficiência_DEA'
+DEA_FRONTIER_COL = 'fronteira'
+
+# DMUs resolvidas por chamada ao HiGHS. Lotes amortizam o custo fixo de cada
+# chamada sem deixar o LP em bloco grande demais: por padrão o lote é escolhido
+# para ter ~BATCH_COLUMNS colunas de lambda (8 DMUs contra um mês inteiro, centenas
+# contra uma fronteira pequena), entre MIN_BATCH_SIZE e MAX_BATCH_SIZE
+BATCH_COLUMNS = 20_000
+MIN_BATCH_SIZE = 8
+MAX_BATCH_SIZE = 128
+# Tolerância usada na comparação com os scores gravados
+DEFAULT_TOLERANCE = 1e-4
+# Score mínimo para uma DMU candidata ser considerada parte da fronteira
+FRONTIER_TOLERANCE = 1e-6
+# Linhas comparadas por vez no filtro de dominância (memória ~ bloco x n x colunas)
+DOMINANCE_BLOCK = 256
+# DMUs de menor soma usadas como pivôs na primeira passada do filtro
+DOMINANCE_PIVOTS = 32
+
+# Limite de sistemas m x m na enumeração de vértices (C(k + m, m) para k DMUs de referência)
+VERTEX_MAX_SYSTEMS = 50_000
+
+_HIGHS_OPTIONS = {'presolve': False}
+
+
+def month_arrays(df):
+    """Matrizes de insumos X (n, m) e produtos Y (n, s) de uma competência, em float64.
+
+    Retorna (X, Y, valid): valid marca as DMUs avaliáveis, isto é, com todos os
+    valores presentes, não negativos e ao menos um insumo positivo. As demais
+    ficam fora da fronteira e recebem score NaN.
+    """
+    X = df[INPUT_COLS].to_numpy(dtype='float64', na_value=np.nan)
+    Y = df[OUTPUT_COLS].to_numpy(dtype='float64', na_value=np.nan)
+    return X, Y, valid_dmus(X, Y)
+
+
+def valid_dmus(X, Y):
+    """Máscara das DMUs avaliáveis (ver month_arrays)."""
+    return (
+        np.isfinite(X).all(axis=1) & np.isfinite(Y).all(axis=1)
+        & (X >= 0).all(axis=1) & (Y >= 0).all(axis=1) & (X > 0).any(axis=1)
+    )
+
+
+def _technology(X, Y, reference, rts):
+    """Bloco de restrições compartilhado por todas as DMUs do mês (colunas = DMUs de referência)."""
+    Xr, Yr = X[reference], Y[reference]
+    rows = [sp.csr_matrix(Xr.T), sp.csr_matrix(-Yr.T)]
+    if rts == 'vrs':
+        # Convexidade (soma dos lambdas = 1) como par de desigualdades, para manter um único A_ub
+        ones = np.ones((1, len(reference)))
+        rows += [sp.csr_matrix(ones), sp.csr_matrix(-ones)]
+    return sp.vstack(rows, format='csr')
+
+
+def _solve_batch(technology, X, Y, dmus, rts):
+    """Resolve as DMUs de um lote em um único LP bloco-diagonal.
+
+    Cada bloco repete a matriz de tecnologia; só a coluna de theta (-x_o) e o
+    lado direito (-y_o) mudam entre DMUs. O ótimo do LP em bloco é o ótimo de
+    cada DMU, pois os blocos não compartilham variáveis.
+    """
+    b = len(dmus)
+    m, s = X.shape[1], Y.shape[1]
+    n_rows, n_ref = technology.shape
+    blocks = sp.kron(sp.identity(b, format='csr'), technology, format='csr')
+    theta = sp.csr_matrix(
+        (
+            -X[dmus].ravel(),
+            (((np.arange(b) * n_rows)[:, None] + np.arange(m)).ravel(), np.repeat(np.arange(b), m)),
+        ),
+        shape=(b * n_rows, b),
+    )
+    A = sp.hstack([theta, blocks], format='csc')
+    rhs = np.zeros((b, n_rows))
+    rhs[:, m:m + s] = -Y[dmus]
+    if rts == 'vrs':
+        rhs[:, m + s] = 1.0
+        rhs[:, m + s + 1] = -1.0
+    c = np.concatenate([np.ones(b), np.zeros(b * n_ref)])
+    result = linprog(c, A_ub=A, b_ub=rhs.ravel(), bounds=(0, None), method='highs', options=_HIGHS_OPTIONS)
+    if result.status != 0:
+        return None
+    return result.x[:b]
+
+
+def multiplier_vertices(Z):
+    """Vértices do poliedro W = {v >= 0 : Z v >= 1} (uma linha por vértice).
+
+    Cada vértice é a solução de m restrições ativas; todos os C(k + m, m)
+    sistemas m x m são resolvidos de uma vez e só os viáveis são mantidos.
+    """
+    k, m = Z.shape
+    A = np.vstack([Z, np.eye(m)])
+    b = np.concatenate([np.ones(k), np.zeros(m)])
+    combos = np.array(list(itertools.combinations(range(k + m), m)))
+    systems = A[combos]
+    regular = np.abs(np.linalg.det(systems)) > 1e-12
+    V = np.linalg.solve(systems[regular], b[combos][regular][..., None])[..., 0]
+    feasible = (V >= -1e-9).all(axis=1) & ((V @ Z.T) >= 1 - 1e-9).all(axis=1)
+    return V[feasible]
+
+
+def crs_vertex_scores(X, Y, dmus, reference):
+    """Scores CRS com um único produto pela enumeração dos vértices do LP dos multiplicadores.
+
+    Com um produto, o score de o é max_v min_j (v . z_j) / (v . z_o), com
+    z = x / y, cujo ótimo está em um vértice de W = {v >= 0 : v . z_j >= 1, j em
+    reference}: score = 1 / min_w (w . z_o). Os vértices dependem só do conjunto
+    de referência, então são calculados uma vez e servem para todas as DMUs
+    (um produto de matrizes). Referências com produto zero não geram produção e
+    ficam de fora; DMUs com produto zero têm score 0. X e Y já devem vir
+    normalizados (ver _normalize).
+    """
+    reference = reference[Y[reference, 0] > 0]
+    scores = np.full(len(dmus), np.nan)
+    produces = Y[dmus, 0] > 0
+    scores[~produces] = 0.0
+    if len(reference) == 0:
+        return scores
+    Z = X[reference] / Y[reference]
+    V = multiplier_vertices(Z)
+    Zo = X[dmus[produces]] / Y[dmus[produces]]
+    with np.errstate(divide='ignore'):
+        scores[produces] = 1 / np.min(Zo @ V.T, axis=1)
+    return scores
+
+
+def _normalize(X, Y, reference):
+    """X e Y com cada coluna dividida pela média do conjunto de referência.
+
+    Mudar as unidades não altera os scores, e com valores da mesma ordem de
+    grandeza (horas ~1e4, produção ~1e7 nos dados brutos) o HiGHS e a enumeração
+    de vértices não perdem precisão.
+    """
+    x_scale = np.nanmean(X[reference], axis=0)
+    x_scale[~(x_scale > 0)] = 1.0
+    y_scale = np.nanmean(Y[reference], axis=0)
+    y_scale[~(y_scale > 0)] = 1.0
+    return X / x_scale, Y / y_scale
+
+
+def dea_scores(X, Y, rts='crs', dmus=None, reference=None, batch_size=None):
+    """Scores DEA orientados a insumos das DMUs `dmus` contra o conjunto `reference`.
+
+    X (n, m) e Y (n, s) são as matrizes do mês (ver month_arrays); dmus e
+    reference são índices de linha (padrão: todas as DMUs). Retorna um array
+    float64 alinhado a dmus; DMUs cujo LP não tem solução ficam com NaN.
+    Com retornos constantes, um único produto e um conjunto de referência pequeno
+    (como uma fronteira), os scores vêm de crs_vertex_scores, sem nenhum LP.
+    """
+    n = X.shape[0]
+    dmus = np.arange(n) if dmus is None else np.asarray(dmus)
+    reference = np.arange(n) if reference is None else np.asarray(reference)
+    scores = np.full(len(dmus), np.nan)
+    if len(dmus) == 0 or len(reference) == 0:
+        return scores
+    X, Y = _normalize(X, Y, reference)
+    if rts == 'crs' and Y.shape[1] == 1 and math.comb(len(reference) + X.shape[1], X.shape[1]) <= VERTEX_MAX_SYSTEMS:
+        return crs_vertex_scores(X, Y, dmus, reference)
+    technology = _technology(X, Y, reference, rts)
+    if batch_size is None:
+        batch_size = int(np.clip(BATCH_COLUMNS // len(reference), MIN_BATCH_SIZE, MAX_BATCH_SIZE))
+    for start in range(0, len(dmus), batch_size):
+        batch = dmus[start:start + batch_size]
+        theta = _solve_batch(technology, X, Y, batch, rts)
+        if theta is None and len(batch) > 1:
+            # Um LP inviável invalida o lote inteiro; refaz DMU a DMU para isolá-lo
+            theta = np.array([
+                np.nan if (t := _solve_batch(technology, X, Y, batch[i:i + 1], rts)) is None else t[0]
+                for i in range(len(batch))
+            ])
+        if theta is not None:
+            scores[start:start + len(batch)] = theta
+    return scores
+
+
+def dominance_filter(X, Y, dmus, rts='crs'):
+    """DMUs de `dmus` que nenhuma outra domina (candidatas à fronteira).
+
+    k domina j quando usa no máximo os mesmos insumos para no mínimo o mesmo
+    produto, com ao menos uma desigualdade estrita. Com retornos constantes e um
+    único produto, a comparação é feita nos insumos por unidade de produto, o que
+    descarta também as DMUs dominadas por uma versão em escala de outra. Uma DMU
+    dominada está contida na tecnologia gerada pelas demais, então removê-la do
+    conjunto de referência não altera nenhum score.
+    """
+    dmus = np.asarray(dmus)
+    if len(dmus) == 0:
+        return dmus
+    if rts == 'crs' and Y.shape[1] == 1:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            P = X[dmus] / Y[dmus]
+    else:
+        # Menor é melhor em todas as colunas
+        P = np.hstack([X[dmus], -Y[dmus]])
+    # Quem domina tem soma (normalizada) menor; as DMUs de menor soma eliminam a
+    # maior parte das demais, e só as restantes são comparadas entre si. Pela
+    # transitividade, isso dá o mesmo resultado da comparação de todos os pares.
+    scale = np.nanmedian(np.abs(np.where(np.isfinite(P), P, np.nan)), axis=0)
+    scale[~(scale > 0)] = 1.0
+    pivots = P[np.argsort((P / scale).sum(axis=1))[:DOMINANCE_PIVOTS]]
+    dominated = _dominated_by(P, pivots)
+    rest = np.flatnonzero(~dominated)
+    dominated[rest] = _dominated_by(P[rest], P[rest])
+    return dmus[~dominated]
+
+
+def _dominated_by(P, Q):
+    """Máscara das linhas de P dominadas por alguma linha de Q (menor é melhor), em blocos."""
+    dominated = np.zeros(len(P), dtype=bool)
+    for start in range(0, len(P), DOMINANCE_BLOCK):
+        block = P[start:start + DOMINANCE_BLOCK, None, :]
+        weakly = (Q[None, :, :] <= block).all(axis=2)
+        strictly = (Q[None, :, :] < block).any(axis=2)
+        dominated[start:start + DOMINANCE_BLOCK] = (weakly & strictly).any(axis=1)
+    return dominated
+
+
+def find_frontier(X, Y, dmus, rts='crs', batch_size=None):
+    """Fronteira eficiente entre `dmus`: retorna (frontier, candidates, candidate_scores).
+
+    Só as DMUs não dominadas passam por LP, e apenas contra as próprias
+    candidatas (as dominadas não mudam a tecnologia). As candidatas com score
+    >= 1 - FRONTIER_TOLERANCE formam a fronteira, que contém todos os conjuntos
+    de referência ótimos das demais DMUs.
+    """
+    candidates = dominance_filter(X, Y, dmus, rts)
+    candidate_scores = dea_scores(X, Y, rts, dmus=candidates, reference=candidates, batch_size=batch_size)
+    frontier = candidates[candidate_scores >= 1 - FRONTIER_TOLERANCE]
+    return frontier, candidates, candidate_scores
+
+
+def score_month(X, Y, rts='crs', batch_size=None, screen=True):
+    """Scores de todas as DMUs de um mês (NaN para as não avaliáveis).
+
+    Com screen=True (padrão), a fronteira é identificada primeiro (find_frontier)
+    e as demais DMUs são avaliadas só contra ela, com LPs de poucas colunas em vez
+    de uma coluna por hospital do mês. Retorna (scores, frontier); frontier é None
+    quando screen=False.
+    """
+    scores = np.full(X.shape[0], np.nan)
+    idx = np.flatnonzero(valid_dmus(X, Y))
+    if not screen:
+        scores[idx] = dea_scores(X, Y, rts, dmus=idx, reference=idx, batch_size=batch_size)
+        return scores, None
+    frontier, candidates, candidate_scores = find_frontier(X, Y, idx, rts, batch_size)
+    scores[candidates] = candidate_scores
+    rest = np.setdiff1d(idx, candidates, assume_unique=True)
+    scores[rest] = dea_scores(X, Y, rts, dmus=rest, reference=frontier, batch_size=batch_size)
+    return scores, frontier
+
+
+def dea_peers(X, Y, rts, dmus, frontier, batch_size=None):
+    """Pares (lambdas) e folgas das DMUs `dmus` contra as unidades `frontier` do mês.
+
+    Retorna (theta, lambdas, input_slacks, output_slacks): lambdas é uma matriz
+    CSR (len(dmus), len(frontier)) com os pesos de cada par no alvo da DMU, e as
+    folgas (nas unidades originais) são o que sobra além da redução radial:
+    theta * x - X' lambda nos insumos e Y' lambda - y nos produtos. Os scores vêm
+    de dea_scores; com theta fixo, um LP em bloco por lote (como em _solve_batch)
+    escolhe o alvo de menor uso de insumos, o mesmo da segunda fase de
+    project_dmu. DMUs sem solução ficam sem pares e com NaN.
+    """
+    dmus = np.asarray(dmus)
+    frontier = np.asarray(frontier)
+    k, m, s = len(frontier), X.shape[1], Y.shape[1]
+    theta = dea_scores(X, Y, rts, dmus=dmus, reference=frontier, batch_size=batch_size)
+    input_slacks = np.full((len(dmus), m), np.nan)
+    output_slacks = np.full((len(dmus), s), np.nan)
+    if len(dmus) == 0 or k == 0:
+        return theta, sp.csr_matrix((len(dmus), k)), input_slacks, output_slacks
+    Xn, Yn = _normalize(X, Y, frontier)
+    technology = np.vstack([Xn[frontier].T, -Yn[frontier].T])
+    cost = Xn[frontier].sum(axis=1)
+    if batch_size is None:
+        batch_size = MAX_BATCH_SIZE
+
+    def solve(batch):
+        b = len(batch)
+        rhs = np.hstack([theta[batch, None] * Xn[dmus[batch]] * (1 + 1e-9), -Yn[dmus[batch]]])
+        A_eq = sp.kron(sp.identity(b), np.ones((1, k)), format='csr') if rts == 'vrs' else None
+        result = linprog(
+            np.tile(cost, b), A_ub=sp.kron(sp.identity(b), technology, format='csr'), b_ub=rhs.ravel(),
+            A_eq=A_eq, b_eq=np.ones(b) if rts == 'vrs' else None, bounds=(0, None), method='highs',
+            options=_HIGHS_OPTIONS,
+        )
+        return result.x.reshape(b, k) if result.status == 0 else None
+
+    solvable = np.flatnonzero(np.isfinite(theta))
+    weights = np.zeros((len(dmus), k))
+    solved = np.zeros(len(dmus), dtype=bool)
+    for start in range(0, len(solvable), batch_size):
+        batch = solvable[start:start + batch_size]
+        lambdas = solve(batch)
+        if lambdas is not None:
+            weights[batch] = lambdas
+            solved[batch] = True
+            continue
+        # Como em dea_scores: um lote inviável é refeito DMU a DMU
+        for i in batch:
+            if (lambdas := solve(np.array([i]))) is not None:
+                weights[i] = lambdas[0]
+                solved[i] = True
+    weights[weights < 1e-9] = 0.0
+    theta[~solved] = np.nan
+    input_slacks[solved] = np.maximum(theta[solved, None] * X[dmus[solved]] - weights[solved] @ X[frontier], 0.0)
+    output_slacks[solved] = np.maximum(weights[solved] @ Y[frontier] - Y[dmus[solved]], 0.0)
+    return theta, sp.csr_matrix(weights), input_slacks, output_slacks
+
+
+def project_dmu(x, y, frontier_X, frontier_Y, rts='crs'):
+    """Score e metas de uma única DMU (x, y) contra os pontos de uma fronteira.
+
+    Retorna (theta, lambdas, x_target, y_target). O LP tem só uma coluna por
+    unidade da fronteira, então resolve em milissegundos (ver load_month_frontier).
+    Depois do score, uma segunda fase com theta fixo minimiza os insumos usados,
+    de modo que x_target já inclui as folgas além da redução radial theta * x.
+    Sem solução, retorna NaN em tudo; se só a segunda fase falhar, ficam os
+    lambdas da primeira.
+    """
+    x = np.asarray(x, dtype='float64').reshape(1, -1)
+    y = np.asarray(y, dtype='float64').reshape(1, -1)
+    k, m, s = len(frontier_X), x.shape[1], y.shape[1]
+    nan = (np.nan, np.full(k, np.nan), np.full(m, np.nan), np.full(s, np.nan))
+    if k == 0:
+        return nan
+    X, Y = _normalize(np.vstack([x, frontier_X]), np.vstack([y, frontier_Y]), np.arange(1, k + 1))
+    xo, yo, Xf, Yf = X[0], Y[0], X[1:], Y[1:]
+    A_eq, b_eq = (np.ones((1, k)), [1.0]) if rts == 'vrs' else (None, None)
+
+    # Fase 1: min theta  s.a.  Xf' l <= theta * xo,  Yf' l >= yo
+    A_ub = np.block([[-xo[:, None], Xf.T], [np.zeros((s, 1)), -Yf.T]])
+    b_ub = np.concatenate([np.zeros(m), -yo])
+    A_eq1 = None if A_eq is None else np.hstack([[[0.0]], A_eq])
+    result = linprog(np.r_[1.0, np.zeros(k)], A_ub=A_ub, b_ub=b_ub, A_eq=A_eq1, b_eq=b_eq,
+                     bounds=(0, None), method='highs')
+    if result.status != 0:
+        return nan
+    theta, lambdas = result.x[0], result.x[1:]
+
+    # Fase 2: com theta fixo, o menor uso de insumos (folgas máximas)
+    b_ub = np.concatenate([theta * xo * (1 + 1e-9), -yo])
+    result = linprog(Xf.sum(axis=1), A_ub=np.vstack([Xf.T, -Yf.T]), b_ub=b_ub, A_eq=A_eq, b_eq=b_eq,
+                     bounds=(0, None), method='highs')
+    if result.status == 0:
+        lambdas = result.x
+    return theta, lambdas, lambdas @ frontier_X, lambdas @ frontier_Y
+
+
+def _score_month_task(competen, X, Y, rts, batch_size, screen):
+    start = time.perf_counter()
+    scores, frontier = score_month(X, Y, rts, batch_size, screen)
+    return competen, scores, frontier, time.perf_counter() - start
+
+
+def map_months(func, tasks, jobs):
+    """Aplica func a cada tarefa (tupla de argumentos), em até `jobs` processos; gera os resultados à medida que terminam."""
+    if jobs <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield func(*task)
+        return
+    with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as executor:
+        futures = [executor.submit(func, *task) for task in tasks]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def score_frame(df, rts='crs', jobs=1, batch_size=None, screen=True):
+    """Recalcula a Eficiência de todas as competências de df, um processo por mês quando jobs > 1.
+
+    df precisa das colunas COMPETEN, INPUT_COLS e OUTPUT_COLS. Retorna uma Series
+    float64 alinhada ao índice de df. Os tempos por mês são impressos à medida
+    que cada competência termina.
+    """
+    scores = pd.Series(np.nan, index=df.index, dtype='float64')
+    groups = {competen: rows for competen, rows in df.groupby('COMPETEN', sort=True).indices.items()}
+    tasks = []
+    for competen, rows in groups.items():
+        X, Y, _ = month_arrays(df.iloc[rows])
+        tasks.append((competen, X, Y, rts, batch_size, screen))
+
+    for competen, month_scores, frontier, elapsed in map_months(_score_month_task, tasks, jobs):
+        rows = groups[competen]
+        scores.iloc[rows] = month_scores
+        fronteira = f", fronteira com {len(frontier)} DMUs" if frontier is not None else ""
+        print(f"- {competen}: {len(rows):,} DMUs em {elapsed:.2f}s ({len(rows) / elapsed:,.0f} DMUs/s{fronteira})")
+    return scores
+
+
+def read_store(output_dir, anos=None):
+    """Lê do armazenamento as colunas usadas pelo DEA, com COMPETEN inteiro (YYYYMM)."""
+    dataset = ds.dataset(output_dir, format='parquet', partitioning='hive')
+    filter_ = ds.field('ANO').isin(list(anos)) if anos else None
+    table = dataset.to_table(columns=['CNES', 'COMPETEN'] + INPUT_COLS + OUTPUT_COLS + [SCORE_COL], filter=filter_)
+    return table.to_pandas()
+
+
+# --- Recálculo incremental ---
+# Cada partição de _eficiencia_dea guarda, além do score, uma cópia dos insumos e
+# produtos usados no cálculo. Comparando essa cópia com o armazenamento atual, só
+# as competências com linhas novas, alteradas ou removidas são reavaliadas.
+
+
+def update_month(X, Y, changed, previous_scores, previous_frontier, frontier_removed, rts='crs', batch_size=None):
+    """Reavalia um mês em que algumas linhas foram revisadas.
+
+    changed marca as linhas novas ou alteradas; previous_scores e
+    previous_frontier (máscara) são os resultados anteriores, válidos para as
+    demais linhas. frontier_removed indica que alguma DMU da fronteira anterior
+    saiu do mês. Se a fronteira anterior continua de pé (nenhuma DMU dela mudou
+    ou saiu, e as linhas alteradas ficam estritamente dentro dela), a tecnologia
+    não mudou e só as linhas alteradas são resolvidas; caso contrário o mês
+    inteiro é recalculado. Retorna (scores, frontier_mask, n_resolvidas, fronteira_mudou).
+    """
+    valid = valid_dmus(X, Y)
+    kept_frontier = np.flatnonzero(previous_frontier & ~changed & valid)
+    moved = frontier_removed or bool((previous_frontier & changed).any()) or len(kept_frontier) == 0
+    if not moved:
+        targets = np.flatnonzero(changed & valid)
+        target_scores = dea_scores(X, Y, rts, dmus=targets, reference=kept_frontier, batch_size=batch_size)
+        # Score 1 (ou LP sem solução, com vrs) significa linha na fronteira ou além dela
+        moved = bool(np.isnan(target_scores).any() or (target_scores >= 1 - FRONTIER_TOLERANCE).any())
+    if moved:
+        scores, frontier = score_month(X, Y, rts, batch_size)
+        frontier_mask = np.zeros(len(X), dtype=bool)
+        frontier_mask[frontier] = True
+        return scores, frontier_mask, int(valid.sum()), True
+    scores = np.where(changed, np.nan, previous_scores)
+    scores[targets] = target_scores
+    return scores, previous_frontier & ~changed, len(targets), False
+
+
+def _update_month_task(competen, *args):
+    start = time.perf_counter()
+    return (competen, *update_month(*args), time.perf_counter() - start)
+
+
+def dea_partition_path(output_dir, ano):
+    return os.path.join(output_dir, DEA_DIRNAME, f'ANO={ano}', DEA_PART_NAME)
+
+
+def write_partition(path, df, metadata):
+    """Grava df em path com metadados (str -> str) no esquema, via arquivo temporário oculto + os.replace."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = os.path.join(os.path.dirname(path), f'.{os.path.basename(path)}.tmp')
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    encoded = {key.encode(): str(value).encode() for key, value in metadata.items()}
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), **encoded})
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def read_partition(path):
+    """(DataFrame, metadados) de um arquivo gravado por write_partition, ou (None, {}) se ele não existe."""
+    if not os.path.exists(path):
+        return None, {}
+    table = pq.read_table(path)
+    metadata = {key.decode(): value.decode() for key, value in (table.schema.metadata or {}).items() if key != b'pandas'}
+    df = table.to_pandas()
+    df['CNES'] = df['CNES'].astype(str)
+    return df, metadata
+
+
+def read_dea_partition(output_dir, ano, rts):
+    """Resultados gravados de um ano, ou None se não existem ou foram calculados com outro rts."""
+    df, metadata = read_partition(dea_partition_path(output_dir, ano))
+    if metadata.get('rts') != rts:
+        return None
+    return df
+
+
+def write_dea_partition(output_dir, ano, df, rts):
+    write_partition(dea_partition_path(output_dir, ano), df, {'rts': rts})
+
+
+def load_month_frontier(output_dir, competen, rts='crs'):
+    """Unidades da fronteira de uma competência: (cnes, X, Y), para project_dmu.
+
+    Usa a marcação DEA_FRONTIER_COL de _eficiencia_dea quando a partição foi
+    calculada com o mesmo rts e a cópia dos insumos e produtos ainda confere com
+    o armazenamento; senão identifica a fronteira do mês com find_frontier.
+    """
+    ano = competen // 100
+    month = read_store(output_dir, [ano])
+    month = month[month['COMPETEN'] == competen].copy()
+    month['CNES'] = month['CNES'].astype(str)
+    month = month.sort_values('CNES', kind='stable').reset_index(drop=True)
+    cols = INPUT_COLS + OUTPUT_COLS
+    stored = read_dea_partition(output_dir, ano, rts)
+    if stored is not None:
+        stored = stored[stored['COMPETEN'] == competen].sort_values('CNES', kind='stable').reset_index(drop=True)
+        current = month[cols].to_numpy(dtype='float64', na_value=np.nan)
+        if (
+            len(stored) == len(month) and (stored['CNES'].to_numpy() == month['CNES'].to_numpy()).all()
+            and _same_values(current, stored[cols].to_numpy(dtype='float64', na_value=np.nan)).all()
+        ):
+            frontier = stored[DEA_FRONTIER_COL].to_numpy(dtype=bool)
+            X, Y, _ = month_arrays(month)
+            return month['CNES'].to_numpy()[frontier], X[frontier], Y[frontier]
+    X, Y, valid = month_arrays(month)
+    frontier, _, _ = find_frontier(X, Y, np.flatnonzero(valid), rts)
+    return month['CNES'].to_numpy()[frontier], X[frontier], Y[frontier]
+
+
+def store_years(output_dir):
+    return sorted(int(os.path.basename(p).split('=', 1)[1]) for p in glob.glob(os.path.join(output_dir, 'ANO=*')))
+
+
+def remove_stale_years(output_dir, dirname):
+    """Remove de output_dir/dirname as partições de anos que saíram do armazenamento."""
+    present = store_years(output_dir)
+    for path in glob.glob(os.path.join(output_dir, dirname, 'ANO=*')):
+        if int(os.path.basename(path).split('=', 1)[1]) not in present:
+            shutil.rmtree(path)
+    return present
+
+
+def _same_values(current, previous):
+    """Igualdade elemento a elemento em que NaN == NaN (valores ausentes não contam como revisão)."""
+    return (current == previous) | (np.isnan(current) & np.isnan(previous))
+
+
+def update_dea_year(current, previous, rts='crs', jobs=1, batch_size=None):
+    """Atualiza os scores de um ano; retorna (resultado, resumo) ou (None, resumo) se nada mudou.
+
+    current são as linhas do ano no armazenamento (read_store); previous, os
+    resultados gravados (read_dea_partition) ou None para calcular tudo.
+    """
+    cols = INPUT_COLS + OUTPUT_COLS
+    current = current[['CNES', 'COMPETEN'] + cols].copy()
+    current['CNES'] = current['CNES'].astype(str)
+    current = current.sort_values(['COMPETEN', 'CNES'], kind='stable').reset_index(drop=True)
+    if previous is None:
+        previous = pd.DataFrame({col: pd.Series(dtype=current[col].dtype) for col in current.columns})
+        previous[DEA_SCORE_COL] = pd.Series(dtype='float64')
+        previous[DEA_FRONTIER_COL] = pd.Series(dtype=bool)
+
+    merged = current.merge(previous, on=['CNES', 'COMPETEN'], how='left', suffixes=('', '_anterior'), indicator=True)
+    changed = (merged['_merge'] != 'both').to_numpy(copy=True)
+    for col in cols:
+        changed |= ~_same_values(merged[col].to_numpy(), merged[f'{col}_anterior'].to_numpy())
+    previous_scores = merged[DEA_SCORE_COL].to_numpy(dtype='float64', na_value=np.nan)
+    previous_frontier = merged[DEA_FRONTIER_COL].fillna(False).to_numpy(dtype=bool)
+
+    removed = previous.merge(current[['CNES', 'COMPETEN']], on=['CNES', 'COMPETEN'], how='left', indicator=True)
+    removed = removed[removed['_merge'] == 'left_only']
+    frontier_removed = set(removed.loc[removed[DEA_FRONTIER_COL].astype(bool), 'COMPETEN'])
+
+    scores = previous_scores.copy()
+    frontier = previous_frontier.copy()
+    groups = current.groupby('COMPETEN', sort=True).indices
+    tasks = []
+    for competen, rows in groups.items():
+        if not changed[rows].any() and competen not in frontier_removed:
+            continue
+        X, Y, _ = month_arrays(current.iloc[rows])
+        tasks.append((
+            competen, X, Y, changed[rows], previous_scores[rows], previous_frontier[rows],
+            competen in frontier_removed, rts, batch_size,
+        ))
+
+    summary = {'meses': len(groups), 'reavaliados': 0, 'fronteira_mudou': 0, 'resolvidas': 0}
+    for competen, month_scores, month_frontier, n_solved, moved, elapsed in map_months(_update_month_task, tasks, jobs):
+        rows = groups[competen]
+        scores[rows] = month_scores
+        frontier[rows] = month_frontier
+        summary['reavaliados'] += 1
+        summary['fronteira_mudou'] += moved
+        summary['resolvidas'] += n_solved
+        detalhe = "fronteira mudou, mês inteiro" if moved else "fronteira mantida"
+        print(f"- {competen}: {int(changed[rows].sum()):,} linhas revisadas, {n_solved:,} DMUs resolvidas em {elapsed:.2f}s ({detalhe})")
+
+    if not tasks and len(removed) == 0:
+        return None, summary
+    current[DEA_SCORE_COL] = scores
+    current[DEA_FRONTIER_COL] = frontier
+    return current, summary
+
+
+def update_dea_scores(output_dir, anos=None, rts='crs', jobs=1, batch_size=None):
+    """Atualiza _eficiencia_dea para os anos dados (todos os do armazenamento se None).
+
+    Anos ainda sem resultados gravados são sempre calculados, e partições de anos
+    que saíram do armazenamento são removidas. Retorna a lista de anos regravados.
+    """
+    present = remove_stale_years(output_dir, DEA_DIRNAME)
+    rewritten = []
+    for ano in present:
+        if anos is not None and ano not in anos and os.path.exists(dea_partition_path(output_dir, ano)):
+            continue
+        result, summary = update_dea_year(read_store(output_dir, [ano]), read_dea_partition(output_dir, ano, rts), rts, jobs, batch_size)
+        if result is None:
+            continue
+        write_dea_partition(output_dir, ano, result, rts)
+        rewritten.append(ano)
+        print(
+            f"{ano}: {summary['reavaliados']} de {summary['meses']} competências reavaliadas "
+            f"({summary['fronteira_mudou']} com mudança de fronteira), {summary['resolvidas']:,} DMUs resolvidas."
+        )
+    print(f"Updated DEA scores (rewritten years: {', '.join(map(str, rewritten)) or '-'})")
+    return rewritten
+
+
+def compare_scores(expected, computed, tolerance=DEFAULT_TOLERANCE):
+    """Resumo das diferenças entre scores gravados e recalculados (linhas com ambos presentes)."""
+    expected = np.asarray(expected, dtype='float64')
+    computed = np.asarray(computed, dtype='float64')
+    both = ~np.isnan(expected) & ~np.isnan(computed)
+    diff = np.abs(expected[both] - computed[both])
+    return {
+        'comparadas': int(both.sum()),
+        'dif_max': float(diff.max()) if len(diff) else np.nan,
+        'dif_media': float(diff.mean()) if len(diff) else np.nan,
+        'dentro_tolerancia': float((diff <= tolerance).mean()) if len(diff) else np.nan,
+    }
+
+
+def dominated_efficient(X, Y, scores, tolerance=DEFAULT_TOLERANCE):
+    """Máscara das DMUs com score gravado 1 que outra DMU do mesmo mês domina estritamente.
+
+    k domina j estritamente quando usa menos de cada insumo positivo de j (e não
+    mais dos nulos) e gera mais de cada produto. Nenhum DEA radial que tenha o
+    mês inteiro como conjunto de referência, em qualquer orientação e com
+    retornos constantes ou variáveis, dá score 1 a uma DMU assim; cada linha
+    marcada prova que os scores gravados vêm de outro modelo.
+    """
+    scores = np.asarray(scores, dtype='float64')
+    valid = valid_dmus(X, Y)
+    efficient = np.flatnonzero(valid & (scores >= 1 - tolerance))
+    others = np.flatnonzero(valid)
+    flagged = np.zeros(len(scores), dtype=bool)
+    for start in range(0, len(efficient), DOMINANCE_BLOCK):
+        rows = efficient[start:start + DOMINANCE_BLOCK]
+        xj, yj = X[rows, None, :], Y[rows, None, :]
+        xk, yk = X[None, others, :], Y[None, others, :]
+        fewer = ((xk < xj) | ((xj == 0) & (xk == 0))).all(axis=2) & (xk < xj).any(axis=2)
+        more = (yk > yj).all(axis=2)
+        flagged[rows] = (fewer & more).any(axis=1)
+    return flagged
+
+
+def check_reference(df, computed, tolerance=DEFAULT_TOLERANCE):
+    """Compara a Eficiência gravada com a recalculada e prova, por mês, quando o modelo não é o mesmo.
+
+    Retorna (summary, por_mes): o resumo de compare_scores e um DataFrame com,
+    por COMPETEN, a diferença máxima, as DMUs de score gravado 1 e quantas delas
+    são dominadas estritamente (dominated_efficient).
+    """
+    summary = compare_scores(df[SCORE_COL], computed, tolerance)
+    rows = []
+    for competen, idx in df.groupby('COMPETEN', sort=True).indices.items():
+        month = df.iloc[idx]
+        X, Y, _ = month_arrays(month)
+        expected = month[SCORE_COL].to_numpy(dtype='float64', na_value=np.nan)
+        diff = np.abs(expected - computed.iloc[idx].to_numpy())
+        rows.append({
+            'COMPETEN': competen,
+            'dif_max': np.nanmax(diff) if np.isfinite(diff).any() else np.nan,
+            'eficientes': int((expected >= 1 - tolerance).sum()),
+            'eficientes_dominadas': int(dominated_efficient(X, Y, expected, tolerance).sum()),
+        })
+    return summary, pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--anos', type=int, nargs='*', help="Anos de COMPETEN a recalcular (padrão: todos).")
+    parser.add_argument('--rts', choices=['crs', 'vrs'], default='crs', help="Retornos de escala: constantes (crs, padrão) ou variáveis (vrs).")
+    parser.add_argument('--lote', type=int, default=None, help="DMUs por LP em bloco (padrão: automático pelo tamanho do conjunto de referência).")
+    parser.add_argument('--sem-triagem', action='store_true', help="Avalia cada DMU contra todas as do mês, sem identificar a fronteira antes (lento).")
+    parser.add_argument('--tolerancia', type=float, default=DEFAULT_TOLERANCE, help=f"Tolerância na comparação com a Eficiência gravada (padrão: {DEFAULT_TOLERANCE}).")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help="Número de processos, um mês por vez em cada (padrão: todos os núcleos; 1 = sequencial).")
+    parser.add_argument('--atualizar', action='store_true', help=f"Grava os scores em {PARQUET_DIRNAME}/{DEA_DIRNAME}/, reavaliando só as competências com linhas novas, alteradas ou removidas.")
+    args = parser.parse_args()
+
+    output_dir = os.path.join(os.getcwd(), PARQUET_DIRNAME)
+    if args.atualizar:
+        update_dea_scores(output_dir, args.anos, args.rts, args.jobs, args.lote)
+        return
+    df = read_store(output_dir, args.anos)
+    print(f"{len(df):,} linhas, {df['COMPETEN'].nunique()} competências, rts={args.rts}, {args.jobs} processo(s).")
+
+    start = time.perf_counter()
+    computed = score_frame(df, args.rts, args.jobs, args.lote, screen=not args.sem_triagem)
+    elapsed = time.perf_counter() - start
+    solved = int(computed.notna().sum())
+    print(f"\n{solved:,} scores em {elapsed:.2f}s ({solved / elapsed:,.0f} DMUs/s).")
+
+    summary, por_mes = check_reference(df, computed, args.tolerancia)
+    print(
+        f"Comparação com '{SCORE_COL}' gravada: {summary['comparadas']:,} linhas, "
+        f"dif. máx {summary['dif_max']:.4g}, dif. média {summary['dif_media']:.4g}, "
+        f"{summary['dentro_tolerancia']:.1%} dentro de {args.tolerancia:g}."
+    )
+    if not summary['dif_max'] <= args.tolerancia:
+        dominadas = int(por_mes['eficientes_dominadas'].sum())
+        print(
+            f"\nERRO: os scores recalculados não reproduzem a '{SCORE_COL}' gravada "
+            f"(dif. máx {summary['dif_max']:.4g} > {args.tolerancia:g}).\n"
+            f"{dominadas:,} de {int(por_mes['eficientes'].sum()):,} DMUs com '{SCORE_COL}' = 1 são dominadas "
+            f"estritamente por outro hospital do mesmo mês, o que nenhum DEA radial sobre o mês inteiro admite:"
+        )
+        print(por_mes[por_mes['eficientes_dominadas'] > 0].to_string(index=False, float_format='{:.4g}'.format))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
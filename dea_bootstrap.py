@@ -0,0 +1,179 @@
+"""Intervalos de confiança bootstrap (Simar & Wilson, 1998) da eficiência DEA de cada hospital-mês.
+
+Para cada competência, o bootstrap suavizado reamostra as distâncias de Shephard
+(1 / score) com um núcleo gaussiano refletido em 1, gera pseudo-amostras
+projetando os insumos de cada hospital na fronteira e afastando-os pela
+distância reamostrada, e reavalia os hospitais originais contra cada
+pseudo-fronteira. Daí saem o score corrigido de viés e o intervalo de confiança
+de cada hospital-mês.
+
+Uso (na raiz do projeto, após gerar o armazenamento com concat_csv_to_xlsx.py):
+
+    python dea_bootstrap.py                                  # todas as competências
+    python dea_bootstrap.py --anos 2023 --replicacoes 500    # amostra menor, só 2023
+    python dea_bootstrap.py --semente 7 --alpha 0.1
+
+Os resultados são reprodutíveis: a semente de cada competência deriva de
+--semente e do próprio COMPETEN, independentemente de --jobs.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from dea import (
+    PARQUET_DIRNAME, DEA_SCORE_COL, dea_scores, find_frontier, map_months, month_arrays,
+    read_partition, read_store, remove_stale_years, score_month, write_partition,
+)
+
+BOOTSTRAP_DIRNAME = '_bootstrap_dea'
+BOOTSTRAP_PART_NAME = 'bootstrap.parquet'
+
+# Simar & Wilson recomendam ~2000 replicações para intervalos de confiança
+DEFAULT_REPLICATIONS = 2000
+DEFAULT_ALPHA = 0.05
+DEFAULT_SEED = 12345
+
+
+def bandwidth(delta):
+    """Janela do núcleo gaussiano para as distâncias delta (>= 1), pela regra de Silverman.
+
+    A regra é aplicada ao conjunto refletido {delta, 2 - delta}, que não tem a
+    massa acumulada na fronteira (delta = 1), e ajustada de volta ao tamanho n.
+    """
+    reflected = np.concatenate([delta, 2 - delta])
+    q75, q25 = np.percentile(reflected, [75, 25])
+    spread = min(reflected.std(ddof=1), (q75 - q25) / 1.34)
+    return 0.9 * spread * len(reflected) ** (-1 / 5) * 2 ** (1 / 5)
+
+
+def pseudo_distances(delta, replications, h, rng):
+    """Distâncias reamostradas (replications, n) do bootstrap suavizado, todas de uma vez.
+
+    Reamostra delta com reposição, soma ruído h * N(0, 1), reflete em 1 os valores
+    abaixo da fronteira e reescala para manter a variância de delta.
+    """
+    n = len(delta)
+    beta = delta[rng.integers(0, n, size=(replications, n))]
+    smoothed = beta + h * rng.standard_normal((replications, n))
+    smoothed = np.where(smoothed < 1, 2 - smoothed, smoothed)
+    mean = beta.mean(axis=1, keepdims=True)
+    return mean + (smoothed - mean) / np.sqrt(1 + h ** 2 / delta.var())
+
+
+def bootstrap_month(X, Y, rts='crs', replications=DEFAULT_REPLICATIONS, alpha=DEFAULT_ALPHA, seed=None, batch_size=None):
+    """Bootstrap de um mês; retorna um dict de arrays alinhados às linhas de X.
+
+    Chaves: DEA_SCORE_COL (score estimado), 'eficiencia_corrigida' (sem viés),
+    'ic_inferior' e 'ic_superior' (intervalo 1 - alpha). Hospitais sem score
+    positivo ficam fora da reamostragem e com NaN nas três últimas.
+
+    A cada replicação, só a fronteira da pseudo-amostra (find_frontier) forma o
+    conjunto de referência; com retornos constantes isso cai na enumeração de
+    vértices de dea_scores, em que uma única estrutura do LP serve a todos os
+    hospitais.
+    """
+    n = X.shape[0]
+    theta, _ = score_month(X, Y, rts, batch_size)
+    result = {DEA_SCORE_COL: theta}
+    for key in ('eficiencia_corrigida', 'ic_inferior', 'ic_superior'):
+        result[key] = np.full(n, np.nan)
+    usable = np.flatnonzero(theta > 0)
+    if len(usable) < 2:
+        return result
+
+    rng = np.random.default_rng(seed)
+    delta = 1 / theta[usable]
+    h = bandwidth(delta)
+    delta_star = pseudo_distances(delta, replications, h, rng)
+
+    # Linhas 0..k-1: hospitais originais; k..2k-1: pseudo-amostra da replicação
+    k = len(usable)
+    originals = np.arange(k)
+    pseudo = np.arange(k, 2 * k)
+    X_all = np.vstack([X[usable], X[usable]])
+    Y_all = np.vstack([Y[usable], Y[usable]])
+    projected = X[usable] * theta[usable, None]
+    boot = np.empty((replications, k))
+    for b in range(replications):
+        X_all[k:] = projected * delta_star[b, :, None]
+        reference, _, _ = find_frontier(X_all, Y_all, pseudo, rts, batch_size)
+        boot[b] = 1 / dea_scores(X_all, Y_all, rts, dmus=originals, reference=reference, batch_size=batch_size)
+
+    # Viés e intervalo na escala das distâncias (delta = 1 / score), depois convertidos
+    with np.errstate(invalid='ignore', divide='ignore'):
+        bias = np.nanmean(boot, axis=0) - delta
+        upper_q, lower_q = np.nanpercentile(boot - delta, [100 * (1 - alpha / 2), 100 * alpha / 2], axis=0)
+        result['eficiencia_corrigida'][usable] = 1 / (delta - bias)
+        result['ic_inferior'][usable] = 1 / (delta - lower_q)
+        result['ic_superior'][usable] = 1 / (delta - upper_q)
+    return result
+
+
+def _bootstrap_month_task(competen, X, Y, rts, replications, alpha, seed, batch_size):
+    start = time.perf_counter()
+    # Semente própria por competência: o resultado não depende da ordem nem de --jobs
+    month_seed = np.random.SeedSequence([seed, int(competen)])
+    result = bootstrap_month(X, Y, rts, replications, alpha, month_seed, batch_size)
+    return competen, result, time.perf_counter() - start
+
+
+def bootstrap_partition_path(output_dir, ano):
+    return os.path.join(output_dir, BOOTSTRAP_DIRNAME, f'ANO={ano}', BOOTSTRAP_PART_NAME)
+
+
+def bootstrap_years(output_dir, anos=None, rts='crs', replications=DEFAULT_REPLICATIONS, alpha=DEFAULT_ALPHA,
+                    seed=DEFAULT_SEED, jobs=1, batch_size=None):
+    """Calcula e grava o bootstrap dos anos dados (todos os do armazenamento se None).
+
+    Cada ano vai para output_dir/_bootstrap_dea/ANO=<yyyy>/bootstrap.parquet, com
+    os parâmetros (rts, replicações, alpha, semente) nos metadados do arquivo.
+    """
+    present = remove_stale_years(output_dir, BOOTSTRAP_DIRNAME)
+    for ano in present if anos is None else [ano for ano in present if ano in anos]:
+        df = read_store(output_dir, [ano])
+        df['CNES'] = df['CNES'].astype(str)
+        df = df.sort_values(['COMPETEN', 'CNES'], kind='stable').reset_index(drop=True)
+        groups = df.groupby('COMPETEN', sort=True).indices
+        tasks = []
+        for competen, rows in groups.items():
+            X, Y, _ = month_arrays(df.iloc[rows])
+            tasks.append((competen, X, Y, rts, replications, alpha, seed, batch_size))
+
+        out = df[['CNES', 'COMPETEN']].copy()
+        for key in (DEA_SCORE_COL, 'eficiencia_corrigida', 'ic_inferior', 'ic_superior'):
+            out[key] = np.nan
+        for competen, result, elapsed in map_months(_bootstrap_month_task, tasks, jobs):
+            rows = groups[competen]
+            for key, values in result.items():
+                out.iloc[rows, out.columns.get_loc(key)] = values
+            print(f"- {competen}: {len(rows):,} DMUs x {replications:,} replicações em {elapsed:.2f}s")
+        metadata = {'rts': rts, 'replicacoes': replications, 'alpha': alpha, 'semente': seed}
+        write_partition(bootstrap_partition_path(output_dir, ano), out, metadata)
+        print(f"{ano}: intervalos gravados em {BOOTSTRAP_DIRNAME}/ANO={ano}/")
+
+
+def read_bootstrap(output_dir, ano):
+    """(DataFrame, metadados) do bootstrap gravado de um ano, ou (None, {})."""
+    return read_partition(bootstrap_partition_path(output_dir, ano))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--anos', type=int, nargs='*', help="Anos de COMPETEN a processar (padrão: todos).")
+    parser.add_argument('--rts', choices=['crs', 'vrs'], default='crs', help="Retornos de escala: constantes (crs, padrão) ou variáveis (vrs, bem mais lento).")
+    parser.add_argument('--replicacoes', type=int, default=DEFAULT_REPLICATIONS, help=f"Replicações bootstrap por competência (padrão: {DEFAULT_REPLICATIONS}).")
+    parser.add_argument('--alpha', type=float, default=DEFAULT_ALPHA, help=f"Nível de significância do intervalo (padrão: {DEFAULT_ALPHA}, ou seja, IC de 95%%).")
+    parser.add_argument('--semente', type=int, default=DEFAULT_SEED, help=f"Semente base do gerador aleatório (padrão: {DEFAULT_SEED}).")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help="Número de processos, um mês por vez em cada (padrão: todos os núcleos; 1 = sequencial).")
+    args = parser.parse_args()
+
+    output_dir = os.path.join(os.getcwd(), PARQUET_DIRNAME)
+    start = time.perf_counter()
+    bootstrap_years(output_dir, args.anos, args.rts, args.replicacoes, args.alpha, args.semente, args.jobs)
+    print(f"\nBootstrap concluído em {time.perf_counter() - start:.2f}s.")
+
+
+if __name__ == '__main__':
+    main()
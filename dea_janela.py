@@ -0,0 +1,177 @@
+"""Análise de janela DEA: cada hospital-mês avaliado contra as DMUs de vários meses.
+
+Na análise de janela (Charnes et al.), o conjunto de referência de uma
+competência t reúne as DMUs das competências t-k+1, ..., t, o que suaviza o
+ruído dos scores de um único mês, sobretudo nos hospitais pequenos. Aqui a
+janela é retroativa: o score de (hospital, t) usa só t e os k-1 meses
+anteriores, então meses novos no armazenamento não mudam os scores já gravados.
+
+Em vez de avaliar k vezes mais DMUs contra k vezes mais colunas, o cálculo
+aproveita a sobreposição entre janelas consecutivas: a fronteira de uma união
+de meses está contida na união das fronteiras de cada mês, então cada fronteira
+mensal é calculada uma única vez e reaproveitada pelas k janelas de que o mês
+participa. A fronteira da janela sai de poucas dezenas de candidatas (sem
+duplicatas) e só as DMUs do mês t, também sem duplicatas, são avaliadas contra
+ela.
+
+Uso (na raiz do projeto, após gerar o armazenamento com concat_csv_to_xlsx.py):
+
+    python dea_janela.py                     # janelas de 3 meses, todas as competências
+    python dea_janela.py --meses 4 --anos 2024
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from agregacao import grouped_weighted_stats
+from dea import (
+    PARQUET_DIRNAME, OUTPUT_COLS, dea_scores, find_frontier, map_months, month_arrays, read_store,
+    remove_stale_years, store_years, valid_dmus, write_partition,
+)
+
+WINDOW_DIRNAME = '_janela_dea'
+WINDOW_PART_NAME = 'janela.parquet'
+WINDOW_AGGREGATES_FILENAME = '_agregados_janela.parquet'
+WINDOW_SCORE_COL = 'Eficiência_janela'
+DEFAULT_WINDOW = 3
+
+
+def month_number(competen):
+    """Meses corridos de uma competência (YYYYMM), para medir a distância entre meses."""
+    return (competen // 100) * 12 + competen % 100
+
+
+def month_frontier_points(competen, X, Y, rts):
+    """Pontos (X, Y) da fronteira de um mês, sem duplicatas (o cache das janelas)."""
+    start = time.perf_counter()
+    frontier, _, _ = find_frontier(X, Y, np.flatnonzero(valid_dmus(X, Y)), rts)
+    points = np.unique(np.hstack([X[frontier], Y[frontier]]), axis=0)
+    return competen, points, time.perf_counter() - start
+
+
+def window_month_scores(competen, X, Y, candidates, rts):
+    """Scores das DMUs de um mês contra a fronteira da janela que termina nele.
+
+    candidates são os pontos (X | Y) das fronteiras mensais da janela; a
+    fronteira da janela é identificada entre eles, e DMUs com os mesmos insumos
+    e produtos são avaliadas uma única vez.
+    """
+    start = time.perf_counter()
+    m = X.shape[1]
+    scores = np.full(X.shape[0], np.nan)
+    idx = np.flatnonzero(valid_dmus(X, Y))
+    candidates = np.unique(candidates, axis=0)
+    if len(idx) == 0 or len(candidates) == 0:
+        return competen, scores, 0, time.perf_counter() - start
+    frontier, _, _ = find_frontier(candidates[:, :m], candidates[:, m:], np.arange(len(candidates)), rts)
+    points, inverse = np.unique(np.hstack([X[idx], Y[idx]]), axis=0, return_inverse=True)
+    X_all = np.vstack([points[:, :m], candidates[frontier, :m]])
+    Y_all = np.vstack([points[:, m:], candidates[frontier, m:]])
+    unique_scores = dea_scores(
+        X_all, Y_all, rts, dmus=np.arange(len(points)), reference=np.arange(len(points), len(X_all))
+    )
+    scores[idx] = unique_scores[inverse.ravel()]
+    return competen, scores, len(points), time.perf_counter() - start
+
+
+def window_partition_path(output_dir, ano):
+    return os.path.join(output_dir, WINDOW_DIRNAME, f'ANO={ano}', WINDOW_PART_NAME)
+
+
+def window_aggregates(table):
+    """Médias mensais (simples e ponderada pela produção) dos scores de janela, para a página consolidada."""
+    valid = table[table[WINDOW_SCORE_COL].notna()]
+    simples = valid.groupby('COMPETEN', sort=True)[WINDOW_SCORE_COL].agg(['size', 'mean'])
+    ponderada = grouped_weighted_stats(valid, 'COMPETEN', WINDOW_SCORE_COL, OUTPUT_COLS[0])
+    return pd.DataFrame({
+        'COMPETEN': simples.index.astype('int32'),
+        'n_janela': simples['size'].to_numpy(),
+        'media_simples_janela': simples['mean'].to_numpy(),
+        'media_ponderada_janela': ponderada['media_ponderada'].reindex(simples.index).to_numpy(),
+    })
+
+
+def window_years(output_dir, anos=None, window=DEFAULT_WINDOW, rts='crs', jobs=1):
+    """Calcula e grava os scores de janela dos anos dados (todos os do armazenamento se None).
+
+    Cada ano vai para output_dir/_janela_dea/ANO=<yyyy>/janela.parquet; as médias
+    mensais de todos os anos ficam em _janela_dea/_agregados_janela.parquet.
+    """
+    present = remove_stale_years(output_dir, WINDOW_DIRNAME)
+    anos = present if anos is None else [ano for ano in present if ano in anos]
+    if not anos:
+        return
+    # Anos anteriores só para completar as primeiras janelas de cada ano
+    anteriores = {ano - 1 - i for ano in anos for i in range((window - 2) // 12 + 1)}
+    df = read_store(output_dir, sorted((set(anos) | anteriores) & set(present)))
+    df['CNES'] = df['CNES'].astype(str)
+    df = df.sort_values(['COMPETEN', 'CNES'], kind='stable').reset_index(drop=True)
+    groups = df.groupby('COMPETEN', sort=True).indices
+    targets = [competen for competen in groups if competen // 100 in anos]
+    first_needed = min(month_number(competen) for competen in targets) - (window - 1)
+    arrays = {}
+    for competen, rows in groups.items():
+        if month_number(competen) >= first_needed:
+            X, Y, _ = month_arrays(df.iloc[rows])
+            arrays[competen] = (X, Y)
+
+    # Cache de fronteiras mensais: cada mês é resolvido uma vez e serve a até `window` janelas
+    start = time.perf_counter()
+    frontiers = {}
+    tasks = [(competen, X, Y, rts) for competen, (X, Y) in arrays.items()]
+    for competen, points, elapsed in map_months(month_frontier_points, tasks, jobs):
+        frontiers[competen] = points
+    n_candidates = sum(len(points) for points in frontiers.values())
+    print(f"Fronteiras de {len(frontiers)} competências ({n_candidates:,} pontos) em {time.perf_counter() - start:.2f}s.")
+
+    start = time.perf_counter()
+    tasks = []
+    for competen in targets:
+        members = [c for c in frontiers if 0 <= month_number(competen) - month_number(c) < window]
+        X, Y = arrays[competen]
+        tasks.append((competen, X, Y, np.vstack([frontiers[c] for c in members]), rts))
+    scores = {}
+    for competen, month_scores, n_unique, elapsed in map_months(window_month_scores, tasks, jobs):
+        scores[competen] = month_scores
+        print(f"- {competen}: {n_unique:,} DMUs distintas avaliadas em {elapsed:.2f}s")
+    print(f"{len(tasks)} janelas de {window} meses em {time.perf_counter() - start:.2f}s.")
+
+    aggregates_path = os.path.join(output_dir, WINDOW_DIRNAME, WINDOW_AGGREGATES_FILENAME)
+    aggregates = [pd.read_parquet(aggregates_path)] if os.path.exists(aggregates_path) else []
+    aggregates = [frame[(frame['COMPETEN'] // 100).isin(set(present) - set(anos))] for frame in aggregates]
+    metadata = {'rts': rts, 'janela': window}
+    for ano in anos:
+        rows = np.concatenate([groups[competen] for competen in targets if competen // 100 == ano])
+        table = df.iloc[rows][['CNES', 'COMPETEN'] + OUTPUT_COLS].copy()
+        table[WINDOW_SCORE_COL] = np.concatenate([scores[competen] for competen in targets if competen // 100 == ano])
+        write_partition(window_partition_path(output_dir, ano), table[['CNES', 'COMPETEN', WINDOW_SCORE_COL]], metadata)
+        aggregates.append(window_aggregates(table))
+        print(f"{ano}: scores de janela gravados em {WINDOW_DIRNAME}/ANO={ano}/")
+    aggregates = pd.concat(aggregates, ignore_index=True).sort_values('COMPETEN')
+    write_partition(aggregates_path, aggregates, metadata)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--anos', type=int, nargs='*', help="Anos de COMPETEN a processar (padrão: todos).")
+    parser.add_argument('--meses', type=int, default=DEFAULT_WINDOW, help=f"Tamanho da janela em competências (padrão: {DEFAULT_WINDOW}).")
+    parser.add_argument('--rts', choices=['crs', 'vrs'], default='crs', help="Retornos de escala: constantes (crs, padrão) ou variáveis (vrs).")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help="Número de processos (padrão: todos os núcleos; 1 = sequencial).")
+    args = parser.parse_args()
+
+    output_dir = os.path.join(os.getcwd(), PARQUET_DIRNAME)
+    if not store_years(output_dir):
+        print(f"Armazenamento {PARQUET_DIRNAME}/ não encontrado. Execute o script `concat_csv_to_xlsx.py` primeiro.")
+        return
+    if args.meses < 1:
+        parser.error("--meses deve ser pelo menos 1.")
+    start = time.perf_counter()
+    window_years(output_dir, args.anos, args.meses, args.rts, args.jobs)
+    print(f"\nAnálise de janela concluída em {time.perf_counter() - start:.2f}s.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""Índice de Malmquist (orientado a insumos) entre competências consecutivas.
+
+Para cada hospital presente em dois meses seguidos t e t+1, a variação de
+produtividade é decomposta em variação de eficiência (aproximação da fronteira)
+e variação tecnológica (deslocamento da própria fronteira):
+
+    EC = θ_t+1(t+1) / θ_t(t)
+    TC = sqrt( θ_t(t+1) / θ_t+1(t+1) * θ_t(t) / θ_t+1(t) )
+    M  = EC * TC
+
+em que θ_a(b) é o score DEA dos dados do mês b contra a fronteira do mês a.
+Valores acima de 1 indicam melhora. A fronteira de cada mês é calculada uma
+única vez e reaproveitada nos dois pares de que o mês participa.
+
+Uso (na raiz do projeto, após gerar o armazenamento com concat_csv_to_xlsx.py):
+
+    python dea_malmquist.py                  # todos os pares de competências
+    python dea_malmquist.py --anos 2023 2024 # só pares cujo mês final está nesses anos
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from dea import (
+    PARQUET_DIRNAME, dea_scores, map_months, month_arrays, read_store, remove_stale_years,
+    score_month, store_years, write_partition,
+)
+
+MALMQUIST_DIRNAME = '_malmquist'
+MALMQUIST_PART_NAME = 'malmquist.parquet'
+MALMQUIST_COLUMNS = [
+    'CNES', 'COMPETEN', 'COMPETEN_ANTERIOR', 'malmquist', 'variacao_eficiencia', 'variacao_tecnologica',
+    'theta_anterior', 'theta_atual', 'theta_atual_fronteira_anterior', 'theta_anterior_fronteira_atual',
+]
+
+
+def next_competen(competen):
+    """Competência seguinte (YYYYMM inteiro)."""
+    ano, mes = divmod(int(competen), 100)
+    return ano * 100 + mes + 1 if mes < 12 else (ano + 1) * 100 + 1
+
+
+def month_frontier(competen, cnes, X, Y, rts):
+    """Scores do mês contra a própria fronteira e os pontos (X, Y) da fronteira, para o cache."""
+    start = time.perf_counter()
+    theta, frontier = score_month(X, Y, rts)
+    entry = {'cnes': cnes, 'X': X, 'Y': Y, 'theta': theta, 'frontier_X': X[frontier], 'frontier_Y': Y[frontier]}
+    return competen, entry, time.perf_counter() - start
+
+
+def cross_scores(X, Y, frontier_X, frontier_Y, rts):
+    """Scores de (X, Y) contra a fronteira de outro mês (pode passar de 1)."""
+    if len(X) == 0 or len(frontier_X) == 0:
+        return np.full(len(X), np.nan)
+    X_all = np.vstack([X, frontier_X])
+    Y_all = np.vstack([Y, frontier_Y])
+    return dea_scores(X_all, Y_all, rts, dmus=np.arange(len(X)), reference=np.arange(len(X), len(X_all)))
+
+
+def malmquist_pair(competen_anterior, competen, anterior, atual, rts):
+    """Índice de Malmquist dos hospitais presentes nos dois meses (entradas do cache de fronteiras)."""
+    common, i_ant, i_atu = np.intersect1d(anterior['cnes'], atual['cnes'], return_indices=True)
+    theta_ant = anterior['theta'][i_ant]
+    theta_atu = atual['theta'][i_atu]
+    theta_atu_front_ant = cross_scores(atual['X'][i_atu], atual['Y'][i_atu], anterior['frontier_X'], anterior['frontier_Y'], rts)
+    theta_ant_front_atu = cross_scores(anterior['X'][i_ant], anterior['Y'][i_ant], atual['frontier_X'], atual['frontier_Y'], rts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ec = theta_atu / theta_ant
+        tc = np.sqrt((theta_atu_front_ant / theta_atu) * (theta_ant / theta_ant_front_atu))
+    result = pd.DataFrame({
+        'CNES': common,
+        'COMPETEN': np.int32(competen),
+        'COMPETEN_ANTERIOR': np.int32(competen_anterior),
+        'malmquist': ec * tc,
+        'variacao_eficiencia': ec,
+        'variacao_tecnologica': tc,
+        'theta_anterior': theta_ant,
+        'theta_atual': theta_atu,
+        'theta_atual_fronteira_anterior': theta_atu_front_ant,
+        'theta_anterior_fronteira_atual': theta_ant_front_atu,
+    })
+    # Índices infinitos (score zero em algum dos meses) não são interpretáveis
+    return result.replace([np.inf, -np.inf], np.nan)
+
+
+def malmquist_partition_path(output_dir, ano):
+    return os.path.join(output_dir, MALMQUIST_DIRNAME, f'ANO={ano}', MALMQUIST_PART_NAME)
+
+
+def malmquist_years(output_dir, anos=None, rts='crs', jobs=1):
+    """Calcula e grava o índice dos pares (t, t+1) com t+1 nos anos dados (todos se None).
+
+    Cada ano vai para output_dir/_malmquist/ANO=<yyyy>/malmquist.parquet; o
+    dezembro do ano anterior é lido para o par de janeiro.
+    """
+    present = remove_stale_years(output_dir, MALMQUIST_DIRNAME)
+    anos = present if anos is None else [ano for ano in present if ano in anos]
+    if not anos:
+        return
+    leitura = sorted(set(anos) | {ano - 1 for ano in anos if ano - 1 in present})
+    df = read_store(output_dir, leitura)
+    df['CNES'] = df['CNES'].astype(str)
+    df = df.sort_values(['COMPETEN', 'CNES'], kind='stable').reset_index(drop=True)
+    groups = df.groupby('COMPETEN', sort=True).indices
+    needed = {competen for competen in groups if competen // 100 in anos}
+    needed |= {competen for competen in groups if next_competen(competen) in needed}
+
+    # Cache de fronteiras: cada mês é resolvido uma vez, mesmo participando de dois pares
+    start = time.perf_counter()
+    tasks = []
+    for competen in sorted(needed):
+        rows = groups[competen]
+        X, Y, _ = month_arrays(df.iloc[rows])
+        tasks.append((competen, df['CNES'].to_numpy()[rows], X, Y, rts))
+    frontiers = {}
+    for competen, entry, elapsed in map_months(month_frontier, tasks, jobs):
+        frontiers[competen] = entry
+    print(f"Fronteiras de {len(frontiers)} competências em {time.perf_counter() - start:.2f}s.")
+
+    start = time.perf_counter()
+    pair_tasks = [
+        (competen, next_competen(competen), frontiers[competen], frontiers[next_competen(competen)], rts)
+        for competen in sorted(frontiers)
+        if next_competen(competen) in frontiers and next_competen(competen) // 100 in anos
+    ]
+    results = {ano: [] for ano in anos}
+    for result in map_months(malmquist_pair, pair_tasks, jobs):
+        if len(result):
+            results[int(result['COMPETEN'].iloc[0]) // 100].append(result)
+    print(f"{len(pair_tasks)} pares de competências em {time.perf_counter() - start:.2f}s.")
+
+    for ano, frames in results.items():
+        if not frames:
+            continue
+        table = pd.concat(frames, ignore_index=True).sort_values(['COMPETEN', 'CNES'], kind='stable')
+        write_partition(malmquist_partition_path(output_dir, ano), table[MALMQUIST_COLUMNS], {'rts': rts})
+        print(f"{ano}: {len(table):,} índices gravados em {MALMQUIST_DIRNAME}/ANO={ano}/")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--anos', type=int, nargs='*', help="Anos do mês final dos pares (padrão: todos).")
+    parser.add_argument('--rts', choices=['crs', 'vrs'], default='crs', help="Retornos de escala: constantes (crs, padrão) ou variáveis (vrs).")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help="Número de processos (padrão: todos os núcleos; 1 = sequencial).")
+    args = parser.parse_args()
+
+    output_dir = os.path.join(os.getcwd(), PARQUET_DIRNAME)
+    if not store_years(output_dir):
+        print(f"Armazenamento {PARQUET_DIRNAME}/ não encontrado. Execute o script `concat_csv_to_xlsx.py` primeiro.")
+        return
+    start = time.perf_counter()
+    malmquist_years(output_dir, args.anos, args.rts, args.jobs)
+    print(f"\nÍndice de Malmquist concluído em {time.perf_counter() - start:.2f}s.")
+
+
+if __name__ == '__main__':
+    main()
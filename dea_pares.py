@@ -0,0 +1,163 @@
+"""Pares de referência (lambdas) e folgas DEA de cada hospital-mês, em formato esparso.
+
+Para cada hospital avaliável, o alvo DEA é uma combinação de poucas unidades da
+fronteira da competência (os pares) com pesos lambda. Os pesos são gravados como
+uma matriz CSR por ano: as colunas de lista `pares` (CNES) e `pesos` de cada
+linha compartilham os offsets do Arrow, que fazem o papel do indptr, sem nunca
+materializar a matriz densa hospital x hospital. As folgas ficam ao lado, uma
+coluna por insumo e produto.
+
+Uso (na raiz do projeto, após gerar o armazenamento com concat_csv_to_xlsx.py):
+
+    python dea_pares.py                  # todas as competências
+    python dea_pares.py --anos 2024 --rts vrs
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from dea import (
+    INPUT_COLS, OUTPUT_COLS, PARQUET_DIRNAME, DEA_SCORE_COL, dea_peers, map_months, month_arrays,
+    read_store, remove_stale_years, score_month, store_years, valid_dmus, write_partition,
+)
+
+PEERS_DIRNAME = '_pares_dea'
+PEERS_PART_NAME = 'pares.parquet'
+SLACK_COLS = [f'folga_{col}' for col in INPUT_COLS + OUTPUT_COLS]
+
+
+def _peers_month_task(competen, cnes, X, Y, rts, batch_size):
+    """Pares e folgas das DMUs avaliáveis de uma competência (a CSR do mês)."""
+    start = time.perf_counter()
+    idx = np.flatnonzero(valid_dmus(X, Y))
+    _, frontier = score_month(X, Y, rts, batch_size)
+    theta, lambdas, input_slacks, output_slacks = dea_peers(X, Y, rts, idx, frontier, batch_size)
+    month = {
+        'CNES': cnes[idx],
+        DEA_SCORE_COL: theta,
+        'folgas': np.hstack([input_slacks, output_slacks]),
+        'indptr': lambdas.indptr,
+        'pares': cnes[frontier][lambdas.indices],
+        'pesos': lambdas.data,
+    }
+    return competen, month, time.perf_counter() - start
+
+
+def peers_table(months):
+    """Concatena as CSRs mensais ({competen: month}) em um DataFrame com colunas de lista."""
+    frames, indptrs, pares, pesos = [], [], [], []
+    offset = 0
+    for competen in sorted(months):
+        month = months[competen]
+        frame = pd.DataFrame({'CNES': month['CNES'], 'COMPETEN': np.int32(competen), DEA_SCORE_COL: month[DEA_SCORE_COL]})
+        frame[SLACK_COLS] = month['folgas']
+        frames.append(frame)
+        indptrs.append(month['indptr'][:-1] + offset)
+        offset += month['indptr'][-1]
+        pares.append(month['pares'])
+        pesos.append(month['pesos'])
+    table = pd.concat(frames, ignore_index=True)
+    offsets = pa.array(np.concatenate(indptrs + [[offset]]).astype('int32'))
+    # Colunas de lista Arrow: offsets + valores, exatamente o indptr + indices/data da CSR
+    table['pares'] = pd.arrays.ArrowExtensionArray(pa.ListArray.from_arrays(offsets, pa.array(np.concatenate(pares), pa.string())))
+    table['pesos'] = pd.arrays.ArrowExtensionArray(pa.ListArray.from_arrays(offsets, pa.array(np.concatenate(pesos), pa.float64())))
+    return table
+
+
+def peers_partition_path(output_dir, ano):
+    return os.path.join(output_dir, PEERS_DIRNAME, f'ANO={ano}', PEERS_PART_NAME)
+
+
+def peers_years(output_dir, anos=None, rts='crs', jobs=1, batch_size=None):
+    """Calcula e grava pares e folgas dos anos dados (todos os do armazenamento se None)."""
+    present = remove_stale_years(output_dir, PEERS_DIRNAME)
+    for ano in present if anos is None else [ano for ano in present if ano in anos]:
+        df = read_store(output_dir, [ano])
+        df['CNES'] = df['CNES'].astype(str)
+        df = df.sort_values(['COMPETEN', 'CNES'], kind='stable').reset_index(drop=True)
+        groups = df.groupby('COMPETEN', sort=True).indices
+        tasks = []
+        for competen, rows in groups.items():
+            X, Y, _ = month_arrays(df.iloc[rows])
+            tasks.append((competen, df['CNES'].to_numpy()[rows], X, Y, rts, batch_size))
+        months = {}
+        for competen, month, elapsed in map_months(_peers_month_task, tasks, jobs):
+            months[competen] = month
+            print(f"- {competen}: {len(month['CNES']):,} DMUs, {len(month['pesos']):,} pares em {elapsed:.2f}s")
+        if not months:
+            continue
+        write_partition(peers_partition_path(output_dir, ano), peers_table(months), {'rts': rts})
+        print(f"{ano}: pares gravados em {PEERS_DIRNAME}/ANO={ano}/")
+
+
+def read_peers(output_dir):
+    """Todos os pares gravados: (linhas, offsets, pares, pesos), ou None se não foram calculados.
+
+    linhas é um DataFrame com CNES, COMPETEN, score e folgas de cada hospital-mês;
+    os pares da linha i são pares[offsets[i]:offsets[i + 1]], com pesos alinhados.
+    """
+    path = os.path.join(output_dir, PEERS_DIRNAME)
+    if not os.path.isdir(path):
+        return None
+    table = ds.dataset(path, format='parquet', partitioning='hive').to_table(
+        columns=['CNES', 'COMPETEN', DEA_SCORE_COL] + SLACK_COLS + ['pares', 'pesos']
+    )
+    pares = table.column('pares').combine_chunks()
+    pesos = table.column('pesos').combine_chunks()
+    offsets = pares.offsets.to_numpy().astype('int64')
+    # Sem os metadados pandas do arquivo, que descrevem também as colunas de lista
+    linhas = table.drop_columns(['pares', 'pesos']).replace_schema_metadata(None).to_pandas()
+    return linhas, offsets - offsets[0], pares.flatten().to_numpy(zero_copy_only=False), pesos.flatten().to_numpy()
+
+
+def build_peer_index(linhas):
+    """Posição de cada hospital-mês em uma grade CNES x competência, para consulta O(1).
+
+    Retorna (posicao_cnes, primeiro_mes, grade): grade[posicao_cnes[cnes], mes]
+    é a linha de (cnes, competência), ou -1, com mes = meses desde primeiro_mes.
+    """
+    cnes = np.unique(linhas['CNES'].to_numpy())
+    posicao_cnes = {codigo: i for i, codigo in enumerate(cnes)}
+    meses = (linhas['COMPETEN'].to_numpy() // 100) * 12 + linhas['COMPETEN'].to_numpy() % 100
+    primeiro_mes = int(meses.min())
+    grade = np.full((len(cnes), int(meses.max()) - primeiro_mes + 1), -1, dtype='int32')
+    grade[np.searchsorted(cnes, linhas['CNES'].to_numpy()), meses - primeiro_mes] = np.arange(len(linhas))
+    return posicao_cnes, primeiro_mes, grade
+
+
+def peer_lookup(peers, peer_index, cnes, competen):
+    """Pares de (cnes, competen YYYYMM) em O(1): (linha, DataFrame CNES/peso) ou (None, None)."""
+    linhas, offsets, pares, pesos = peers
+    posicao_cnes, primeiro_mes, grade = peer_index
+    mes = (competen // 100) * 12 + competen % 100 - primeiro_mes
+    if cnes not in posicao_cnes or not 0 <= mes < grade.shape[1] or grade[posicao_cnes[cnes], mes] < 0:
+        return None, None
+    i = grade[posicao_cnes[cnes], mes]
+    fatia = slice(offsets[i], offsets[i + 1])
+    grupo = pd.DataFrame({'CNES': pares[fatia], 'peso': pesos[fatia]}).sort_values('peso', ascending=False)
+    return linhas.iloc[i], grupo.reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--anos', type=int, nargs='*', help="Anos de COMPETEN a processar (padrão: todos).")
+    parser.add_argument('--rts', choices=['crs', 'vrs'], default='crs', help="Retornos de escala: constantes (crs, padrão) ou variáveis (vrs).")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help="Número de processos (padrão: todos os núcleos; 1 = sequencial).")
+    args = parser.parse_args()
+
+    output_dir = os.path.join(os.getcwd(), PARQUET_DIRNAME)
+    if not store_years(output_dir):
+        print(f"Armazenamento {PARQUET_DIRNAME}/ não encontrado. Execute o script `concat_csv_to_xlsx.py` primeiro.")
+        return
+    start = time.perf_counter()
+    peers_years(output_dir, args.anos, args.rts, args.jobs)
+    print(f"\nPares e folgas concluídos em {time.perf_counter() - start:.2f}s.")
+
+
+if __name__ == '__main__':
+    main()
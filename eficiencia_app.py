@@ -3,41 +3,23 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go # Import graph_objects
 from plotly.subplots import make_subplots # Import make_subplots
-import os
-
-# Define the path to the Excel file
-current_directory = os.getcwd()
-excel_file_path = os.path.join(current_directory, 'resultado_eficiencia.xlsx')
+from dados_eficiencia import load_data, load_cnes_index, select_cnes, show_memory_footprint
 
 # --- Page Configuration ---
 st.set_page_config(page_title="Análise de Eficiência CNES", layout="wide")
 st.title("Visualização da Eficiência por CNES")
 
-# --- Load Data ---
-@st.cache_data # Cache the data loading to improve performance
-def load_data(file_path):
-    try:
-        df = pd.read_excel(file_path, dtype={'CNES': str}) # Ensure CNES is read as string
-        # Convert COMPETEN (YYYYMM) to datetime objects for proper sorting and filtering
-        df['COMPETEN'] = pd.to_datetime(df['COMPETEN'], format='%Y%m')
-        df = df.sort_values(by='COMPETEN') # Sort by date
-        return df
-    except FileNotFoundError:
-        st.error(f"Erro: O arquivo '{os.path.basename(file_path)}' não foi encontrado no diretório atual.")
-        st.info("Certifique-se de que o arquivo existe e que você executou o script `concat_csv_to_xlsx.py` primeiro.")
-        return None
-    except Exception as e:
-        st.error(f"Ocorreu um erro ao carregar o arquivo Excel: {e}")
-        return None
-
-df = load_data(excel_file_path)
+# --- Load Data (shared, cached loader) ---
+df = load_data()
+cnes_index = load_cnes_index()
 
 if df is not None and not df.empty:
+    show_memory_footprint(df)
     # --- Sidebar Filters ---
     st.sidebar.header("Filtros")
 
     # CNES Selection
-    all_cnes = sorted(df['CNES'].unique())
+    all_cnes = list(cnes_index[0]) # Already sorted by the index
     selected_cnes = st.sidebar.selectbox("Selecione o CNES:", options=all_cnes)
 
     # COMPETEN Range Slider
@@ -52,18 +34,14 @@ if df is not None and not df.empty:
         format="MM/YYYY" # Display format for slider
     )
 
-    # --- Filter Data based on Selection ---
-    filtered_df = df[
-        (df['CNES'] == selected_cnes) &
-        (df['COMPETEN'] >= selected_competencia_range[0]) &
-        (df['COMPETEN'] <= selected_competencia_range[1])
-    ]
+    # --- Filter Data based on Selection (binary search on the CNES index) ---
+    filtered_df = select_cnes(df, cnes_index, selected_cnes, selected_competencia_range[0], selected_competencia_range[1])
 
     st.markdown("### Indicadores Principais") # Main Title for this section
 
     if not filtered_df.empty:
-        # Sort filtered data by date to easily find latest/previous
-        filtered_df_sorted = filtered_df.sort_values(by='COMPETEN')
+        # select_cnes already returns the rows sorted by date
+        filtered_df_sorted = filtered_df
         latest_data = filtered_df_sorted.iloc[-1]
 
         # --- Display KPIs ---
@@ -262,4 +240,4 @@ elif df is None:
     # Error messages are handled within load_data
     pass
 else: # df is not None but empty
-    st.warning("O arquivo Excel está vazio.") 
\ No newline at end of file
+    st.warning("Os dados estão vazios.") 
\ No newline at end of file
@@ -0,0 +1,225 @@
+"""Constrói os insumos e o produto do DEA a partir dos extratos mensais brutos (CNES, SIA e SIH).
+
+Os valores dos CSVs anuais são médias móveis de 3 competências (por exemplo,
+HORAS_MEDICOS = 1566,666...). Este script refaz esse cálculo a partir dos
+extratos mensais locais, já convertidos de DBC para CSV ou Parquet, com os
+nomes de colunas do DATASUS:
+
+    estabelecimentos (CNES-ST): CNES, COMPETEN e as colunas QTINST* (instalações físicas/salas)
+    leitos (CNES-LT):           CNES, COMPETEN, QT_SUS
+    profissionais (CNES-PF):    CNES, COMPETEN, CBO, HORAOUTR, HORAHOSP, HORA_AMB
+    produção ambulatorial (SIA-PA): PA_CODUNI, PA_CMP, PA_VALAPR
+    produção hospitalar (SIH-RD):   CNES, ANO_CMPT, MES_CMPT, VAL_TOT
+
+Cada extrato é agregado por (CNES, COMPETEN) e os componentes são dispostos em
+uma grade CNES x competência; as médias móveis saem de somas acumuladas ao
+longo dos meses, sem laços por hospital. Um hospital entra na competência em que
+aparece no extrato de estabelecimentos, com componentes ausentes valendo zero;
+as médias exigem que ele esteja ativo em todas as competências da janela, então
+os extratos devem incluir as duas competências anteriores ao primeiro mês
+desejado. As horas são a carga horária semanal declarada no CNES.
+
+A saída são arquivos eficiencia_resultados_<ano>.csv no mesmo formato dos CSVs
+anuais, prontos para concat_csv_to_xlsx.py, mas sem a coluna Eficiência: o
+modelo que a gerou não faz parte deste repositório, e o DEA recalculado
+(Eficiência_DEA, em outra escala) é calculado na ingestão com
+concat_csv_to_xlsx.py --dea.
+
+Uso (na raiz do projeto):
+
+    python insumos_dea.py --estabelecimentos extratos/ST*.csv --leitos extratos/LT*.csv \\
+        --profissionais extratos/PF*.csv --sia extratos/PA*.parquet --sih extratos/RD*.parquet \\
+        --saida insumos_construidos   # --separador ";" para extratos CSV separados por ponto e vírgula
+"""
+import argparse
+import csv
+import glob
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+from dea import INPUT_COLS, OUTPUT_COLS
+
+DEFAULT_WINDOW = 3
+ROOM_PREFIX = 'QTINST'
+HOUR_COLS = ['HORAOUTR', 'HORAHOSP', 'HORA_AMB']
+# Famílias da CBO: médicos (2231 na CBO antiga, 225 na atual); enfermeiros (2235) e técnicos/auxiliares (3222)
+CBO_MEDICOS = ('2231', '225')
+CBO_ENFERMAGEM = ('2235', '3222')
+CSV_COLUMNS = ['CNES'] + INPUT_COLS + OUTPUT_COLS + ['COMPETEN', 'Erro']
+OUTPUT_PATTERN = 'eficiencia_resultados_{ano}.csv'
+
+
+def read_extract(patterns, columns=None, prefix=None, delimiter=','):
+    """Lê e concatena os extratos (CSV ou Parquet) dos padrões glob dados, só com as colunas pedidas.
+
+    Com prefix, também entram as colunas cujo nome começa com ele (ex.: QTINST*).
+    Todas as colunas são lidas como texto e convertidas depois, para não depender
+    da inferência de tipos de cada arquivo. Os CSVs usam o separador delimiter
+    (cabeçalho com ou sem aspas); um extrato sem alguma das colunas pedidas
+    levanta ValueError com o nome do arquivo.
+    """
+    paths = sorted(path for pattern in patterns for path in glob.glob(pattern))
+    if not paths:
+        raise FileNotFoundError(f"Nenhum extrato encontrado em: {', '.join(patterns)}")
+    frames = []
+    for path in paths:
+        if path.lower().endswith('.parquet'):
+            names = pq.read_schema(path).names
+        else:
+            with open(path, encoding='latin-1', newline='') as f:
+                names = next(csv.reader(f, delimiter=delimiter), [])
+        missing = [name for name in (columns or []) if name not in names]
+        if missing:
+            raise ValueError(
+                f"{path}: colunas ausentes no extrato: {', '.join(missing)} "
+                f"(encontradas: {', '.join(names) or '-'}; separador {delimiter!r})"
+            )
+        selected = [name for name in names if name in (columns or []) or (prefix and name.startswith(prefix))]
+        if path.lower().endswith('.parquet'):
+            frame = pq.read_table(path, columns=selected).to_pandas()
+        else:
+            frame = pacsv.read_csv(
+                path,
+                read_options=pacsv.ReadOptions(encoding='latin-1'),
+                parse_options=pacsv.ParseOptions(delimiter=delimiter),
+                convert_options=pacsv.ConvertOptions(
+                    include_columns=selected, column_types={name: 'string' for name in selected}
+                ),
+            ).to_pandas()
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _key(cnes, competen):
+    """Chave (CNES com 7 dígitos, COMPETEN inteiro YYYYMM) de um extrato."""
+    return pd.DataFrame({
+        'CNES': cnes.astype(str).str.strip().str.zfill(7),
+        'COMPETEN': pd.to_numeric(competen, errors='coerce').astype('Int64'),
+    })
+
+
+def _numeric(frame, columns):
+    return frame[columns].apply(pd.to_numeric, errors='coerce').fillna(0).sum(axis=1)
+
+
+def monthly_components(estabelecimentos, leitos, profissionais, sia, sih):
+    """Componentes mensais (antes das médias móveis), uma linha por (CNES, COMPETEN) ativo.
+
+    Cada extrato vira uma soma por (CNES, COMPETEN) com groupby; as somas são
+    alinhadas ao extrato de estabelecimentos, e componentes ausentes ficam zero.
+    """
+    rooms = [col for col in estabelecimentos.columns if col.startswith(ROOM_PREFIX)]
+    partes = {
+        'CNES_SALAS': _key(estabelecimentos['CNES'], estabelecimentos['COMPETEN']).assign(valor=_numeric(estabelecimentos, rooms)),
+        'CNES_LEITOS_SUS': _key(leitos['CNES'], leitos['COMPETEN']).assign(valor=_numeric(leitos, ['QT_SUS'])),
+        'SIA_SIH_VALOR': pd.concat([
+            _key(sia['PA_CODUNI'], sia['PA_CMP']).assign(valor=_numeric(sia, ['PA_VALAPR'])),
+            _key(sih['CNES'], sih['ANO_CMPT'].astype(str) + sih['MES_CMPT'].astype(str).str.zfill(2)).assign(valor=_numeric(sih, ['VAL_TOT'])),
+        ], ignore_index=True),
+    }
+    cbo = profissionais['CBO'].astype(str).str.strip()
+    horas = _key(profissionais['CNES'], profissionais['COMPETEN']).assign(valor=_numeric(profissionais, HOUR_COLS))
+    partes['HORAS_MEDICOS'] = horas[cbo.str.startswith(CBO_MEDICOS).to_numpy()]
+    partes['HORAS_ENFERMAGEM'] = horas[cbo.str.startswith(CBO_ENFERMAGEM).to_numpy()]
+
+    ativos = _key(estabelecimentos['CNES'], estabelecimentos['COMPETEN']).dropna().drop_duplicates()
+    componentes = ativos.set_index(['CNES', 'COMPETEN'])
+    for col in INPUT_COLS + OUTPUT_COLS:
+        soma = partes[col].dropna(subset=['COMPETEN']).groupby(['CNES', 'COMPETEN'], sort=False)['valor'].sum()
+        componentes[col] = soma.reindex(componentes.index).fillna(0).to_numpy()
+    return componentes.reset_index()
+
+
+def rolling_panel(componentes, window=DEFAULT_WINDOW):
+    """Médias móveis de `window` competências por CNES, sobre a grade CNES x competência.
+
+    Os meses são contados no calendário (uma competência ausente no meio da
+    janela conta como inativa). Cada componente vira uma matriz (CNES, meses) e
+    a soma da janela é a diferença de somas acumuladas ao longo dos meses, sem
+    laços por hospital. Só entram (CNES, competência) ativos em todas as
+    competências da janela.
+    """
+    competen = componentes['COMPETEN'].to_numpy(dtype='int64')
+    meses = (competen // 100) * 12 + competen % 100 - 1
+    primeiro = meses.min()
+    n_meses = meses.max() - primeiro + 1
+    cnes_codes, cnes = pd.factorize(componentes['CNES'], sort=True)
+    coluna = meses - primeiro
+
+    ativo = np.zeros((len(cnes), n_meses))
+    ativo[cnes_codes, coluna] = 1
+    n_ativos = _window_sums(ativo, window)
+    completos = (n_ativos >= window) & (ativo > 0)
+    linhas, colunas = np.nonzero(completos)
+    meses_saida = colunas + primeiro
+    panel = pd.DataFrame({
+        'CNES': np.asarray(cnes)[linhas],
+        'COMPETEN': ((meses_saida // 12) * 100 + meses_saida % 12 + 1).astype('int32'),
+    })
+    for col in INPUT_COLS + OUTPUT_COLS:
+        valores = np.zeros((len(cnes), n_meses))
+        valores[cnes_codes, coluna] = componentes[col].to_numpy(dtype='float64')
+        panel[col] = (_window_sums(valores, window) / window)[linhas, colunas]
+    return panel.sort_values(['COMPETEN', 'CNES'], kind='stable').reset_index(drop=True)
+
+
+def _window_sums(matrix, window):
+    """Soma de cada janela de `window` colunas terminando em cada coluna (somas acumuladas)."""
+    acumulada = np.zeros((matrix.shape[0], matrix.shape[1] + 1))
+    np.cumsum(matrix, axis=1, out=acumulada[:, 1:])
+    inicio = np.maximum(np.arange(matrix.shape[1]) + 1 - window, 0)
+    return acumulada[:, 1:] - acumulada[:, inicio]
+
+
+def write_yearly_csvs(panel, output_dir, overwrite=False):
+    """Grava um eficiencia_resultados_<ano>.csv por ano de COMPETEN; retorna os caminhos."""
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for ano, rows in panel.groupby(panel['COMPETEN'] // 100, sort=True).groups.items():
+        path = os.path.join(output_dir, OUTPUT_PATTERN.format(ano=ano))
+        if os.path.exists(path) and not overwrite:
+            raise FileExistsError(f"{path} já existe; use --sobrescrever ou outra --saida.")
+        year = panel.loc[rows].sort_values(['CNES', 'COMPETEN'], kind='stable')
+        year.reindex(columns=CSV_COLUMNS).to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--estabelecimentos', nargs='+', required=True, help="Extratos CNES-ST (padrões glob, CSV ou Parquet).")
+    parser.add_argument('--leitos', nargs='+', required=True, help="Extratos CNES-LT.")
+    parser.add_argument('--profissionais', nargs='+', required=True, help="Extratos CNES-PF.")
+    parser.add_argument('--sia', nargs='+', required=True, help="Extratos SIA-PA (produção ambulatorial).")
+    parser.add_argument('--sih', nargs='+', required=True, help="Extratos SIH-RD (produção hospitalar).")
+    parser.add_argument('--separador', default=',', help="Separador de campos dos extratos CSV (padrão: ','; ex.: ';').")
+    parser.add_argument('--janela', type=int, default=DEFAULT_WINDOW, help=f"Competências da média móvel (padrão: {DEFAULT_WINDOW}).")
+    parser.add_argument('--saida', default='insumos_construidos', help="Diretório dos CSVs anuais gerados (padrão: insumos_construidos).")
+    parser.add_argument('--sobrescrever', action='store_true', help="Permite substituir CSVs anuais já existentes na saída.")
+    args = parser.parse_args()
+    if args.janela < 1:
+        parser.error("--janela deve ser pelo menos 1.")
+
+    start = time.perf_counter()
+    componentes = monthly_components(
+        read_extract(args.estabelecimentos, ['CNES', 'COMPETEN'], prefix=ROOM_PREFIX, delimiter=args.separador),
+        read_extract(args.leitos, ['CNES', 'COMPETEN', 'QT_SUS'], delimiter=args.separador),
+        read_extract(args.profissionais, ['CNES', 'COMPETEN', 'CBO'] + HOUR_COLS, delimiter=args.separador),
+        read_extract(args.sia, ['PA_CODUNI', 'PA_CMP', 'PA_VALAPR'], delimiter=args.separador),
+        read_extract(args.sih, ['CNES', 'ANO_CMPT', 'MES_CMPT', 'VAL_TOT'], delimiter=args.separador),
+    )
+    print(f"Componentes mensais: {len(componentes):,} linhas (CNES x competência) em {time.perf_counter() - start:.2f}s.")
+    panel = rolling_panel(componentes, args.janela)
+    print(f"Médias móveis de {args.janela} competências: {len(panel):,} linhas.")
+    for path in write_yearly_csvs(panel, args.saida, args.sobrescrever):
+        print(f"Gravado: {path}")
+    print(f"\nInsumos construídos em {time.perf_counter() - start:.2f}s.")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,37 +3,19 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 import google.generativeai as genai
+from dados_eficiencia import load_data, load_cnes_index, select_cnes, show_memory_footprint, load_bootstrap_intervals, load_malmquist, load_frontier, load_peers, load_window_scores
+from cache_analises import cache_get, cache_put, cache_stats, chamadas_stats, registrar_chamada
+from analise_ia import MODELO_GEMINI, ORCAMENTO_TOKENS, chave_analise, compactar_dados, formatar_competencia, montar_prompt, texto_em_partes, uso_tokens
 
 # --- Configuração da Página ---
 st.set_page_config(page_title="Análise CNES Individual", layout="wide") # Config específica da página
 st.title("🔬 Análise CNES Individual")
 
 # --- Funções Auxiliares ---
-excel_file_path = os.path.join(os.getcwd(), 'resultado_eficiencia.xlsx')
-
-@st.cache_data
-def load_data(file_path):
-    # ... (mesma função load_data usada na página consolidada) ...
-    try:
-        df = pd.read_excel(file_path, dtype={'CNES': str})
-        df['COMPETEN'] = pd.to_datetime(df['COMPETEN'], format='%Y%m')
-        df = df.sort_values(by='COMPETEN')
-        numeric_cols = ['CNES_SALAS', 'CNES_LEITOS_SUS', 'HORAS_MEDICOS', 'HORAS_ENFERMAGEM', 'SIA_SIH_VALOR', 'Eficiência']
-        for col in numeric_cols:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-        # Handle potential missing values if needed before returning
-        # For example, fill specific columns with 0 or mean, or drop rows
-        # df['HORAS_MEDICOS'] = df['HORAS_MEDICOS'].fillna(0) # Example
-        return df
-    except FileNotFoundError:
-        st.error(f"Erro: Arquivo '{os.path.basename(file_path)}' não encontrado.")
-        return None
-    except Exception as e:
-        st.error(f"Erro ao carregar '{os.path.basename(file_path)}': {e}")
-        return None
-
 def format_pt_br(value, precision=0, prefix=""):
     # ... (mesma função format_pt_br usada na página consolidada) ...
     if pd.isna(value):
@@ -46,59 +28,123 @@ def format_pt_br(value, precision=0, prefix=""):
         return value
 
 # --- Função para chamar a API Gemini ---
-@st.cache_data # Cacheia a chamada da API para evitar repetições
-def gerar_analise_evolucao(cnes, periodo_inicio, periodo_fim, dados_mensais_md):
+# A análise roda em segundo plano: o restante da página é exibido sem esperar o
+# modelo, e um fragmento acompanha a tarefa e mostra a resposta à medida que chega.
+INTERVALO_ACOMPANHAMENTO = 1 # segundos entre as verificações do fragmento
+MAX_ANALISES_SESSAO = 50 # CNES/períodos lembrados por sessão (os mais antigos saem primeiro)
+
+@st.cache_resource
+def executor_analises():
+    """Executor, tarefas em andamento (chave -> tarefa) e trava, compartilhados entre sessões.
+
+    Duas sessões que pedem a mesma análise acompanham a mesma tarefa, em vez de
+    chamar o modelo duas vezes.
+    """
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix='analise_ia'), {}, threading.Lock()
+
+def gerar_analise_evolucao(chave, api_key, prompt, partes, nivel, tokens_estimados):
     """
     Chama a API Gemini para gerar uma análise textual da evolução dos indicadores,
-    usando dados mensais detalhados e contexto DEA.
+    usando dados mensais detalhados e contexto DEA. Executada no executor em
+    segundo plano (sem chamadas ao Streamlit).
+
+    As partes da resposta (stream=True) são acrescentadas a `partes` à medida que
+    chegam, para o fragmento exibi-las durante a geração. Devolve (ok, texto): a
+    análise completa vai para o cache persistente de cache_analises.py, junto
+    com os tokens enviados e recebidos na chamada; mensagens de erro e respostas
+    vazias não são guardadas.
     """
-    api_key = st.secrets.get("GEMINI_API_KEY")
-    if not api_key:
-        return "Erro: Chave da API Gemini não configurada em .streamlit/secrets.toml"
-
+    inicio = time.perf_counter()
     try:
         genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-2.5-pro-exp-03-25') # Alterado de gemini-1.5-flash
-
-        # Prompt detalhado com contexto DEA e dados mensais
-        prompt = f"""
-        **Tarefa:** Analisar a evolução da eficiência do hospital com CNES {cnes} durante o período de {periodo_inicio} a {periodo_fim}.
-
-        **Contexto da Análise:**
-        - **Métrica Principal:** Eficiência, calculada via Análise Envoltória de Dados (DEA), com score variando de 0 (menos eficiente) a 1 (mais eficiente).
-        - **Fatores Considerados (Inputs DEA):** CNES_SALAS (Número de Salas), CNES_LEITOS_SUS (Número de Leitos SUS), HORAS_MEDICOS (Total de Horas Médicas), HORAS_ENFERMAGEM (Total de Horas de Enfermagem).
-        - **Resultado Medido (Output DEA):** SIA_SIH_VALOR (Valor da Produção Ambulatorial e Hospitalar).
-        - **Interpretação da Eficiência DEA:** A eficiência indica a capacidade do hospital em gerar produção (output) a partir dos recursos utilizados (inputs).
-            - Aumento de inputs sem aumento proporcional de output -> tende a *diminuir* a eficiência.
-            - Redução de inputs mantendo/aumentando output -> tende a *aumentar* a eficiência.
-            - Aumento de output sem aumento proporcional de inputs -> tende a *aumentar* a eficiência.
-
-        **Dados Mensais para Análise (Formato Markdown):**
-        {dados_mensais_md}
-
-        **Instruções para a Resposta:**
-        1.  **Formato:** Gere uma análise textual concisa (aproximadamente 3 a 5 frases) em português brasileiro.
-        2.  **Foco Exclusivo:** Baseie sua análise *estritamente* nos dados fornecidos na tabela (Eficiência, Leitos, Salas, Produção, Horas Médicos, Horas Enfermagem) e no período especificado.
-        3.  **Conteúdo da Análise:** Descreva as principais tendências da *Eficiência* durante o período. **Verifique e comente explicitamente na análise se as variações na eficiência (aumentos, diminuições, estabilidade) são coerentes com as mudanças observadas nos inputs (Leitos, Salas, Horas) e no output (Produção), aplicando a lógica de interpretação DEA fornecida.**
-        4.  **Restrição Crucial:** *Não* faça suposições sobre causas externas, não ofereça recomendações, sugestões de melhoria ou qualquer análise que extrapole a observação direta dos dados e suas correlações internas conforme a lógica DEA explicada. 
-              *Não citar lógica DEA expressamente no texto final*, use a lógica apenas para seu raciocínio.
-
-        """
-
-        response = model.generate_content(prompt)
-        return response.text
-
+        model = genai.GenerativeModel(MODELO_GEMINI)
+        response = model.generate_content(prompt, stream=True)
+        for parte in texto_em_partes(response):
+            partes.append(parte)
     except Exception as e:
-        return f"Erro ao gerar análise com Gemini: {e}"
+        return False, f"Erro ao gerar análise com Gemini: {e}"
+    if not partes:
+        return False, "Erro ao gerar análise com Gemini: resposta vazia."
+    texto = ''.join(partes)
+    cache_put(chave, texto, MODELO_GEMINI)
+    registrar_chamada(chave, MODELO_GEMINI, nivel, tokens_estimados, *uso_tokens(response), time.perf_counter() - inicio)
+    return True, texto
+
+def iniciar_analise(chave, cnes, periodo_inicio, periodo_fim, dados_mensais_md, nivel, tokens_estimados):
+    """Tarefa ({'future', 'partes'}) da análise da chave, submetida ao executor se ainda não existir.
+
+    Tarefas concluídas com sucesso saem do registro só depois do cache_put; as
+    com erro saem quando a página exibe o erro (ver descartar_falha). Sem tarefa registrada, o
+    cache é consultado de novo sob a trava antes de chamar o modelo, pois a
+    análise pode ter sido concluída (por esta ou outra sessão) depois da
+    consulta da página; nesse caso volta uma tarefa já concluída com o texto
+    do cache. None se a chave da API não estiver configurada.
+    """
+    api_key = st.secrets.get("GEMINI_API_KEY")
+    if not api_key:
+        return None
+    executor, tarefas, trava = executor_analises()
+    with trava:
+        if chave not in tarefas:
+            texto = cache_get(chave, contar=False)
+            if texto is not None:
+                future = Future()
+                future.set_result((True, texto))
+                return {'future': future, 'partes': [texto]}
+            partes = []
+            prompt = montar_prompt(cnes, periodo_inicio, periodo_fim, dados_mensais_md, nivel)
+            future = executor.submit(gerar_analise_evolucao, chave, api_key, prompt, partes, nivel, tokens_estimados)
+            tarefas[chave] = {'future': future, 'partes': partes}
+
+            # Chamado quando gerar_analise_evolucao retorna, ou seja, com o cache_put já concluído
+            def concluir(future):
+                if future.result()[0]:
+                    with trava:
+                        tarefas.pop(chave, None)
+
+            future.add_done_callback(concluir)
+        return tarefas[chave]
+
+def descartar_falha(chave, tarefa):
+    """Remove do registro a tarefa com erro, já exibido; a sessão guarda a mensagem até nova tentativa."""
+    _, tarefas, trava = executor_analises()
+    with trava:
+        if tarefas.get(chave) is tarefa: # Não remove uma nova tentativa de outra sessão
+            del tarefas[chave]
+
+def lembrar_na_sessao(nome, chave, valor):
+    """Guarda chave -> valor no dicionário `nome` da sessão, limitado às MAX_ANALISES_SESSAO chaves mais recentes."""
+    lembradas = st.session_state.setdefault(nome, {})
+    lembradas.pop(chave, None)
+    lembradas[chave] = valor
+    while len(lembradas) > MAX_ANALISES_SESSAO:
+        del lembradas[next(iter(lembradas))]
+
+@st.fragment(run_every=INTERVALO_ACOMPANHAMENTO)
+def acompanhar_analise(chave):
+    """Mostra a resposta parcial da tarefa em andamento; ao terminar, reexecuta a página para exibi-la."""
+    tarefa = executor_analises()[1].get(chave)
+    if tarefa is None or tarefa['future'].done():
+        st.rerun()
+    parcial = ''.join(tarefa['partes'])
+    if parcial:
+        st.markdown(parcial + " ▌")
+    else:
+        st.info("Gerando análise detalhada com IA... O restante da página já pode ser consultado.")
 
 # --- Carregar Dados ---
-df = load_data(excel_file_path)
+df = load_data()
+cnes_index = load_cnes_index()
+bootstrap_intervals = load_bootstrap_intervals() # Opcional (dea_bootstrap.py); (tabela, índice por CNES) ou None
+malmquist = load_malmquist() # Opcional (dea_malmquist.py); (tabela, índice por CNES) ou None
+window_scores = load_window_scores() # Opcional (dea_janela.py); (tabela, índice por CNES) ou None
 
 if df is not None and not df.empty:
+    show_memory_footprint(df)
     # --- Sidebar Filters ---
     st.sidebar.header("Filtros (Análise Individual)") # Título ajustado
     # ... (código do selectbox e slider como antes, talvez com key diferente se necessário) ...
-    all_cnes = sorted(df['CNES'].unique())
+    all_cnes = list(cnes_index[0]) # Já ordenados pelo índice
     selected_cnes = st.sidebar.selectbox("Selecione o CNES:", options=all_cnes, key="select_cnes_individual")
 
     min_competencia = df['COMPETEN'].min().to_pydatetime()
@@ -111,16 +157,29 @@ if df is not None and not df.empty:
         format="MM/YYYY",
         key="slider_individual"
     )
-    # ... (código de filtragem como antes) ...
-    filtered_df = df[
-        (df['CNES'] == selected_cnes) &
-        (df['COMPETEN'] >= selected_competencia_range[0]) &
-        (df['COMPETEN'] <= selected_competencia_range[1])
-    ].copy() # Usar cópia
+    # Seleção por busca binária no índice por CNES (sem varrer o DataFrame inteiro)
+    filtered_df = select_cnes(
+        df, cnes_index, selected_cnes,
+        selected_competencia_range[0], selected_competencia_range[1]
+    ).copy() # Usar cópia
+
+    # Intervalos bootstrap da eficiência DEA recalculada para o CNES e período selecionados
+    intervalos_cnes = None
+    if bootstrap_intervals is not None:
+        intervalos_cnes = select_cnes(*bootstrap_intervals, selected_cnes, *selected_competencia_range)
+        if intervalos_cnes['ic_inferior'].isna().all():
+            intervalos_cnes = None
+
+    # Scores da análise de janela DEA para o CNES e período selecionados
+    janela_cnes = None
+    if window_scores is not None:
+        janela_cnes = select_cnes(*window_scores, selected_cnes, *selected_competencia_range)
+        if janela_cnes['Eficiência_janela'].isna().all():
+            janela_cnes = None
 
     st.markdown("### Indicadores Principais")
     if not filtered_df.empty:
-        filtered_df_sorted = filtered_df.sort_values(by='COMPETEN')
+        filtered_df_sorted = filtered_df # select_cnes já retorna ordenado por COMPETEN
         latest_data = filtered_df_sorted.iloc[-1]
 
         # --- Display KPIs (com formatação pt-BR) ---
@@ -173,48 +232,132 @@ if df is not None and not df.empty:
             # Update: px.line doesn't directly take hovertemplate this way, use update_traces
         )
         # Apply formatted template using update_traces
-        fig_eficiencia.update_traces(hovertemplate=hover_template_eficiencia_final)
+        fig_eficiencia.update_traces(hovertemplate=hover_template_eficiencia_final, name='Eficiência', showlegend=True)
         fig_eficiencia.update_layout(xaxis_title="Competência", yaxis_title="Eficiência", hovermode="x unified")
         st.plotly_chart(fig_eficiencia, use_container_width=True)
 
+        # --- Scores DEA recalculados: intervalo bootstrap e análise de janela ---
+        # Em gráfico próprio: dea.py não reproduz a Eficiência acima e seus scores
+        # estão em outra escala, então não dividem o eixo com ela.
+        if intervalos_cnes is not None or janela_cnes is not None:
+            st.subheader(f"Score DEA recalculado por `dea.py` (CNES: {selected_cnes})")
+            fig_dea = go.Figure()
+        if intervalos_cnes is not None:
+            hover_ic_final = (
+                "<b>IC bootstrap:</b> %{customdata[0]:,.4f} a %{y:,.4f}<extra></extra>"
+            ).replace(',', '#').replace('.', ',').replace('#', '.')
+            hover_corrigida_final = (
+                "<b>Score DEA corrigido de viés:</b> %{y:,.4f}<extra></extra>"
+            ).replace(',', '#').replace('.', ',').replace('#', '.')
+            hover_dea_final = (
+                "<b>Score DEA estimado:</b> %{y:,.4f}<extra></extra>"
+            ).replace(',', '#').replace('.', ',').replace('#', '.')
+            fig_dea.add_trace(go.Scatter(
+                x=intervalos_cnes['COMPETEN'], y=intervalos_cnes['ic_inferior'],
+                mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip',
+            ))
+            fig_dea.add_trace(go.Scatter(
+                x=intervalos_cnes['COMPETEN'], y=intervalos_cnes['ic_superior'],
+                mode='lines', line=dict(width=0), fill='tonexty', fillcolor='rgba(99, 110, 250, 0.2)',
+                name='Intervalo bootstrap', customdata=intervalos_cnes[['ic_inferior']],
+                hovertemplate=hover_ic_final,
+            ))
+            fig_dea.add_trace(go.Scatter(
+                x=intervalos_cnes['COMPETEN'], y=intervalos_cnes['eficiencia_corrigida'],
+                mode='lines+markers', name='Score DEA corrigido de viés',
+                hovertemplate=hover_corrigida_final,
+            ))
+            fig_dea.add_trace(go.Scatter(
+                x=intervalos_cnes['COMPETEN'], y=intervalos_cnes['Eficiência_DEA'],
+                mode='lines', line=dict(dash='dash'), name='Score DEA estimado',
+                hovertemplate=hover_dea_final,
+            ))
+        # Série da análise de janela (vários meses por fronteira), menos sensível ao ruído de um mês
+        if janela_cnes is not None:
+            hover_janela_final = (
+                "<b>Score DEA de janela:</b> %{y:,.4f}<extra></extra>"
+            ).replace(',', '#').replace('.', ',').replace('#', '.')
+            fig_dea.add_trace(go.Scatter(
+                x=janela_cnes['COMPETEN'], y=janela_cnes['Eficiência_janela'],
+                mode='lines', line=dict(dash='dot'), name='Score DEA de janela',
+                hovertemplate=hover_janela_final,
+            ))
+        if intervalos_cnes is not None or janela_cnes is not None:
+            fig_dea.update_layout(xaxis_title="Competência", yaxis_title="Score DEA recalculado", hovermode="x unified")
+            st.plotly_chart(fig_dea, use_container_width=True)
+            st.caption(
+                "Scores do DEA recalculado por `dea.py`, em outra escala: este modelo não reproduz a Eficiência "
+                "dos dados de origem (ver README) e os dois não devem ser comparados."
+            )
+        if intervalos_cnes is not None:
+            st.caption(
+                "A faixa é o intervalo de confiança bootstrap (Simar–Wilson) em torno do score corrigido de viés; "
+                "como o score estimado tem viés para cima, ele pode ficar acima da faixa."
+            )
+        if janela_cnes is not None:
+            st.caption("A série de janela avalia cada mês contra os hospitais dos últimos meses juntos (`dea_janela.py`), o que suaviza oscilações de um único mês.")
+
         # --- Análise Automática com Gemini ---
         st.subheader("🤖 Análise Automática da Evolução (IA)")
 
         # Verificar se temos dados suficientes (pelo menos 1 ponto)
         if not filtered_df_sorted.empty:
             try:
-                # Preparar dados mensais para o prompt (tabela Markdown)
-                cols_para_analise = ['COMPETEN', 'Eficiência', 'CNES_LEITOS_SUS', 'SIA_SIH_VALOR', 'HORAS_MEDICOS', 'HORAS_ENFERMAGEM']
-                df_analise = filtered_df_sorted[cols_para_analise].copy()
-
-                # Formatar data para MM/YYYY
-                df_analise['COMPETEN'] = df_analise['COMPETEN'].dt.strftime('%m/%Y')
-
-                # Renomear colunas para clareza no prompt (opcional, mas bom)
-                df_analise.rename(columns={
-                    'COMPETEN': 'Competência',
-                    'CNES_LEITOS_SUS': 'Leitos SUS',
-                    'SIA_SIH_VALOR': 'Produção Total',
-                    'HORAS_MEDICOS': 'Horas Médicos',
-                    'HORAS_ENFERMAGEM': 'Horas Enfermagem'
-                }, inplace=True)
-
-                # Converter para Markdown
-                # Usar floatfmt para formatar números (ajuste as precisões conforme necessário)
-                dados_mensais_md = df_analise.to_markdown(
-                    index=False,
-                    floatfmt=(".0s", ".4f", ".0f", ",.2f", ".0f", ".0f") # Formatos: Competencia, Eficiência, Leitos, Prod, HMed, HEnf
+                periodo_inicio = formatar_competencia(selected_competencia_range[0])
+                periodo_fim = formatar_competencia(selected_competencia_range[1])
+                # Preparar dados para o prompt: tabela mensal, ou resumo se não couber no orçamento de tokens
+                dados_mensais_md, nivel_ia, tokens_ia = compactar_dados(
+                    filtered_df_sorted, selected_cnes, periodo_inicio, periodo_fim
                 )
-
-                # Chamar a função cacheada com a string markdown
-                with st.spinner("Gerando análise detalhada com IA... Aguarde alguns segundos."):
-                    analise_texto = gerar_analise_evolucao(
-                        selected_cnes,
-                        selected_competencia_range[0].strftime('%m/%Y'),
-                        selected_competencia_range[1].strftime('%m/%Y'),
-                        dados_mensais_md # Passa a tabela markdown
+                chave_ia = chave_analise(selected_cnes, periodo_inicio, periodo_fim, dados_mensais_md)
+
+                # Cache primeiro, consultado uma vez por CNES/período na sessão (reexecuções da
+                # página e do fragmento não contam como novas buscas); senão, a análise é
+                # gerada em segundo plano e a página segue. Erros ficam na sessão (não no
+                # registro compartilhado de tarefas) até o usuário pedir nova tentativa
+                if chave_ia not in st.session_state.get('analises_ia', {}):
+                    lembrar_na_sessao('analises_ia', chave_ia, cache_get(chave_ia))
+                analise_texto = st.session_state['analises_ia'][chave_ia]
+                erro_ia = st.session_state.get('erros_ia', {}).get(chave_ia)
+                if analise_texto is None and erro_ia is None:
+                    tarefa_ia = iniciar_analise(
+                        chave_ia, selected_cnes, periodo_inicio, periodo_fim, dados_mensais_md, nivel_ia, tokens_ia
+                    )
+                    if tarefa_ia is None:
+                        analise_texto = "Erro: Chave da API Gemini não configurada em .streamlit/secrets.toml"
+                    elif tarefa_ia['future'].done():
+                        ok_ia, texto_ia = tarefa_ia['future'].result()
+                        if ok_ia:
+                            analise_texto = st.session_state['analises_ia'][chave_ia] = texto_ia
+                        else:
+                            erro_ia = texto_ia
+                            lembrar_na_sessao('erros_ia', chave_ia, erro_ia)
+                            descartar_falha(chave_ia, tarefa_ia)
+                if erro_ia is not None:
+                    st.markdown(erro_ia)
+                    if st.button("Tentar novamente", key=f"repetir_ia_{chave_ia}"):
+                        st.session_state['erros_ia'].pop(chave_ia, None)
+                        st.rerun()
+                elif analise_texto is not None:
+                    st.markdown(analise_texto)
+                else:
+                    acompanhar_analise(chave_ia)
+                stats_cache = cache_stats()
+                stats_chamadas = chamadas_stats()
+                n_chamadas = sum(nivel['chamadas'] for nivel in stats_chamadas.values())
+                texto_tokens = ""
+                if n_chamadas:
+                    media_tokens = sum(nivel['chamadas'] * nivel['tokens_prompt'] for nivel in stats_chamadas.values()) / n_chamadas
+                    texto_tokens = f" Média de {format_pt_br(media_tokens)} tokens enviados em {format_pt_br(n_chamadas)} chamadas."
+                st.caption(
+                    f"Cache de análises: {format_pt_br(stats_cache['acertos'])} acertos, {format_pt_br(stats_cache['falhas'])} falhas, "
+                    f"{format_pt_br(stats_cache['entradas'])} análises guardadas.{texto_tokens}"
+                )
+                if nivel_ia != 'mensal':
+                    st.caption(
+                        f"Período longo: para caber no limite de {format_pt_br(ORCAMENTO_TOKENS)} tokens, o modelo recebeu a série "
+                        f"resumida ({nivel_ia}, com estatísticas do período e mudanças de nível), ~{format_pt_br(tokens_ia)} tokens."
                     )
-                st.markdown(analise_texto)
 
             except Exception as e:
                 st.error(f"Ocorreu um erro ao gerar a análise automática: {e}")
@@ -275,6 +418,153 @@ if df is not None and not df.empty:
         fig_subplots.update_yaxes(title_text="Horas Enfermagem", row=2, col=2)
         st.plotly_chart(fig_subplots, use_container_width=True)
 
+        # --- Índice de Malmquist (pré-calculado por dea_malmquist.py) ---
+        if malmquist is not None:
+            malmquist_cnes = select_cnes(*malmquist, selected_cnes, *selected_competencia_range)
+            if not malmquist_cnes.empty:
+                st.divider()
+                st.subheader("Índice de Malmquist (variação em relação ao mês anterior)")
+                fig_malmquist = go.Figure()
+                for coluna, nome in [
+                    ('malmquist', 'Produtividade (Malmquist)'),
+                    ('variacao_eficiencia', 'Variação de eficiência'),
+                    ('variacao_tecnologica', 'Variação tecnológica'),
+                ]:
+                    hover_malmquist_final = (
+                        "<b>Competência:</b> %{x|%m/%Y}<br>" +
+                        f"<b>{nome}:</b> " + "%{y:,.4f}<extra></extra>"
+                    ).replace(',', '#').replace('.', ',').replace('#', '.')
+                    fig_malmquist.add_trace(go.Scatter(
+                        x=malmquist_cnes['COMPETEN'], y=malmquist_cnes[coluna], mode='lines+markers',
+                        name=nome, hovertemplate=hover_malmquist_final,
+                    ))
+                fig_malmquist.add_hline(y=1, line_dash='dot', line_color='gray')
+                fig_malmquist.update_layout(xaxis_title="Competência", yaxis_title="Índice (1 = sem variação)", hovermode="x unified")
+                st.plotly_chart(fig_malmquist, use_container_width=True)
+                st.caption(
+                    "Acima de 1 indica melhora em relação ao mês anterior. A produtividade é o produto da variação "
+                    "de eficiência (aproximação da fronteira) pela variação tecnológica (deslocamento da fronteira), "
+                    "calculadas com o DEA recalculado por `dea.py`."
+                )
+
+        st.divider()
+
+        # --- Simulador de cenários contra a fronteira da competência (em cache) ---
+        # Importado aqui: o motor DEA traz o scipy, que só o simulador e os pares usam
+        from dea import INPUT_COLS, OUTPUT_COLS, project_dmu
+
+        st.subheader("🧪 Simulador de Cenários")
+        st.caption(
+            "Altere os insumos ou a produção do hospital e veja o score DEA recalculado por `dea.py`, projetado "
+            "contra a fronteira eficiente da competência escolhida. Só as unidades da fronteira entram no cálculo, "
+            "que é refeito na hora. Os dois valores abaixo vêm do mesmo cálculo; ele está em outra escala e não "
+            "reproduz a Eficiência mostrada nos indicadores e no gráfico principal."
+        )
+        rotulos_simulador = {
+            'CNES_SALAS': 'Salas', 'CNES_LEITOS_SUS': 'Leitos SUS', 'HORAS_MEDICOS': 'Horas Médicos',
+            'HORAS_ENFERMAGEM': 'Horas Enfermagem', 'SIA_SIH_VALOR': 'Produção Total',
+        }
+        col_sim_mes, col_sim_rts = st.columns(2)
+        competencias_simulador = filtered_df_sorted['COMPETEN'].dt.strftime('%m/%Y').tolist()
+        competencia_simulada = col_sim_mes.selectbox(
+            "Competência", competencias_simulador, index=len(competencias_simulador) - 1, key="sim_competencia"
+        )
+        rts_simulador = col_sim_rts.radio(
+            "Retornos de escala", ['crs', 'vrs'], horizontal=True, key="sim_rts",
+            format_func=lambda rts: "Constantes (CRS)" if rts == 'crs' else "Variáveis (VRS)",
+        )
+        linha_simulada = filtered_df_sorted.iloc[competencias_simulador.index(competencia_simulada)]
+        valores_atuais = linha_simulada[INPUT_COLS + OUTPUT_COLS].astype('float64')
+        if valores_atuais.isna().any() or not (valores_atuais[INPUT_COLS] > 0).any():
+            st.info("Os dados do hospital nesta competência estão incompletos; não é possível simular.")
+        else:
+            competen_simulado = linha_simulada['COMPETEN'].year * 100 + linha_simulada['COMPETEN'].month
+            _, fronteira_X, fronteira_Y = load_frontier(competen_simulado, rts_simulador)
+
+            # Chaves com CNES e competência: os campos voltam aos valores reais ao trocar de hospital ou mês
+            valores_simulados = {}
+            colunas_simulador = st.columns(len(INPUT_COLS + OUTPUT_COLS))
+            for coluna_sim, col in zip(colunas_simulador, INPUT_COLS + OUTPUT_COLS):
+                valores_simulados[col] = coluna_sim.number_input(
+                    rotulos_simulador[col], min_value=0.0, value=float(valores_atuais[col]),
+                    step=max(float(valores_atuais[col]) * 0.05, 1.0),
+                    key=f"sim_{col}_{selected_cnes}_{competen_simulado}",
+                )
+            valores_simulados = pd.Series(valores_simulados)
+
+            theta_atual, _, _, _ = project_dmu(
+                valores_atuais[INPUT_COLS], valores_atuais[OUTPUT_COLS], fronteira_X, fronteira_Y, rts_simulador
+            )
+            theta_simulado, _, metas_insumos, metas_produto = project_dmu(
+                valores_simulados[INPUT_COLS], valores_simulados[OUTPUT_COLS], fronteira_X, fronteira_Y, rts_simulador
+            )
+            col_sim1, col_sim2 = st.columns(2)
+            col_sim1.metric(f"Score DEA recalculado em {competencia_simulada} (dados reais)", format_pt_br(theta_atual, 4))
+            delta_simulado = "N/A"
+            if pd.notna(theta_atual) and pd.notna(theta_simulado) and theta_atual != 0:
+                delta_simulado = f"{(theta_simulado - theta_atual) / theta_atual * 100:.2f}%"
+            col_sim2.metric("Score DEA recalculado (cenário simulado)", format_pt_br(theta_simulado, 4), delta=delta_simulado)
+
+            if pd.notna(theta_simulado):
+                metas = pd.DataFrame({
+                    'Variável': [rotulos_simulador[col] for col in INPUT_COLS + OUTPUT_COLS],
+                    'Simulado': valores_simulados[INPUT_COLS + OUTPUT_COLS].to_numpy(),
+                    'Meta (fronteira)': list(metas_insumos) + list(metas_produto),
+                })
+                metas['Variação necessária'] = (
+                    (metas['Meta (fronteira)'] / metas['Simulado'] - 1) * 100
+                ).where(metas['Simulado'] > 0)
+                precisoes = [1] * len(INPUT_COLS) + [2] * len(OUTPUT_COLS)
+                for col in ['Simulado', 'Meta (fronteira)']:
+                    metas[col] = [format_pt_br(valor, precisao) for valor, precisao in zip(metas[col], precisoes)]
+                metas['Variação necessária'] = metas['Variação necessária'].apply(
+                    lambda valor: '-' if pd.isna(valor) else f"{format_pt_br(valor, 1)}%"
+                )
+                st.dataframe(metas, hide_index=True, use_container_width=True)
+                st.caption(
+                    "Metas de insumos: o ponto da fronteira que produz ao menos o mesmo com o menor uso de insumos "
+                    "(redução proporcional pelo score DEA mais as folgas de cada insumo). Score acima de 1 indica "
+                    "um cenário além da fronteira atual da competência."
+                )
+            else:
+                st.info("Não foi possível projetar este cenário na fronteira da competência.")
+
+        # --- Hospitais de referência (pares DEA gravados por dea_pares.py) ---
+        pares_dea = load_peers()
+        if pares_dea is not None:
+            from dea_pares import peer_lookup
+
+            competen_pares = latest_data['COMPETEN'].year * 100 + latest_data['COMPETEN'].month
+            linha_pares, grupo_pares = peer_lookup(*pares_dea, selected_cnes, competen_pares)
+            if linha_pares is not None and pd.notna(linha_pares['Eficiência_DEA']):
+                st.divider()
+                st.subheader(f"👥 Hospitais de Referência em {latest_data['COMPETEN'].strftime('%m/%Y')}")
+                if linha_pares['Eficiência_DEA'] >= 1 - 1e-6:
+                    st.success("O hospital está na fronteira eficiente desta competência: é referência para outros hospitais.")
+                else:
+                    st.caption(
+                        "Hospitais da fronteira eficiente cuja combinação (com os pesos abaixo) forma a meta DEA deste hospital: "
+                        "são as comparações mais diretas para identificar práticas a adotar."
+                    )
+                    referencias = []
+                    for cnes_par, peso in zip(grupo_pares['CNES'], grupo_pares['peso']):
+                        dados_par = select_cnes(df, cnes_index, cnes_par, latest_data['COMPETEN'], latest_data['COMPETEN'])
+                        referencia = {'CNES': cnes_par, 'Peso': format_pt_br(peso, 4)}
+                        for col in INPUT_COLS + OUTPUT_COLS:
+                            valor = dados_par[col].iloc[0] if not dados_par.empty else None
+                            referencia[rotulos_simulador[col]] = format_pt_br(valor, 2 if col in OUTPUT_COLS else 0)
+                        referencias.append(referencia)
+                    st.dataframe(pd.DataFrame(referencias), hide_index=True, use_container_width=True)
+                    folgas = {
+                        rotulos_simulador[col]: linha_pares[f'folga_{col}'] for col in INPUT_COLS + OUTPUT_COLS
+                        if linha_pares[f'folga_{col}'] > 1e-6
+                    }
+                    if folgas:
+                        st.caption(
+                            "Folgas além da redução proporcional: "
+                            + "; ".join(f"{nome}: {format_pt_br(valor, 2)}" for nome, valor in folgas.items()) + "."
+                        )
+
         st.divider()
 
         # --- Distribuição e Correlações (com hover formatado) ---
@@ -391,4 +681,4 @@ if df is not None and not df.empty:
 elif df is None:
     pass # Erro tratado em load_data
 else:
-    st.warning("O arquivo Excel de origem está vazio ou não pôde ser lido corretamente.") 
\ No newline at end of file
+    st.warning("Os dados de origem estão vazios ou não puderam ser lidos corretamente.") 
\ No newline at end of file
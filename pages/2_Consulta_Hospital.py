@@ -6,6 +6,7 @@ import google.generativeai as genai
 from google.generativeai.types import GenerationConfig
 # Remover GenerateContentConfig e GoogleSearch
 import os
+from analise_ia import texto_em_partes
 
 st.set_page_config(page_title="Consulta Hospital", layout="centered")
 st.title("🏥 Consulta Informações do Hospital")
@@ -69,15 +70,17 @@ try:
                     # Remove menção à busca no spinner
                     with st.spinner("Consultando o Gemini (GenerativeModel API)..."):
                         # Chama a API usando GenerativeModel SEM a ferramenta de busca e com config
+                        # stream=True: a chamada retorna com a primeira parte da resposta
                         response = model.generate_content(
                             prompt,
-                            generation_config=generation_config # Adiciona config
+                            generation_config=generation_config, # Adiciona config
+                            stream=True
                             # tools=[search_tool] # Removido
                         )
                     st.subheader("Resultado da Consulta:")
 
-                    # Extrai o texto da resposta (estrutura simples)
-                    st.markdown(response.text)
+                    # Exibe o texto da resposta à medida que as partes chegam
+                    st.write_stream(texto_em_partes(response))
 
                     # Remove toda a seção de metadados de grounding
                     # try:
@@ -3,32 +3,13 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go # Adicionado para go.Scatter
-import os
+from dados_eficiencia import load_monthly_aggregates, load_monthly_outliers, load_window_aggregates
 
 # --- Configuração da Página ---
 st.set_page_config(page_title="Resultados Consolidados", layout="wide")
 st.title("📊 Resultados Consolidados por Competência") # Título ajustado
 
 # --- Funções Auxiliares ---
-excel_file_path = os.path.join(os.getcwd(), 'resultado_eficiencia.xlsx')
-
-@st.cache_data
-def load_data(file_path):
-    try:
-        df = pd.read_excel(file_path, dtype={'CNES': str})
-        df['COMPETEN'] = pd.to_datetime(df['COMPETEN'], format='%Y%m')
-        df = df.sort_values(by='COMPETEN')
-        numeric_cols = ['CNES_SALAS', 'CNES_LEITOS_SUS', 'HORAS_MEDICOS', 'HORAS_ENFERMAGEM', 'SIA_SIH_VALOR', 'Eficiência']
-        for col in numeric_cols:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-        return df
-    except FileNotFoundError:
-        st.error(f"Erro: Arquivo '{os.path.basename(file_path)}' não encontrado.")
-        return None
-    except Exception as e:
-        st.error(f"Erro ao carregar '{os.path.basename(file_path)}': {e}")
-        return None
-
 def format_pt_br(value, precision=0, prefix=""):
     if pd.isna(value):
         return '-'
@@ -39,25 +20,17 @@ def format_pt_br(value, precision=0, prefix=""):
     except (TypeError, ValueError):
         return value
 
-# Função para cálculo seguro da média ponderada por grupo
-def weighted_average(group, data_col, weight_col):
-    d = group[data_col]
-    w = group[weight_col]
-    # Filtrar NaNs e pesos <= 0
-    valid_indices = d.notna() & w.notna() & (w > 0)
-    d = d[valid_indices]
-    w = w[valid_indices]
-    if w.sum() == 0:
-        return np.nan # Ou 0, ou outra indicação
-    return np.average(d, weights=w)
-
 # --- Carregar Dados ---
-df_total = load_data(excel_file_path)
+# Agregados mensais pré-calculados na ingestão (médias, quartis e bigodes por competência)
+# e amostra limitada de outliers: a página não carrega as linhas individuais
+monthly_table = load_monthly_aggregates()
+monthly_outliers = load_monthly_outliers()
+window_table = load_window_aggregates() # Opcional (dea_janela.py); None se não calculado
 
-if df_total is not None and not df_total.empty:
+if monthly_table is not None and monthly_outliers is not None and not monthly_table.empty:
     st.sidebar.header("Filtro de Período") # Simplificado
-    min_competencia_total = df_total['COMPETEN'].min().to_pydatetime()
-    max_competencia_total = df_total['COMPETEN'].max().to_pydatetime()
+    min_competencia_total = monthly_table['COMPETEN'].min().to_pydatetime()
+    max_competencia_total = monthly_table['COMPETEN'].max().to_pydatetime()
 
     selected_competencia_range_total = st.sidebar.slider(
         "Selecione o Período (COMPETEN):",
@@ -69,49 +42,34 @@ if df_total is not None and not df_total.empty:
     )
 
     # --- Filtrar Dados baseado no Slider ---
-    filtered_df_total = df_total[
-        (df_total['COMPETEN'] >= selected_competencia_range_total[0]) &
-        (df_total['COMPETEN'] <= selected_competencia_range_total[1])
-    ].copy()
-
-    if not filtered_df_total.empty:
+    monthly_aggregates = monthly_table[
+        (monthly_table['COMPETEN'] >= selected_competencia_range_total[0]) &
+        (monthly_table['COMPETEN'] <= selected_competencia_range_total[1])
+    ]
+
+    window_aggregates = None
+    if window_table is not None:
+        window_aggregates = window_table[
+            (window_table['COMPETEN'] >= selected_competencia_range_total[0]) &
+            (window_table['COMPETEN'] <= selected_competencia_range_total[1])
+        ]
+
+    if not monthly_aggregates.empty:
         st.markdown("### Métricas Gerais (Período Selecionado)")
-        # --- Calcular e Exibir Métricas Gerais ---
+        # --- Calcular e Exibir Métricas Gerais (a partir das somas mensais) ---
         col1_geral, col2_geral = st.columns(2)
-        media_simples_geral = filtered_df_total['Eficiência'].mean()
+        n_geral = monthly_aggregates['n_eficiencia'].sum()
+        media_simples_geral = monthly_aggregates['soma_eficiencia'].sum() / n_geral if n_geral > 0 else np.nan
         col1_geral.metric("Média Simples (Geral)", format_pt_br(media_simples_geral, 4))
-        df_ponderada_geral = filtered_df_total.dropna(subset=['Eficiência', 'SIA_SIH_VALOR'])
-        df_ponderada_geral = df_ponderada_geral[df_ponderada_geral['SIA_SIH_VALOR'] > 0]
-        if not df_ponderada_geral.empty:
-            media_ponderada_geral = np.average(df_ponderada_geral['Eficiência'], weights=df_ponderada_geral['SIA_SIH_VALOR'])
+        soma_pesos_geral = monthly_aggregates['soma_pesos'].sum()
+        if soma_pesos_geral > 0:
+            media_ponderada_geral = monthly_aggregates['soma_eficiencia_ponderada'].sum() / soma_pesos_geral
             col2_geral.metric("Média Ponderada (Geral)", format_pt_br(media_ponderada_geral, 4))
         else:
             col2_geral.metric("Média Ponderada (Geral)", "N/A")
 
         st.divider()
 
-        # --- Calcular Métricas Mensais ---
-        # Usar Grouper para garantir que agrupe por mês corretamente
-        # Usar floor('D') para garantir que a data resultante seja o início do mês para junção consistente
-        monthly_groups = filtered_df_total.groupby(pd.Grouper(key='COMPETEN', freq='ME')) # ME = Month End
-
-        # Média simples mensal
-        monthly_simple_means = monthly_groups['Eficiência'].mean().reset_index()
-        monthly_simple_means.rename(columns={'Eficiência': 'media_simples'}, inplace=True)
-        # Ajustar a data para o início do mês para consistência de plotagem
-        monthly_simple_means['COMPETEN'] = monthly_simple_means['COMPETEN'].dt.to_period('M').dt.start_time
-
-        # Média ponderada mensal
-        monthly_weighted_means = monthly_groups.apply(
-            lambda g: weighted_average(g, 'Eficiência', 'SIA_SIH_VALOR')
-        ).reset_index()
-        monthly_weighted_means.rename(columns={0: 'media_ponderada'}, inplace=True)
-        # Ajustar a data para o início do mês
-        monthly_weighted_means['COMPETEN'] = monthly_weighted_means['COMPETEN'].dt.to_period('M').dt.start_time
-
-        # Juntar as médias mensais em um único DataFrame
-        monthly_aggregates = pd.merge(monthly_simple_means, monthly_weighted_means, on='COMPETEN', how='outer')
-
         # --- Plotar Médias Mensais ---
         st.markdown("### Tendências Médias Mensais")
         col1_trend, col2_trend = st.columns(2)
@@ -126,7 +84,7 @@ if df_total is not None and not df_total.empty:
                 markers=True,
                 labels={'COMPETEN': 'Competência', 'media_simples': 'Média Simples'}
             )
-            fig_mean_simple.update_traces(hovertemplate=hover_simple)
+            fig_mean_simple.update_traces(hovertemplate=hover_simple, name='Eficiência', showlegend=True)
             fig_mean_simple.update_layout(yaxis_title="Média Simples Eficiência", hovermode='x unified')
             st.plotly_chart(fig_mean_simple, use_container_width=True)
 
@@ -140,48 +98,87 @@ if df_total is not None and not df_total.empty:
                 markers=True,
                 labels={'COMPETEN': 'Competência', 'media_ponderada': 'Média Ponderada (Produção)'}
             )
-            fig_mean_weighted.update_traces(hovertemplate=hover_weighted)
+            fig_mean_weighted.update_traces(hovertemplate=hover_weighted, name='Eficiência', showlegend=True)
             fig_mean_weighted.update_layout(yaxis_title="Média Pond. Eficiência", hovermode='x unified')
             st.plotly_chart(fig_mean_weighted, use_container_width=True)
 
+        # --- Médias da análise de janela DEA, em gráfico próprio ---
+        # São scores de um DEA recalculado, em outra escala que a Eficiência acima
+        if window_aggregates is not None and not window_aggregates.empty:
+            st.subheader("Médias Mensais da Análise de Janela DEA (`dea_janela.py`)")
+            hover_janela = "<b>Competência:</b> %{x|%m/%Y}<br><b>NOME:</b> %{y:,.4f}<extra></extra>".replace('.', ',')
+            fig_janela = go.Figure()
+            fig_janela.add_trace(go.Scatter(
+                x=window_aggregates['COMPETEN'], y=window_aggregates['media_simples_janela'],
+                mode='lines+markers', name='Média simples (janela)',
+                hovertemplate=hover_janela.replace('NOME', 'Média Simples (janela)'),
+            ))
+            fig_janela.add_trace(go.Scatter(
+                x=window_aggregates['COMPETEN'], y=window_aggregates['media_ponderada_janela'],
+                mode='lines+markers', name='Média ponderada (janela)',
+                hovertemplate=hover_janela.replace('NOME', 'Média Ponderada (janela)'),
+            ))
+            fig_janela.update_layout(xaxis_title="Competência", yaxis_title="Score DEA de janela", hovermode='x unified')
+            st.plotly_chart(fig_janela, use_container_width=True)
+            st.caption(
+                "Médias da análise de janela DEA: cada mês é avaliado contra os hospitais dos últimos meses juntos, "
+                "o que suaviza oscilações de um único mês. É um DEA recalculado, em outra escala: não reproduz a "
+                "Eficiência dos dados de origem e não deve ser comparado às médias acima."
+            )
+
         st.divider()
 
         # --- Exibir Box Plot Mensal ---
         st.subheader("Distribuição Mensal da Eficiência entre CNES")
-        # Formatar hover do boxplot
-        hover_boxplot = (
-            "<b>%{yaxis.title.text}:</b> %{y:,.4f}<br>" +
+        # Formatar hover dos outliers
+        hover_outliers = (
+            "<b>Competência:</b> %{x|%m/%Y}<br>" +
+            "<b>CNES:</b> %{customdata[0]}<br>" +
+            "<b>Eficiência:</b> %{y:,.4f}<br>" +
             "<extra></extra>"
-        ).replace('.', ',')
-
-        # Criar uma cópia para não alterar o df original filtrado
-        df_boxplot = filtered_df_total.copy()
-        # Garantir que a coluna COMPETEN é datetime64[ns] se não for já
-        df_boxplot['COMPETEN'] = pd.to_datetime(df_boxplot['COMPETEN'])
-        # Formatar a coluna de competência para o eixo X (MM/YYYY)
-        # Plotly pode lidar com datetime diretamente, mas formatar pode ser mais explícito
-        # df_boxplot['Competencia_Str'] = df_boxplot['COMPETEN'].dt.strftime('%m/%Y')
-        # Ordenar pelos meses para o gráfico fazer sentido
-        df_boxplot = df_boxplot.sort_values('COMPETEN')
-
-        fig_box = px.box(
-            df_boxplot,
-            x='COMPETEN', # Usar a coluna datetime
-            y='Eficiência',
+        ).replace(',', '#').replace('.', ',').replace('#', '.')
+
+        # Estatísticas do box plot pré-calculadas na ingestão (sem enviar todas as linhas ao navegador)
+        box_stats = monthly_aggregates.dropna(subset=['eficiencia_mediana'])
+        outliers_periodo = monthly_outliers[
+            (monthly_outliers['COMPETEN'] >= selected_competencia_range_total[0]) &
+            (monthly_outliers['COMPETEN'] <= selected_competencia_range_total[1])
+        ]
+
+        fig_box = go.Figure()
+        fig_box.add_trace(go.Box(
+            x=box_stats['COMPETEN'],
+            q1=box_stats['eficiencia_q1'],
+            median=box_stats['eficiencia_mediana'],
+            q3=box_stats['eficiencia_q3'],
+            lowerfence=box_stats['bigode_inferior'],
+            upperfence=box_stats['bigode_superior'],
+            name='Eficiência',
+            boxpoints=False,
+            marker_color='#636efa'
+        ))
+        fig_box.add_trace(go.Scatter(
+            x=outliers_periodo['COMPETEN'],
+            y=outliers_periodo['Eficiência'],
+            customdata=outliers_periodo[['CNES']],
+            mode='markers',
+            name='Outliers',
+            marker=dict(color='#636efa', size=4, symbol='circle-open'),
+            hovertemplate=hover_outliers
+        ))
+        fig_box.update_layout(
             title="Box Plot Mensal da Eficiência (Todos os CNES)",
-            points='outliers',
-            labels={'COMPETEN': 'Competência'}
+            yaxis_title="Eficiência", xaxis_title="Competência", showlegend=False
         )
-        fig_box.update_traces(hovertemplate=hover_boxplot)
-        fig_box.update_layout(yaxis_title="Eficiência", xaxis_title="Competência")
         # Formatar eixo X para mostrar MM/YYYY e ticks mensais
         fig_box.update_xaxes(dtick="M1", tickformat="%m/%Y", tickangle=45)
         st.plotly_chart(fig_box, use_container_width=True)
+        st.caption("Outliers: amostra dos pontos mais extremos de cada competência (limitada na ingestão).")
 
     else:
         st.warning("Não há dados para o período selecionado.")
 
-elif df_total is None:
+elif monthly_table is None or monthly_outliers is None:
     pass
 else:
-    st.warning("O arquivo Excel de origem está vazio ou não pôde ser lido corretamente.") 
\ No newline at end of file
+    st.warning("Os dados de origem estão vazios ou não puderam ser lidos corretamente.") 
\ No newline at end of file
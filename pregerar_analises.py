@@ -0,0 +1,273 @@
+"""Pré-gera em lote as análises automáticas (Gemini) de todos os CNES.
+
+A primeira visita a um hospital na página de análise individual espera a
+resposta do modelo. Este script percorre todos os CNES no período completo (o
+período padrão da página), monta os mesmos dados (a tabela mensal, ou o resumo
+quando ela não cabe no orçamento de tokens) e o mesmo prompt (analise_ia.py) e
+grava cada resposta no cache persistente (cache_analises.py), onde a página a
+encontra pela mesma chave e a exibe na hora.
+
+As chamadas são concorrentes (asyncio, com limite de requisições simultâneas),
+passam por um balde de fichas que respeita a cota de requisições por minuto e
+são repetidas com espera exponencial nos erros transitórios da API (429/5xx).
+Cada análise vai para o cache assim que chega, então uma execução interrompida
+retoma de onde parou; o arquivo de checkpoint guarda o progresso e as falhas
+definitivas (que não são repetidas, salvo com --repetir-falhas).
+
+A chave da API vem da variável de ambiente GEMINI_API_KEY ou de
+.streamlit/secrets.toml, como na página.
+
+Uso (na raiz do projeto, após gerar o armazenamento com concat_csv_to_xlsx.py):
+
+    python pregerar_analises.py                       # todos os CNES pendentes
+    python pregerar_analises.py --concorrencia 8 --rpm 60
+    python pregerar_analises.py --listar              # só conta os pendentes, sem chamar a API
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11: mesmo leitor, no pacote tomli
+    import tomli as tomllib
+
+import google.generativeai as genai
+from google.api_core.exceptions import (
+    TooManyRequests,
+    ResourceExhausted,
+    Aborted,
+    DeadlineExceeded,
+    ServiceUnavailable,
+    InternalServerError
+)
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+
+from analise_ia import (
+    MODELO_GEMINI, ORCAMENTO_TOKENS, VERSAO_PROMPT, chave_analise, compactar_dados, formatar_competencia, montar_prompt,
+    uso_tokens,
+)
+from cache_analises import CACHE_PATH, cache_existing, cache_put, registrar_chamada
+from armazenamento import build_cnes_index, parquet_dir_path, read_compact, select_cnes
+
+# Erros da API que valem nova tentativa: cota/limite de taxa (429) e falhas do servidor (5xx)
+ERROS_TRANSITORIOS = (TooManyRequests, ResourceExhausted, Aborted, DeadlineExceeded, ServiceUnavailable, InternalServerError)
+CHECKPOINT_PATH = os.path.join(os.path.dirname(CACHE_PATH), 'pregeracao_checkpoint.json')
+SECRETS_PATH = os.path.join(os.getcwd(), '.streamlit', 'secrets.toml')
+# Frequência (em análises concluídas) com que o checkpoint é regravado
+CHECKPOINT_EVERY = 20
+
+
+def ler_api_key(secrets_path=SECRETS_PATH):
+    """Chave da API Gemini da variável de ambiente ou do secrets.toml do Streamlit (None se ausente)."""
+    api_key = os.environ.get('GEMINI_API_KEY')
+    if api_key:
+        return api_key
+    try:
+        with open(secrets_path, 'rb') as f:
+            return tomllib.load(f).get('GEMINI_API_KEY')
+    except (FileNotFoundError, tomllib.TOMLDecodeError):
+        return None
+
+
+def ler_checkpoint(path, periodo):
+    """Checkpoint de uma execução anterior com o mesmo modelo, prompt e período (ou um novo, vazio)."""
+    identificacao = {'modelo': MODELO_GEMINI, 'versao_prompt': VERSAO_PROMPT, 'periodo': list(periodo)}
+    try:
+        with open(path, encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        if all(checkpoint.get(k) == v for k, v in identificacao.items()):
+            return checkpoint
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+    return {**identificacao, 'geradas': 0, 'falhas': {}}
+
+
+def gravar_checkpoint(path, checkpoint):
+    """Grava o checkpoint em arquivo temporário e o move para o lugar (nunca fica pela metade)."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    checkpoint['atualizado'] = time.strftime('%Y-%m-%d %H:%M:%S')
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def montar_tarefas(df, cnes_index):
+    """(período, tarefas) com uma tarefa (cnes, chave, prompt, nível, tokens estimados) por CNES no período completo."""
+    inicio, fim = df['COMPETEN'].min(), df['COMPETEN'].max()
+    periodo = (formatar_competencia(inicio), formatar_competencia(fim))
+    tarefas = []
+    for cnes in cnes_index[0]:
+        linhas = select_cnes(df, cnes_index, cnes, inicio, fim)
+        if linhas.empty:
+            continue
+        dados_mensais_md, nivel, tokens = compactar_dados(linhas, cnes, *periodo)
+        tarefas.append((
+            cnes,
+            chave_analise(cnes, *periodo, dados_mensais_md),
+            montar_prompt(cnes, *periodo, dados_mensais_md, nivel),
+            nivel,
+            tokens,
+        ))
+    return periodo, tarefas
+
+
+def token_bucket(por_minuto, capacidade=1):
+    """Limitador de taxa: a função devolvida espera até haver uma ficha e a consome.
+
+    As fichas são repostas continuamente a por_minuto / 60 por segundo, até
+    capacidade (o tamanho máximo de uma rajada).
+    """
+    taxa = por_minuto / 60
+    estado = {'fichas': float(capacidade), 'ultimo': time.monotonic()}
+    trava = asyncio.Lock()
+
+    async def adquirir():
+        async with trava:
+            while True:
+                agora = time.monotonic()
+                estado['fichas'] = min(capacidade, estado['fichas'] + (agora - estado['ultimo']) * taxa)
+                estado['ultimo'] = agora
+                if estado['fichas'] >= 1:
+                    estado['fichas'] -= 1
+                    return
+                await asyncio.sleep((1 - estado['fichas']) / taxa)
+
+    return adquirir
+
+
+async def gerar_resposta(model, prompt, adquirir, tentativas):
+    """Resposta do modelo ao prompt, com nova tentativa (espera exponencial) nos erros transitórios."""
+    async for tentativa in AsyncRetrying(
+        retry=retry_if_exception_type(ERROS_TRANSITORIOS),
+        wait=wait_random_exponential(multiplier=2, max=120),
+        stop=stop_after_attempt(tentativas),
+        reraise=True,
+    ):
+        with tentativa:
+            await adquirir()  # cada tentativa consome uma ficha da cota
+            return await model.generate_content_async(prompt)
+
+
+async def pregerar(tarefas, gerar, concorrencia, checkpoint, checkpoint_path, cache_path=CACHE_PATH):
+    """Executa as tarefas com `concorrencia` trabalhadores e grava cada análise no cache ao chegar.
+
+    gerar(prompt) é a corrotina que devolve a resposta do modelo; os tokens de
+    cada chamada vão para o registro do cache. As gravações no SQLite rodam em
+    threads (asyncio.to_thread), para que uma escrita travada não pare o laço
+    de eventos, os demais trabalhadores e o balde de fichas. Falhas ficam em
+    checkpoint['falhas'] (CNES -> mensagem); o checkpoint é regravado a cada
+    CHECKPOINT_EVERY análises e ao final, mesmo se a execução for interrompida.
+    """
+    fila = asyncio.Queue()
+    for tarefa in tarefas:
+        fila.put_nowait(tarefa)
+    start = time.perf_counter()
+    total = len(tarefas)
+    feitas = 0
+
+    async def trabalhador():
+        nonlocal feitas
+        while True:
+            try:
+                cnes, chave, prompt, nivel, tokens = fila.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                inicio = time.perf_counter()
+                response = await gerar(prompt)
+                texto = response.text
+                # SQLite síncrono (até 10 s de espera por trava): em uma thread, sem parar os outros trabalhadores
+                await asyncio.to_thread(cache_put, chave, texto, MODELO_GEMINI, path=cache_path)
+                await asyncio.to_thread(
+                    registrar_chamada, chave, MODELO_GEMINI, nivel, tokens, *uso_tokens(response),
+                    time.perf_counter() - inicio, path=cache_path,
+                )
+                checkpoint['falhas'].pop(cnes, None)
+                checkpoint['geradas'] += 1
+            except Exception as e:
+                checkpoint['falhas'][cnes] = f"{type(e).__name__}: {e}"
+            feitas += 1
+            if feitas % CHECKPOINT_EVERY == 0 or feitas == total:
+                gravar_checkpoint(checkpoint_path, checkpoint)
+                elapsed = time.perf_counter() - start
+                print(f"- {feitas:,}/{total:,} CNES ({len(checkpoint['falhas']):,} falhas) em {elapsed:.0f}s")
+
+    try:
+        await asyncio.gather(*(trabalhador() for _ in range(max(1, concorrencia))))
+    finally:
+        gravar_checkpoint(checkpoint_path, checkpoint)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concorrencia', type=int, default=4, help="Máximo de requisições simultâneas (padrão: 4).")
+    parser.add_argument('--rpm', type=float, default=10, help="Requisições por minuto permitidas pela cota da API (padrão: 10).")
+    parser.add_argument('--tentativas', type=int, default=6, help="Tentativas por CNES nos erros 429/5xx (padrão: 6).")
+    parser.add_argument('--limite', type=int, help="Gera no máximo este número de análises nesta execução.")
+    parser.add_argument('--checkpoint', default=CHECKPOINT_PATH, help=f"Arquivo de checkpoint (padrão: {os.path.relpath(CHECKPOINT_PATH)}).")
+    parser.add_argument('--repetir-falhas', action='store_true', help="Tenta de novo os CNES que falharam em execuções anteriores.")
+    parser.add_argument('--listar', action='store_true', help="Só conta as análises pendentes, sem chamar a API.")
+    args = parser.parse_args()
+    if args.concorrencia < 1 or args.rpm <= 0 or args.tentativas < 1:
+        parser.error("--concorrencia, --rpm e --tentativas devem ser positivos.")
+
+    try:
+        df = read_compact(parquet_dir_path)
+    except FileNotFoundError:
+        print(f"Armazenamento {os.path.basename(parquet_dir_path)}/ não encontrado. Execute o script `concat_csv_to_xlsx.py` primeiro.")
+        return
+    start = time.perf_counter()
+    periodo, tarefas = montar_tarefas(df, build_cnes_index(df))
+    geradas = cache_existing(tarefa[1] for tarefa in tarefas)
+    checkpoint = ler_checkpoint(args.checkpoint, periodo)
+    pendentes = [t for t in tarefas if t[1] not in geradas]
+    if not args.repetir_falhas:
+        pendentes = [t for t in pendentes if t[0] not in checkpoint['falhas']]
+    print(
+        f"{len(tarefas):,} CNES de {periodo[0]} a {periodo[1]}: {len(geradas):,} já no cache, "
+        f"{len(checkpoint['falhas']):,} com falha anterior, {len(pendentes):,} pendentes "
+        f"(tabelas montadas em {time.perf_counter() - start:.2f}s)."
+    )
+    niveis = {}
+    for tarefa in pendentes:
+        niveis[tarefa[3]] = niveis.get(tarefa[3], 0) + 1
+    if pendentes:
+        print(
+            f"Orçamento de {ORCAMENTO_TOKENS:,} tokens por prompt: "
+            + ", ".join(f"{n:,} {nivel}" for nivel, n in niveis.items())
+            + f"; ~{sum(tarefa[4] for tarefa in pendentes):,} tokens estimados a enviar."
+        )
+    if args.limite is not None:
+        pendentes = pendentes[:args.limite]
+    if args.listar or not pendentes:
+        return
+
+    api_key = ler_api_key()
+    if not api_key:
+        print("Chave da API Gemini não encontrada: defina GEMINI_API_KEY ou configure .streamlit/secrets.toml.")
+        return
+    genai.configure(api_key=api_key)
+    model = genai.GenerativeModel(MODELO_GEMINI)
+    adquirir = token_bucket(args.rpm)
+
+    async def gerar(prompt):
+        return await gerar_resposta(model, prompt, adquirir, args.tentativas)
+
+    start = time.perf_counter()
+    try:
+        asyncio.run(pregerar(pendentes, gerar, args.concorrencia, checkpoint, args.checkpoint))
+    except KeyboardInterrupt:
+        print("\nInterrompido: o progresso está no cache; execute de novo para continuar.")
+        return
+    print(
+        f"\n{checkpoint['geradas']:,} análises geradas no total, {len(checkpoint['falhas']):,} falhas "
+        f"({time.perf_counter() - start:.0f}s nesta execução). Checkpoint em {args.checkpoint}."
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Testes automáticos (pytest) dos módulos da raiz do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Scripts de consulta manual à API Gemini, executados com `streamlit run`, não pelo pytest
+collect_ignore = ['test_gemini_api.py', 'teste_grounding.py']
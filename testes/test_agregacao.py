@@ -0,0 +1,88 @@
+"""Testes de agregacao.grouped_weighted_stats contra a média ponderada por grupo da versão anterior."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from agregacao import grouped_weighted_mean, grouped_weighted_stats
+
+
+# Implementação anterior da página de resultados consolidados (groupby.apply), como referência
+def weighted_average(group, data_col, weight_col):
+    d = group[data_col]
+    w = group[weight_col]
+    valid_indices = d.notna() & w.notna() & (w > 0)
+    d = d[valid_indices]
+    w = w[valid_indices]
+    if w.sum() == 0:
+        return np.nan
+    return np.average(d, weights=w)
+
+
+def legado(df, by):
+    return df.groupby(by, observed=True).apply(
+        lambda g: weighted_average(g, 'Eficiência', 'SIA_SIH_VALOR'), include_groups=False
+    )
+
+
+def dados_sinteticos(n=2000, seed=4):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'CNES': pd.Categorical(rng.choice([f'{i:07d}' for i in range(40)], size=n)),
+        'COMPETEN': pd.to_datetime(rng.choice(pd.date_range('2023-01-01', periods=18, freq='MS'), size=n)),
+        'Eficiência': rng.uniform(0, 1, size=n).astype('float32'),
+        'SIA_SIH_VALOR': rng.lognormal(10, 2, size=n),
+    })
+    df.loc[rng.random(n) < 0.05, 'Eficiência'] = np.nan
+    df.loc[rng.random(n) < 0.05, 'SIA_SIH_VALOR'] = np.nan
+    df.loc[rng.random(n) < 0.05, 'SIA_SIH_VALOR'] = 0
+    df.loc[rng.random(n) < 0.02, 'SIA_SIH_VALOR'] = -5.0
+    # Grupos sem nenhuma linha válida: só peso zero, só valor ausente, só peso negativo
+    df.loc[df['CNES'] == '0000001', 'SIA_SIH_VALOR'] = 0
+    df.loc[df['CNES'] == '0000002', 'Eficiência'] = np.nan
+    df.loc[df['CNES'] == '0000003', 'SIA_SIH_VALOR'] = -1.0
+    return df
+
+
+@pytest.mark.parametrize('by', ['CNES', ['CNES', 'COMPETEN'], pd.Grouper(key='COMPETEN', freq='QE')])
+def test_igual_a_media_ponderada_por_grupo(by):
+    df = dados_sinteticos()
+    esperado = legado(df, by)
+    obtido = grouped_weighted_mean(df, by, 'Eficiência', 'SIA_SIH_VALOR')
+    pd.testing.assert_index_equal(obtido.index, esperado.index)
+    np.testing.assert_allclose(obtido.to_numpy(), esperado.to_numpy(dtype='float64'), rtol=1e-12)
+    if by == 'CNES':
+        assert obtido[['0000001', '0000002', '0000003']].isna().all()
+
+
+def test_linhas_sem_chave_ficam_de_fora():
+    df = dados_sinteticos()
+    df['CNES'] = df['CNES'].astype(object)
+    df.loc[df.index[:50], 'CNES'] = None
+    stats = grouped_weighted_stats(df, 'CNES', 'Eficiência', 'SIA_SIH_VALOR')
+    esperado = legado(df.dropna(subset=['CNES']), 'CNES')
+    np.testing.assert_allclose(stats['media_ponderada'].to_numpy(), esperado.to_numpy(dtype='float64'), rtol=1e-12)
+
+
+def test_somas_reproduzem_a_media_de_varios_grupos():
+    # Como nos agregados mensais: somar soma_ponderada e soma_pesos de alguns
+    # grupos e dividir dá a média ponderada das linhas desses grupos juntas
+    df = dados_sinteticos()
+    stats = grouped_weighted_stats(df, 'COMPETEN', 'Eficiência', 'SIA_SIH_VALOR')
+    meses = stats.index[3:9]
+    media = stats.loc[meses, 'soma_ponderada'].sum() / stats.loc[meses, 'soma_pesos'].sum()
+    assert media == pytest.approx(weighted_average(df[df['COMPETEN'].isin(meses)], 'Eficiência', 'SIA_SIH_VALOR'), rel=1e-12)
+    # Grupos sem linha válida somam zero e não alteram a média
+    vazio = grouped_weighted_stats(df[df['CNES'].isin(['0000001', '0000002', '0000003'])], 'CNES', 'Eficiência', 'SIA_SIH_VALOR')
+    assert (vazio[['soma_ponderada', 'soma_pesos']] == 0).all().all()
+    assert vazio['media_ponderada'].isna().all()
+
+
+def test_pesos_de_magnitudes_muito_diferentes():
+    df = pd.DataFrame({
+        'g': ['a', 'a', 'a', 'b', 'b'],
+        'Eficiência': [0.2, 0.9, 0.5, 1.0, 0.1],
+        'SIA_SIH_VALOR': [1e12, 1e-6, 3.0, 1e-300, 1e-300],
+    })
+    stats = grouped_weighted_stats(df, 'g', 'Eficiência', 'SIA_SIH_VALOR')
+    np.testing.assert_allclose(stats['media_ponderada'], legado(df, 'g'), rtol=1e-12)
+    assert stats.loc['b', 'media_ponderada'] == pytest.approx(0.55)
@@ -0,0 +1,60 @@
+"""Testes da compactação dos dados do prompt (analise_ia.py): mudanças de nível e orçamento de tokens."""
+import numpy as np
+import pandas as pd
+
+from analise_ia import compactar_dados, dados_compactos_md, estimar_tokens, montar_prompt, mudancas_md, pontos_de_mudanca
+
+
+def serie_cnes(meses=48, seed=2):
+    """Linhas mensais de um CNES (como select_cnes), com a produção subindo de nível em 07/2022."""
+    rng = np.random.default_rng(seed)
+    competen = pd.date_range('2021-01-01', periods=meses, freq='MS')
+    producao = np.where(competen >= '2022-07-01', 180_000.0, 120_000.0) + rng.normal(0, 4_000, meses)
+    return pd.DataFrame({
+        'COMPETEN': competen,
+        'Eficiência': rng.uniform(0.6, 0.62, meses),
+        'CNES_LEITOS_SUS': np.full(meses, 40.0),
+        'SIA_SIH_VALOR': producao,
+        'HORAS_MEDICOS': 1500 + rng.normal(0, 30, meses),
+        'HORAS_ENFERMAGEM': 3000 + rng.normal(0, 50, meses),
+    })
+
+
+def test_um_ponto_de_mudanca_no_mes_certo():
+    # Oscilação de ±0,5 entre meses, com o nível passando de 10 para 14 no índice 20
+    oscilacao = 0.5 * (-1.0) ** np.arange(36)
+    assert pontos_de_mudanca(np.r_[np.full(20, 10.0), np.full(16, 14.0)] + oscilacao) == [20]
+    assert pontos_de_mudanca(np.r_[np.full(20, 10.0), np.full(16, 10.2)] + oscilacao) == []  # abaixo do ruído
+    # Na série do CNES, o índice vira o mês da mudança
+    df = serie_cnes()
+    assert pontos_de_mudanca(df['SIA_SIH_VALOR']) == [18]
+    assert "Produção Total: mudança de nível em 07/2022" in mudancas_md(df)
+
+
+def test_serie_sem_mudanca():
+    assert pontos_de_mudanca(np.full(30, 5.0)) == []
+    assert pontos_de_mudanca(50 + 2.0 * (-1.0) ** np.arange(60)) == []
+    assert pontos_de_mudanca([1.0, 9.0, 1.0]) == []  # curta demais
+    df = serie_cnes()
+    assert pontos_de_mudanca(df['CNES_LEITOS_SUS']) == []
+    assert "Leitos SUS" not in mudancas_md(df)
+
+
+def test_orcamento_forca_o_nivel_trimestral():
+    df = serie_cnes()
+    args = ('0000001', '01/2021', '12/2024')
+    tokens = {
+        nivel: estimar_tokens(montar_prompt(*args, dados_compactos_md(df, nivel), nivel))
+        for nivel in ('mensal', 'trimestral', 'anual', 'resumo')
+    }
+    assert tokens['mensal'] > tokens['trimestral'] > tokens['anual']
+
+    dados, nivel, usados = compactar_dados(df, *args, orcamento=tokens['mensal'] - 1)
+    assert nivel == 'trimestral' and usados == tokens['trimestral'] and usados < tokens['mensal']
+    assert dados.startswith("Médias mensais por trimestre:") and 'T3/2022' in dados
+    assert compactar_dados(df, *args, orcamento=tokens['mensal'])[1] == 'mensal'
+    assert compactar_dados(df, *args, orcamento=None)[1] == 'mensal'
+    # Nem o resumo cabe: usado assim mesmo
+    assert compactar_dados(df, *args, orcamento=1)[1] == 'resumo'
+    # Contagem de tokens externa (ex.: model.count_tokens)
+    assert compactar_dados(df, *args, orcamento=10, contar_tokens=lambda prompt: 0 if 'Resumo' in prompt else 99)[1] == 'trimestral'
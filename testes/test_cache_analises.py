@@ -0,0 +1,99 @@
+"""Testes do cache SQLite das análises (cache_analises.py): validade, remoção LRU e contadores."""
+import pytest
+
+import cache_analises
+from cache_analises import cache_existing, cache_get, cache_put, cache_stats, chamadas_stats, registrar_chamada
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    """Relógio controlado pelo teste (segundos), usado por cache_analises no lugar de time.time."""
+    agora = [1_000_000.0]
+    monkeypatch.setattr(cache_analises.time, 'time', lambda: agora[0])
+    return agora
+
+
+@pytest.fixture
+def caminho(tmp_path):
+    return str(tmp_path / 'cache' / 'analises.sqlite')
+
+
+def test_acertos_falhas_e_consulta_sem_contar(caminho, relogio):
+    assert cache_get('a', path=caminho) is None
+    cache_put('a', 'análise A', 'modelo', path=caminho)
+    assert cache_get('a', path=caminho) == 'análise A'
+    assert cache_get('a', path=caminho, contar=False) == 'análise A'
+    assert cache_get('b', path=caminho, contar=False) is None
+    stats = cache_stats(caminho)
+    assert (stats['acertos'], stats['falhas'], stats['gravadas']) == (1, 1, 1)
+    assert (stats['entradas'], stats['bytes']) == (1, len('análise A'.encode('utf-8')))
+
+
+def test_validade(caminho, relogio):
+    cache_put('velha', 'x', path=caminho, ttl=100)
+    relogio[0] += 60
+    cache_put('nova', 'y', path=caminho, ttl=100)
+    relogio[0] += 50  # 'velha' com 110 s, 'nova' com 50 s
+    assert cache_existing(['velha', 'nova', 'outra'], path=caminho, ttl=100) == {'nova'}
+    assert cache_get('velha', path=caminho, ttl=100) is None
+    assert cache_get('nova', path=caminho, ttl=100) == 'y'
+    stats = cache_stats(caminho)
+    assert (stats['expiradas'], stats['falhas'], stats['acertos'], stats['entradas']) == (1, 1, 1, 1)
+    # cache_put também descarta as vencidas
+    relogio[0] += 100
+    cache_put('outra', 'z', path=caminho, ttl=100)
+    assert cache_stats(caminho)['entradas'] == 1
+    assert cache_stats(caminho)['expiradas'] == 2
+
+
+def test_remocao_lru_por_entradas(caminho, relogio):
+    for chave in 'abc':
+        cache_put(chave, chave * 10, path=caminho, max_entries=3)
+        relogio[0] += 1
+    cache_get('a', path=caminho)  # 'a' passa a ser a mais recente
+    relogio[0] += 1
+    cache_put('d', 'd' * 10, path=caminho, max_entries=3)
+    assert cache_existing('abcd', path=caminho) == {'a', 'c', 'd'}
+    relogio[0] += 1
+    cache_put('e', 'e' * 10, path=caminho, max_entries=2)
+    assert cache_existing('abcde', path=caminho) == {'d', 'e'}
+    assert cache_stats(caminho)['removidas'] == 3
+
+
+def test_remocao_lru_por_bytes(caminho, relogio):
+    for chave in 'abc':
+        cache_put(chave, chave * 40, path=caminho, max_bytes=100)
+        relogio[0] += 1
+    # 120 bytes > 100: sai só a menos acessada
+    assert cache_existing('abc', path=caminho) == {'b', 'c'}
+    relogio[0] += 1
+    cache_put('d', 'd' * 70, path=caminho, max_bytes=100)
+    assert cache_existing('abcd', path=caminho) == {'d'}
+    assert cache_stats(caminho)['bytes'] == 70
+
+
+def test_chave_recem_gravada_nunca_sai(caminho, relogio):
+    cache_put('a', 'a' * 10, path=caminho, max_entries=1, max_bytes=50)
+    relogio[0] += 1
+    # Maior que o limite de bytes sozinha: todas as outras saem, ela fica
+    cache_put('grande', 'g' * 500, path=caminho, max_entries=1, max_bytes=50)
+    assert cache_get('grande', path=caminho) == 'g' * 500
+    assert cache_stats(caminho)['entradas'] == 1
+    # Regravar a mesma chave com acesso mais antigo que as demais também não a remove
+    cache_put('b', 'b', path=caminho, max_entries=2)
+    relogio[0] += 1
+    cache_put('grande', 'G', path=caminho, max_entries=1)
+    assert cache_existing(['grande', 'b'], path=caminho) == {'grande'}
+
+
+def test_registro_de_chamadas(caminho, relogio):
+    registrar_chamada('a', 'modelo', 'mensal', 1000, 900, 300, 2.0, path=caminho, ttl=100)
+    registrar_chamada('b', 'modelo', 'mensal', 1000, None, 100, 4.0, path=caminho, ttl=100)
+    registrar_chamada('c', 'modelo', 'trimestral', 400, 350, 200, 1.0, path=caminho, ttl=100)
+    stats = chamadas_stats(caminho)
+    # Sem tokens informados pela API, vale a estimativa
+    assert stats['mensal'] == {'chamadas': 2, 'tokens_prompt': 950, 'tokens_resposta': 200, 'segundos': 3.0}
+    assert stats['trimestral']['chamadas'] == 1
+    relogio[0] += 101
+    registrar_chamada('d', 'modelo', 'anual', 100, 90, 50, 0.5, path=caminho, ttl=100)
+    assert set(chamadas_stats(caminho)) == {'anual'}
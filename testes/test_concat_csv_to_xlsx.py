@@ -0,0 +1,101 @@
+"""Testes da ingestão incremental (concat_csv_to_xlsx.py): plano de mudanças e manifesto."""
+import json
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+import concat_csv_to_xlsx as ingestao
+
+CABECALHO = 'CNES,CNES_SALAS,CNES_LEITOS_SUS,HORAS_MEDICOS,HORAS_ENFERMAGEM,SIA_SIH_VALOR,Eficiência,COMPETEN,Erro\n'
+
+
+def gravar_csv(path, competen, linhas=2, valor=1000.5):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(CABECALHO)
+        for i in range(linhas):
+            f.write(f'{i + 1},1.0,2.0,3.0,4.0,{valor + i},0.5,{competen},\n')
+
+
+def manifesto_de(csv_files):
+    return {'version': ingestao.MANIFEST_VERSION, 'files': {os.path.basename(f): ingestao.file_signature(f) for f in csv_files}}
+
+
+def test_plano_novos_alterados_removidos_e_iguais(tmp_path):
+    iguais = tmp_path / 'eficiencia_resultados_2019.csv'
+    alterado = tmp_path / 'eficiencia_resultados_2020.csv'
+    tocado = tmp_path / 'eficiencia_resultados_2021.csv'
+    for path, ano in [(iguais, 2019), (alterado, 2020), (tocado, 2021)]:
+        gravar_csv(path, ano * 100 + 1)
+    manifest = manifesto_de([iguais, alterado, tocado])
+    manifest['files']['eficiencia_resultados_2018.csv'] = {'size': 1, 'mtime': 0, 'sha256': 'x'}
+
+    gravar_csv(alterado, 202001, valor=2000.5)
+    os.utime(tocado, (1, 1))  # só o mtime muda: conteúdo idêntico
+    novo = tmp_path / 'eficiencia_resultados_2022.csv'
+    gravar_csv(novo, 202201)
+
+    changed, unchanged, removed = ingestao.plan_changes([str(p) for p in (iguais, alterado, tocado, novo)], manifest)
+    assert sorted(changed) == ['eficiencia_resultados_2020.csv', 'eficiencia_resultados_2022.csv']
+    assert changed['eficiencia_resultados_2020.csv'] == ingestao.file_signature(alterado)
+    assert sorted(unchanged) == ['eficiencia_resultados_2019.csv', 'eficiencia_resultados_2021.csv']
+    assert unchanged['eficiencia_resultados_2021.csv']['mtime'] == 1
+    assert removed == ['eficiencia_resultados_2018.csv']
+
+
+def test_assinatura_muda_com_o_conteudo(tmp_path):
+    path = tmp_path / 'eficiencia_resultados_2024.csv'
+    gravar_csv(path, 202401)
+    antes = ingestao.file_signature(path)
+    gravar_csv(path, 202401, valor=1000.6)  # mesmo tamanho, outro conteúdo
+    depois = ingestao.file_signature(path)
+    assert antes['size'] == depois['size'] and antes['sha256'] != depois['sha256']
+
+
+@pytest.mark.parametrize('manifesto', [None, '{"version": 3, "fil', json.dumps({'version': -1, 'files': {}})])
+def test_manifesto_invalido_carrega_vazio(tmp_path, manifesto):
+    if manifesto is not None:
+        (tmp_path / ingestao.MANIFEST_FILENAME).write_text(manifesto, encoding='utf-8')
+    assert ingestao.load_manifest(str(tmp_path)) == {'version': ingestao.MANIFEST_VERSION, 'files': {}}
+
+
+def executar(tmp_path, monkeypatch, *args):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, 'argv', ['concat_csv_to_xlsx.py', '--jobs', '1', *args])
+    ingestao.main()
+    return tmp_path / ingestao.PARQUET_DIRNAME
+
+
+@pytest.mark.parametrize('manifesto', [None, 'corrompido'])
+def test_manifesto_invalido_reconstroi_o_armazenamento(tmp_path, monkeypatch, manifesto):
+    gravar_csv(tmp_path / 'eficiencia_resultados_2023.csv', 202301)
+    gravar_csv(tmp_path / 'eficiencia_resultados_2024.csv', 202401)
+    store = executar(tmp_path, monkeypatch)
+    # Partição órfã (não rastreada pelo manifesto) e tabela de um script DEA
+    orfa = store / 'ANO=2019' / 'antigo.parquet'
+    orfa.parent.mkdir()
+    pd.DataFrame({'x': [1]}).to_parquet(orfa)
+    lateral = store / '_eficiencia_dea' / 'ANO=2024' / 'eficiencia_dea.parquet'
+    lateral.parent.mkdir(parents=True)
+    lateral.write_bytes(b'dados')
+    manifest_path = store / ingestao.MANIFEST_FILENAME
+    if manifesto is None:
+        manifest_path.unlink()
+    else:
+        manifest_path.write_text(manifesto, encoding='utf-8')
+
+    executar(tmp_path, monkeypatch)
+    assert sorted(p.name for p in store.glob('ANO=*')) == ['ANO=2023', 'ANO=2024']
+    assert lateral.read_bytes() == b'dados'
+    manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+    assert sorted(manifest['files']) == ['eficiencia_resultados_2023.csv', 'eficiencia_resultados_2024.csv']
+    assert len(pd.read_parquet(store)) == 4
+
+
+def test_segunda_execucao_sem_mudancas(tmp_path, monkeypatch, capsys):
+    gravar_csv(tmp_path / 'eficiencia_resultados_2024.csv', 202401)
+    executar(tmp_path, monkeypatch)
+    capsys.readouterr()
+    executar(tmp_path, monkeypatch)
+    assert '0 new/changed, 1 unchanged, 0 removed' in capsys.readouterr().out
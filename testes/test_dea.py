@@ -0,0 +1,140 @@
+"""Testes do motor DEA (dea.py) em DMUs sintéticas, com scores conhecidos ou calculados de duas formas."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import dea
+
+# Exemplo clássico de lojas com um insumo (funcionários) e um produto (vendas).
+# CCR: score = (y / x) / max(y / x), só B na fronteira. BCC orientado a insumos:
+# a fronteira é a envoltória A-B-E-H, e o score é o menor x da fronteira que
+# produz y dividido pelo x da DMU (ex.: C produz 2, que A-B produzem com x = 2,5).
+LOJAS_X = np.array([[2.0], [3], [3], [4], [5], [5], [6], [8]])
+LOJAS_Y = np.array([[1.0], [3], [2], [3], [4], [2], [3], [5]])
+LOJAS_CCR = np.array([0.5, 1, 2 / 3, 0.75, 0.8, 0.4, 0.5, 0.625])
+LOJAS_BCC = np.array([1, 1, 2.5 / 3, 0.75, 1, 0.5, 0.5, 1])
+
+# Dois insumos e produto unitário: a fronteira CCR é E(2, 4)-D(4, 2)-C(8, 1).
+# A(4, 3) é projetada no segmento D-E (x1 + x2 = 6): 6 / 7; B(7, 3) no segmento
+# D-C (x1 + 4 x2 = 12): 12 / 19; F(10, 1) só tem folga em relação a C: score 1.
+DOIS_INSUMOS_X = np.array([[4.0, 3], [7, 3], [8, 1], [4, 2], [2, 4], [10, 1]])
+DOIS_INSUMOS_Y = np.ones((6, 1))
+DOIS_INSUMOS_CCR = np.array([6 / 7, 12 / 19, 1, 1, 1, 1])
+
+
+def painel_sintetico(n=300, seed=7):
+    """Mês sintético com 4 insumos e 1 produto, como nos dados reais (inclui produto zero)."""
+    rng = np.random.default_rng(seed)
+    X = rng.lognormal(mean=[1, 3, 6, 7], sigma=0.6, size=(n, 4))
+    Y = (X ** [0.2, 0.3, 0.2, 0.3]).prod(axis=1, keepdims=True) * rng.uniform(0.3, 1, size=(n, 1)) * 1e4
+    Y[:3] = 0
+    return X, Y
+
+
+@pytest.mark.parametrize('rts, esperado', [('crs', LOJAS_CCR), ('vrs', LOJAS_BCC)])
+def test_scores_exemplo_lojas(rts, esperado):
+    scores, frontier = dea.score_month(LOJAS_X, LOJAS_Y, rts)
+    np.testing.assert_allclose(scores, esperado, atol=1e-8)
+    np.testing.assert_array_equal(np.sort(frontier), np.flatnonzero(esperado >= 1 - 1e-9))
+
+
+def test_scores_exemplo_dois_insumos_pelo_lp(monkeypatch):
+    # Sem a enumeração de vértices: o score sai do LP envoltório
+    monkeypatch.setattr(dea, 'VERTEX_MAX_SYSTEMS', 0)
+    scores = dea.dea_scores(DOIS_INSUMOS_X, DOIS_INSUMOS_Y, 'crs')
+    np.testing.assert_allclose(scores, DOIS_INSUMOS_CCR, atol=1e-8)
+
+
+def test_scores_nao_dependem_das_unidades():
+    X, Y = painel_sintetico()
+    scores, _ = dea.score_month(X, Y)
+    escalados, _ = dea.score_month(X * [1, 10, 1e-3, 7], Y * 1e3)
+    np.testing.assert_allclose(escalados, scores, atol=1e-9)
+
+
+def test_dominadas_com_score_gravado_1():
+    # Scores corretos não têm nenhuma DMU eficiente dominada
+    assert not dea.dominated_efficient(LOJAS_X, LOJAS_Y, LOJAS_CCR).any()
+    # C(3, 2) gravada como eficiente, mas B(3, 3) não produz mais com os mesmos
+    # insumos (dominância só fraca); F(5, 2) é dominada estritamente por B
+    gravados = LOJAS_CCR.copy()
+    gravados[[2, 5]] = 1
+    np.testing.assert_array_equal(np.flatnonzero(dea.dominated_efficient(LOJAS_X, LOJAS_Y, gravados)), [5])
+
+
+def test_check_reference_por_mes():
+    df = pd.DataFrame({
+        'COMPETEN': [202401] * 8 + [202402] * 8,
+        **{col: np.r_[LOJAS_X[:, 0], LOJAS_X[:, 0]] for col in dea.INPUT_COLS},
+        dea.OUTPUT_COLS[0]: np.r_[LOJAS_Y[:, 0], LOJAS_Y[:, 0]],
+        dea.SCORE_COL: np.r_[LOJAS_CCR, np.ones(8)],
+    })
+    computed = dea.score_frame(df)
+    summary, por_mes = dea.check_reference(df, computed)
+    assert summary['dif_max'] == pytest.approx(0.6)
+    assert por_mes['dif_max'].tolist() == pytest.approx([0, 0.6])
+    # Em 2024-02 todas estão gravadas com 1; F(5, 2) e G(6, 3) usam mais e
+    # produzem menos que D(4, 3) e E(5, 4), respectivamente
+    assert por_mes['eficientes_dominadas'].tolist() == [0, 2]
+
+
+@pytest.mark.parametrize('rts', ['crs', 'vrs'])
+def test_triagem_igual_ao_lp_completo(rts):
+    X, Y = painel_sintetico()
+    X[10] = np.nan  # DMU não avaliável
+    triados, frontier = dea.score_month(X, Y, rts)
+    completos, _ = dea.score_month(X, Y, rts, screen=False)
+    np.testing.assert_allclose(triados, completos, atol=1e-7)
+    assert np.isnan(triados[10])
+    # A fronteira é exatamente o conjunto das DMUs com score 1 no LP completo
+    np.testing.assert_array_equal(np.sort(frontier), np.flatnonzero(completos >= 1 - dea.FRONTIER_TOLERANCE))
+
+
+@pytest.mark.parametrize('rts', ['crs', 'vrs'])
+@pytest.mark.parametrize('fator, fronteira_mudou', [(1.1, False), (0.01, True)])
+def test_atualizacao_incremental_igual_ao_recalculo(rts, fator, fronteira_mudou):
+    X, Y = painel_sintetico()
+    scores, frontier = dea.score_month(X, Y, rts)
+    frontier_mask = np.zeros(len(X), dtype=bool)
+    frontier_mask[frontier] = True
+    # Revisa os insumos de duas DMUs com produção fora da fronteira: com fator
+    # 1.1 continuam dentro dela; com 0.01 passam a defini-la
+    changed = np.zeros(len(X), dtype=bool)
+    changed[np.flatnonzero(~frontier_mask & (scores < 0.9) & (Y[:, 0] > 0))[:2]] = True
+    X_novo = X.copy()
+    X_novo[changed] *= fator
+    novos, nova_fronteira, resolvidas, mudou = dea.update_month(X_novo, Y, changed, scores, frontier_mask, False, rts)
+    esperados, esperada = dea.score_month(X_novo, Y, rts)
+    assert mudou is fronteira_mudou
+    assert resolvidas == (2 if not fronteira_mudou else int(dea.valid_dmus(X_novo, Y).sum()))
+    np.testing.assert_allclose(novos, esperados, atol=1e-7)
+    np.testing.assert_array_equal(np.flatnonzero(nova_fronteira), np.sort(esperada))
+
+
+def test_atualizacao_com_fronteira_removida_recalcula_o_mes():
+    X, Y = painel_sintetico()
+    scores, frontier = dea.score_month(X, Y)
+    frontier_mask = np.zeros(len(X), dtype=bool)
+    frontier_mask[frontier] = True
+    # A primeira DMU da fronteira sai do mês (linha não avaliável)
+    X_novo = X.copy()
+    X_novo[frontier[0]] = np.nan
+    changed = np.zeros(len(X), dtype=bool)
+    changed[frontier[0]] = True
+    novos, _, _, mudou = dea.update_month(X_novo, Y, changed, scores, frontier_mask, True)
+    assert mudou
+    np.testing.assert_allclose(novos, dea.score_month(X_novo, Y)[0], atol=1e-7)
+
+
+def test_enumeracao_de_vertices_igual_ao_lp(monkeypatch):
+    X, Y = painel_sintetico()
+    _, frontier = dea.score_month(X, Y)
+    # Referência pequena (parte da fronteira e algumas DMUs internas), como nas pseudo-fronteiras do bootstrap
+    reference = np.union1d(frontier[:12], np.arange(20, 26))
+    dmus = np.arange(len(X))
+    assert dea.math.comb(len(reference) + X.shape[1], X.shape[1]) <= dea.VERTEX_MAX_SYSTEMS
+    vertices = dea.dea_scores(X, Y, 'crs', dmus=dmus, reference=reference)
+    monkeypatch.setattr(dea, 'VERTEX_MAX_SYSTEMS', 0)
+    lp = dea.dea_scores(X, Y, 'crs', dmus=dmus, reference=reference)
+    np.testing.assert_allclose(vertices, lp, atol=1e-7)
+    np.testing.assert_array_equal(vertices[:3], 0)  # produto zero
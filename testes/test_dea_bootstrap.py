@@ -0,0 +1,36 @@
+"""Testes do bootstrap de Simar-Wilson (dea_bootstrap.py) em um mês sintético."""
+import numpy as np
+
+from dea import DEA_SCORE_COL, score_month
+from dea_bootstrap import bootstrap_month
+
+
+def mes_sintetico(n=40, seed=11):
+    rng = np.random.default_rng(seed)
+    X = rng.lognormal(mean=[1, 3, 6, 7], sigma=0.6, size=(n, 4))
+    Y = (X ** [0.2, 0.3, 0.2, 0.3]).prod(axis=1, keepdims=True) * rng.uniform(0.3, 1, size=(n, 1)) * 1e4
+    Y[0] = 0  # sem produção: fica fora da reamostragem
+    return X, Y
+
+
+def test_mesma_semente_mesmo_resultado():
+    X, Y = mes_sintetico()
+    primeiro = bootstrap_month(X, Y, replications=30, seed=np.random.SeedSequence([1, 202401]))
+    segundo = bootstrap_month(X, Y, replications=30, seed=np.random.SeedSequence([1, 202401]))
+    outra = bootstrap_month(X, Y, replications=30, seed=np.random.SeedSequence([2, 202401]))
+    for key, values in primeiro.items():
+        np.testing.assert_array_equal(values, segundo[key])
+    assert not np.allclose(primeiro['ic_inferior'][1:], outra['ic_inferior'][1:])
+
+
+def test_intervalo_contem_o_score_corrigido():
+    X, Y = mes_sintetico()
+    result = bootstrap_month(X, Y, replications=100, seed=7)
+    np.testing.assert_allclose(result[DEA_SCORE_COL], score_month(X, Y)[0])
+    usable = result[DEA_SCORE_COL] > 0
+    assert np.isnan(result['ic_inferior'][~usable]).all() and np.isnan(result['eficiencia_corrigida'][~usable]).all()
+    corrigida, inferior, superior = (result[key][usable] for key in ('eficiencia_corrigida', 'ic_inferior', 'ic_superior'))
+    assert (inferior <= superior).all()
+    assert ((inferior <= corrigida) & (corrigida <= superior)).all()
+    # A fronteira estimada é otimista: o score corrigido de viés não passa do estimado
+    assert (corrigida <= result[DEA_SCORE_COL][usable] + 1e-9).all()
@@ -0,0 +1,57 @@
+"""Testes da análise de janela DEA (dea_janela.py) contra o LP envoltório sobre a janela inteira."""
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import dea
+from dea import INPUT_COLS, OUTPUT_COLS, SCORE_COL, month_arrays, read_partition, read_store, valid_dmus
+from dea_janela import WINDOW_SCORE_COL, month_number, window_partition_path, window_years
+
+MESES = (202310, 202311, 202312, 202401, 202402)
+
+
+def gravar_armazenamento(output_dir, n=25, seed=9):
+    """Armazenamento mínimo com meses sintéticos de n hospitais, na virada de 2023 para 2024."""
+    rng = np.random.default_rng(seed)
+    for ano in sorted({competen // 100 for competen in MESES}):
+        meses = [competen for competen in MESES if competen // 100 == ano]
+        X = rng.lognormal(mean=[1, 3, 6, 7], sigma=0.6, size=(n * len(meses), 4))
+        Y = (X ** [0.2, 0.3, 0.2, 0.3]).prod(axis=1) * rng.uniform(0.3, 1, size=len(X)) * 1e4
+        Y[::17] = 0  # alguns hospitais sem produção
+        colunas = {
+            'CNES': pa.array([f'{i:07d}' for _ in meses for i in range(n)]),
+            'COMPETEN': pa.array(np.repeat(meses, n), pa.int32()),
+            SCORE_COL: pa.array(np.full(len(X), np.nan), pa.float32()),
+            OUTPUT_COLS[0]: pa.array(Y, pa.float32()),
+        }
+        colunas.update({col: pa.array(X[:, j], pa.float32()) for j, col in enumerate(INPUT_COLS)})
+        os.makedirs(os.path.join(output_dir, f'ANO={ano}'))
+        pq.write_table(pa.table(colunas), os.path.join(output_dir, f'ANO={ano}', 'dados.parquet'))
+
+
+@pytest.mark.parametrize('rts', ['crs', 'vrs'])
+def test_janela_igual_ao_lp_sobre_a_janela(tmp_path, monkeypatch, rts):
+    output_dir = str(tmp_path)
+    gravar_armazenamento(output_dir)
+    window_years(output_dir, window=3, rts=rts)
+
+    df = read_store(output_dir)
+    df['CNES'] = df['CNES'].astype(str)
+    # Referência direta: LP envoltório (sem enumeração de vértices) contra todas as DMUs da janela
+    monkeypatch.setattr(dea, 'VERTEX_MAX_SYSTEMS', 0)
+    X, Y, _ = month_arrays(df)
+    meses = month_number(df['COMPETEN'].to_numpy())
+    for ano in (2023, 2024):
+        gravados, metadata = read_partition(window_partition_path(output_dir, ano))
+        assert metadata == {'rts': rts, 'janela': '3'}
+        for competen, month in gravados.groupby('COMPETEN'):
+            janela = np.flatnonzero((meses <= month_number(competen)) & (meses > month_number(competen) - 3) & valid_dmus(X, Y))
+            linhas = np.flatnonzero(df['COMPETEN'].to_numpy() == competen)
+            esperado = np.full(len(linhas), np.nan)
+            avaliaveis = valid_dmus(X[linhas], Y[linhas])
+            esperado[avaliaveis] = dea.dea_scores(X, Y, rts, dmus=linhas[avaliaveis], reference=janela)
+            por_cnes = dict(zip(df['CNES'].iloc[linhas], esperado))
+            np.testing.assert_allclose(month[WINDOW_SCORE_COL], month['CNES'].map(por_cnes), atol=1e-7)
@@ -0,0 +1,35 @@
+"""Testes do índice de Malmquist (dea_malmquist.py) em DMUs sintéticas."""
+import numpy as np
+
+from dea_malmquist import malmquist_pair, month_frontier, next_competen
+
+
+def test_malmquist_um_insumo_um_produto():
+    # Com um insumo, um produto e retornos constantes, a distância de cada mês é
+    # (y / x) / max(y / x) do mês, e o índice se reduz à razão das produtividades
+    # (y1 / x1) / (y0 / x0), qualquer que seja o deslocamento da fronteira.
+    cnes_0 = np.array(['A', 'B', 'C', 'D', 'E'])
+    X0 = np.array([[2.0], [3], [3], [4], [5]])
+    Y0 = np.array([[1.0], [3], [2], [3], [4]])
+    # Em t1, B sai, F entra e os demais mudam de insumo e de produção
+    cnes_1 = np.array(['A', 'C', 'D', 'E', 'F'])
+    X1 = np.array([[2.0], [4], [4], [5], [1]])
+    Y1 = np.array([[2.0], [2], [3], [6], [2]])
+    _, anterior, _ = month_frontier(202412, cnes_0, X0, Y0, 'crs')
+    _, atual, _ = month_frontier(202501, cnes_1, X1, Y1, 'crs')
+    result = malmquist_pair(202412, 202501, anterior, atual, 'crs')
+
+    assert result['CNES'].tolist() == ['A', 'C', 'D', 'E']
+    i0 = [0, 2, 3, 4]
+    produtividade_0 = Y0[i0, 0] / X0[i0, 0]
+    produtividade_1 = Y1[:4, 0] / X1[:4, 0]
+    np.testing.assert_allclose(result['malmquist'], produtividade_1 / produtividade_0, atol=1e-9)
+    # Eficiência: fronteiras 1 (B) em t0 e 2 (F) em t1
+    np.testing.assert_allclose(result['variacao_eficiencia'], (produtividade_1 / 2) / (produtividade_0 / 1), atol=1e-9)
+    np.testing.assert_allclose(result['variacao_tecnologica'], 2.0, atol=1e-9)
+    np.testing.assert_allclose(result['malmquist'], result['variacao_eficiencia'] * result['variacao_tecnologica'])
+
+
+def test_next_competen():
+    assert next_competen(202411) == 202412
+    assert next_competen(202412) == 202501
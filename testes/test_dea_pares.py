@@ -0,0 +1,73 @@
+"""Testes dos pares DEA gravados (dea_pares.py) contra a projeção direta de cada DMU (dea.project_dmu)."""
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from dea import INPUT_COLS, OUTPUT_COLS, SCORE_COL, month_arrays, project_dmu, read_store, score_month
+from dea_pares import SLACK_COLS, build_peer_index, peer_lookup, peers_years, read_peers
+
+
+def gravar_armazenamento(output_dir, meses=(202401, 202402), n=60, seed=3):
+    """Armazenamento mínimo (ANO=<yyyy>/dados.parquet) com meses sintéticos de n hospitais."""
+    rng = np.random.default_rng(seed)
+    colunas = {'CNES': [], 'COMPETEN': [], SCORE_COL: []}
+    colunas.update({col: [] for col in INPUT_COLS + OUTPUT_COLS})
+    for competen in meses:
+        X = rng.lognormal(mean=[1, 3, 6, 7], sigma=0.6, size=(n, 4))
+        Y = (X ** [0.2, 0.3, 0.2, 0.3]).prod(axis=1) * rng.uniform(0.3, 1, size=n) * 1e4
+        colunas['CNES'] += [f'{i:07d}' for i in range(n)]
+        colunas['COMPETEN'] += [competen] * n
+        colunas[SCORE_COL] += [np.nan] * n
+        for j, col in enumerate(INPUT_COLS):
+            colunas[col] += list(X[:, j])
+        colunas[OUTPUT_COLS[0]] += list(Y)
+    table = pa.table({
+        nome: pa.array(valores, pa.string() if nome == 'CNES' else pa.int32() if nome == 'COMPETEN' else pa.float32())
+        for nome, valores in colunas.items()
+    })
+    os.makedirs(os.path.join(output_dir, 'ANO=2024'))
+    pq.write_table(table, os.path.join(output_dir, 'ANO=2024', 'dados.parquet'))
+
+
+@pytest.mark.parametrize('rts', ['crs', 'vrs'])
+def test_pares_gravados_iguais_a_projecao(tmp_path, rts):
+    output_dir = str(tmp_path)
+    gravar_armazenamento(output_dir)
+    peers_years(output_dir, rts=rts)
+    peers = read_peers(output_dir)
+    index = build_peer_index(peers[0])
+
+    df = read_store(output_dir)
+    df['CNES'] = df['CNES'].astype(str)
+    for competen, rows in df.groupby('COMPETEN').indices.items():
+        month = df.iloc[rows].reset_index(drop=True)
+        X, Y, _ = month_arrays(month)
+        _, frontier = score_month(X, Y, rts)
+        posicao = {cnes: i for i, cnes in enumerate(month['CNES'])}
+        for i, cnes in enumerate(month['CNES']):
+            linha, grupo = peer_lookup(peers, index, cnes, competen)
+            theta, _, x_target, y_target = project_dmu(X[i], Y[i], X[frontier], Y[frontier], rts)
+            assert linha['Eficiência_DEA'] == pytest.approx(theta, abs=1e-7)
+            # Alvo reconstruído dos pares e pesos gravados
+            pares = [posicao[par] for par in grupo['CNES']]
+            pesos = grupo['peso'].to_numpy()
+            escala = X.max(axis=0)
+            np.testing.assert_allclose((pesos @ X[pares]) / escala, x_target / escala, atol=1e-6)
+            np.testing.assert_allclose(pesos @ Y[pares], y_target, rtol=1e-6)
+            # Folgas gravadas: o que sobra além da redução radial
+            folgas = linha[SLACK_COLS].to_numpy(dtype='float64')
+            np.testing.assert_allclose(folgas[:len(INPUT_COLS)] / escala, np.maximum(theta * X[i] - x_target, 0) / escala, atol=1e-6)
+            assert set(grupo['CNES']) <= set(month['CNES'].iloc[frontier])
+
+
+def test_consulta_fora_do_armazenamento(tmp_path):
+    output_dir = str(tmp_path)
+    gravar_armazenamento(output_dir, meses=(202401,), n=10)
+    peers_years(output_dir)
+    peers = read_peers(output_dir)
+    index = build_peer_index(peers[0])
+    assert peer_lookup(peers, index, '9999999', 202401) == (None, None)
+    assert peer_lookup(peers, index, '0000001', 202402) == (None, None)
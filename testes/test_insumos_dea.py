@@ -0,0 +1,39 @@
+"""Testes das médias móveis de insumos_dea.py contra o cálculo direto por hospital."""
+import numpy as np
+import pandas as pd
+
+from dea import INPUT_COLS, OUTPUT_COLS
+from insumos_dea import rolling_panel
+
+
+def componentes_sinteticos():
+    """Dois hospitais atravessando a virada do ano; B some em 2024-02 e volta em 2024-03."""
+    competen = [202311, 202312, 202401, 202402, 202403, 202404]
+    rng = np.random.default_rng(5)
+    linhas = [('A', c) for c in competen] + [('B', c) for c in competen if c != 202402]
+    frame = pd.DataFrame(linhas, columns=['CNES', 'COMPETEN'])
+    for col in INPUT_COLS + OUTPUT_COLS:
+        frame[col] = rng.uniform(0, 100, size=len(frame)).round(2)
+    return frame.sample(frac=1, random_state=1).reset_index(drop=True)
+
+
+def test_medias_moveis_iguais_ao_calculo_por_hospital():
+    componentes = componentes_sinteticos()
+    panel = rolling_panel(componentes, window=3)
+    # B só tem janela completa em 2024-01: a falta de 2024-02 invalida as janelas de 2024-03 e 2024-04
+    assert list(zip(panel['COMPETEN'], panel['CNES'])) == [
+        (202401, 'A'), (202401, 'B'), (202402, 'A'), (202403, 'A'), (202404, 'A'),
+    ]
+    for _, linha in panel.iterrows():
+        hospital = componentes[componentes['CNES'] == linha['CNES']].set_index('COMPETEN').sort_index()
+        fim = hospital.index.get_loc(linha['COMPETEN'])
+        esperado = hospital.iloc[fim - 2:fim + 1][INPUT_COLS + OUTPUT_COLS].mean()
+        np.testing.assert_allclose(linha[INPUT_COLS + OUTPUT_COLS].to_numpy(dtype='float64'), esperado.to_numpy(), rtol=1e-12)
+
+
+def test_janela_de_um_mes_repete_os_componentes():
+    componentes = componentes_sinteticos()
+    panel = rolling_panel(componentes, window=1)
+    esperado = componentes.sort_values(['COMPETEN', 'CNES']).reset_index(drop=True)
+    assert panel['COMPETEN'].tolist() == esperado['COMPETEN'].tolist()
+    np.testing.assert_allclose(panel[INPUT_COLS + OUTPUT_COLS], esperado[INPUT_COLS + OUTPUT_COLS], rtol=1e-12)